@@ -0,0 +1,195 @@
+"""
+Compare a `nx.descendants` traversal per card with a single `TransitiveClosure`.
+
+Sessions only need the layers, see `DependencyLayers`, so the closure lives here.
+
+Run with `python -m benchmarks.closure`.
+"""
+
+import random
+import time
+import tracemalloc
+from typing import FrozenSet, Iterator, List, Optional
+
+import click  # type: ignore
+import networkx as nx  # type: ignore
+
+from markdown_flashcards.dependencies import (
+    DependencyGraph,
+    DependencyLayers,
+    PathTable,
+)
+
+
+class Descendants:
+    """
+    Read-only set of the paths a card transitively depends on, a view of the set it shares with the other members of its cycle, if any.
+    """
+
+    __slots__ = ("_path_table", "_identifier", "_reach")
+
+    def __init__(self, path_table: PathTable, identifier: int, reach: FrozenSet[int]):
+        self._path_table = path_table
+        self._identifier = identifier
+        self._reach = reach
+
+    def __contains__(self, relative_path) -> bool:
+        identifier = self._path_table.ids.get(relative_path)
+        # like nx.descendants, a node is never its own descendant
+        return identifier != self._identifier and identifier in self._reach
+
+    def __iter__(self) -> Iterator[str]:
+        for identifier in self._reach:
+            if identifier != self._identifier:
+                yield self._path_table[identifier]
+
+    def __len__(self) -> int:
+        return len(self._reach) - (self._identifier in self._reach)
+
+    def __repr__(self) -> str:
+        return f"Descendants({set(self)})"
+
+
+class TransitiveClosure(DependencyLayers):
+    """
+    What every node of a `DependencyGraph` transitively depends on, computed in the same pass as its layer.
+
+    Components are visited with dependencies first, so a node's closure is the union of its dependencies and their closures, which are done already.
+    Closures are sets of node ids, so they take memory in proportion to their size, not to the size of the graph.
+    The members of a cycle share a set.
+    The result agrees with `nx.descendants` for every node.
+    """
+
+    def __init__(self, dependency_graph: DependencyGraph):
+        # by node id, None for nodes that aren't in the closure (anymore)
+        self._reach: List[Optional[FrozenSet[int]]] = []
+        super().__init__(dependency_graph)
+
+    def _grow(self) -> None:
+        super()._grow()
+        self._reach.extend([None] * (len(self._layers) - len(self._reach)))
+
+    def _close(self, components: List[List[int]]) -> None:
+        """
+        Compute the closure and layer of every node in `components`, which come dependencies first.
+
+        The closures of dependencies outside of `components` are taken as they are.
+        """
+        reaches, layers = self._reach, self._layers
+        offsets, targets = self.graph.csr()
+        path_table = self.graph.path_table
+        for component in components:
+            members = set(component)
+            # members of a cycle depend on each other
+            reach = set(members) if len(component) > 1 else set()
+            layer = 0
+            for identifier in component:
+                for index in range(offsets[identifier], offsets[identifier + 1]):
+                    target = targets[index]
+                    if target in members:
+                        continue
+                    reach.add(target)
+                    reach |= reaches[target]  # type: ignore
+                    if layers[target] >= layer:
+                        layer = layers[target] + 1
+            shared = frozenset(reach)
+            for identifier in component:
+                reaches[identifier] = shared
+                layers[identifier] = layer
+                self.layers[path_table[identifier]] = layer
+
+    def descendants(self, relative_path: str) -> Descendants:
+        identifier = self.graph.path_table.ids[relative_path]
+        return Descendants(self.graph.path_table, identifier, self._reach[identifier])  # type: ignore
+
+    def depends_on(self, relative_path: str, dependency: str) -> bool:
+        return dependency in self.descendants(relative_path)
+
+
+def chains(number_of_nodes: int, chain_length: int) -> nx.DiGraph:
+    """
+    Long prerequisite chains, each card depending on the one before it.
+    """
+    graph = nx.DiGraph()
+    graph.add_nodes_from(f"card{index}.md" for index in range(number_of_nodes))
+    for index in range(number_of_nodes):
+        if index % chain_length:
+            graph.add_edge(f"card{index}.md", f"card{index - 1}.md")
+    return graph
+
+
+def layered(
+    number_of_nodes: int, depth: int, fan_out: int, seed: int = 0
+) -> nx.DiGraph:
+    """
+    A random DAG in `depth` layers, each card depending on up to `fan_out` cards in earlier layers.
+    """
+    rng = random.Random(seed)
+    graph = nx.DiGraph()
+    graph.add_nodes_from(f"card{index}.md" for index in range(number_of_nodes))
+    layer_size = max(1, number_of_nodes // depth)
+    for index in range(layer_size, number_of_nodes):
+        earlier = index - index % layer_size
+        for _ in range(rng.randint(0, fan_out)):
+            graph.add_edge(f"card{index}.md", f"card{rng.randrange(earlier)}.md")
+    return graph
+
+
+def measure(function):
+    """
+    The result of `function`, how long it took and the peak memory it used.
+
+    Memory is measured in a second call, tracemalloc slows down allocations too much to time the same call.
+    """
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def compare(name: str, graph: nx.DiGraph):
+    nodes = list(graph.nodes)
+    per_card, per_card_time, per_card_memory = measure(
+        lambda: {node: nx.descendants(graph, node) for node in nodes}
+    )
+    dependency_graph = DependencyGraph.from_networkx(graph)
+    closure, closure_time, closure_memory = measure(
+        lambda: TransitiveClosure(dependency_graph)
+    )
+    assert all(set(closure.descendants(node)) == per_card[node] for node in nodes)
+    pairs = [(random.choice(nodes), random.choice(nodes)) for _ in range(100000)]
+    start = time.perf_counter()
+    for node, other in pairs:
+        other in per_card[node]
+    set_lookup_time = time.perf_counter() - start
+    descendants = {node: closure.descendants(node) for node in nodes}
+    start = time.perf_counter()
+    for node, other in pairs:
+        other in descendants[node]
+    closure_lookup_time = time.perf_counter() - start
+    print(
+        f"{name}: nx.descendants per card {per_card_time:.2f}s / {per_card_memory / 2**20:.1f} MiB, "
+        f"closure {closure_time:.2f}s / {closure_memory / 2**20:.1f} MiB, "
+        f"100k lookups {set_lookup_time * 1000:.0f}ms (set) vs {closure_lookup_time * 1000:.0f}ms (closure)"
+    )
+
+
+@click.command()
+@click.option("--nodes", default=10000, help="Number of cards.")
+@click.option("--chain-length", default=1000, help="Length of each chain.")
+@click.option("--depth", default=50, help="Number of layers in the random DAG.")
+@click.option("--fan-out", default=3, help="Maximum direct dependencies per card.")
+def main(nodes, chain_length, depth, fan_out):
+    compare(f"{nodes} nodes in chains of {chain_length}", chains(nodes, chain_length))
+    compare(
+        f"{nodes} nodes in {depth} random layers",
+        layered(nodes, depth, fan_out),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compare the single-pass cloze renderer with the replace-based one it replaced, on cards with many and nested occlusions.
+
+Every variant of every card is checked to render identically with both.
+
+Run with `python -m benchmarks.cloze`.
+"""
+
+import random
+import time
+
+import click  # type: ignore
+
+from markdown_flashcards.cloze import render_cloze, tokenize_cloze
+from markdown_flashcards.parsing import START_OF_OCCLUSION_REGEX
+
+
+def splice_until_matching_curly_bracket(remaining_text):
+    opening_curly_brackets = 1
+    for index, character in enumerate(remaining_text):
+        if character == "{":
+            opening_curly_brackets += 1
+        elif character == "}":
+            opening_curly_brackets -= 1
+        if opening_curly_brackets == 0:
+            return remaining_text[: index + 1]
+    return None
+
+
+def replace_based(front, variant_number):
+    """
+    How `ClozeVariant` used to render, with `None` for the answer.
+    """
+    replacement_pairs = []
+    for match in START_OF_OCCLUSION_REGEX.finditer(front):
+        start_index = match.start("start_of_occluded_text")
+        until_curly_bracket = splice_until_matching_curly_bracket(front[start_index:])
+        if not until_curly_bracket:
+            return None
+        whole_occlusion = match.group(0) + until_curly_bracket
+        if int(match.group("occlusion_number")) == variant_number:
+            replacement_pairs.append((whole_occlusion, "[...]"))
+        else:
+            replacement_pairs.append((whole_occlusion, until_curly_bracket[:-1]))
+    displayed = front
+    for replacee, replacer in replacement_pairs:
+        displayed = displayed.replace(replacee, replacer)
+    return displayed
+
+
+def single_pass(front, variant_number):
+    tokens = tokenize_cloze(front)
+    return None if tokens is None else render_cloze(tokens, variant_number)
+
+
+def random_occlusion(rng: random.Random, numbers, depth: int) -> str:
+    parts = [f"text {rng.randint(0, 10**6)}"]
+    for _ in range(rng.randint(0, 3)):
+        roll = rng.random()
+        if roll < 0.3 and depth < 3:
+            parts.append(random_occlusion(rng, numbers, depth + 1))
+        elif roll < 0.5:
+            parts.append(f"{{x_{rng.randint(0, 9)}}}")
+        parts.append(f"more {rng.randint(0, 10**6)}")
+    return f"£{{c{next(numbers)}:" + " ".join(parts) + "}"
+
+
+def random_front(rng: random.Random, occlusions: int) -> str:
+    numbers = iter(range(1, 10 * occlusions))
+    parts = []
+    for _ in range(occlusions):
+        parts.append(f"Sentence with {{braces}} and }} stray ones {rng.random()}")
+        parts.append(random_occlusion(rng, numbers, 0))
+    return " ".join(parts)
+
+
+@click.command()
+@click.option("--cards", default=50, help="Number of cards.")
+@click.option("--occlusions", default=60, help="Top-level occlusions per card.")
+@click.option("--seed", default=0)
+def main(cards, occlusions, seed):
+    rng = random.Random(seed)
+    fronts = [random_front(rng, occlusions) for _ in range(cards)]
+    variants = [
+        sorted(
+            {
+                int(match.group("occlusion_number"))
+                for match in START_OF_OCCLUSION_REGEX.finditer(front)
+            }
+        )
+        for front in fronts
+    ]
+    print(
+        f"{cards} cards, {sum(map(len, variants)) / cards:.0f} variants and "
+        f"{sum(map(len, fronts)) / cards:.0f} characters per card on average"
+    )
+    for name, render in [
+        ("replace-based", replace_based),
+        ("single pass", single_pass),
+    ]:
+        tokenize_cloze.cache_clear()
+        start = time.perf_counter()
+        rendered = [
+            [render(front, variant) for variant in [*card_variants, None]]
+            for front, card_variants in zip(fronts, variants)
+        ]
+        elapsed = time.perf_counter() - start
+        if name == "replace-based":
+            expected = rendered
+        else:
+            assert rendered == expected
+        print(f"{name}: {elapsed:.3f}s")
+    for broken in ["£{c1:never closed", "£{c1:ok} £{c2:{unbalanced}"]:
+        assert single_pass(broken, 1) is None and replace_based(broken, 1) is None
+
+
+if __name__ == "__main__":
+    main()
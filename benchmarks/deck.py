@@ -0,0 +1,170 @@
+"""
+Synthetic card directories for the benchmarks.
+
+`generate_deck` writes a deck to a directory, optionally with a `learning-history.db` that already has a review history.
+Run with `python -m benchmarks.deck DIRECTORY` to generate one to try `quiz` on.
+"""
+
+import datetime
+import random
+import sqlite3
+from pathlib import Path
+from typing import List, NamedTuple
+
+import click  # type: ignore
+
+from markdown_flashcards.history import (
+    create_cards_table,
+    encode_history_row,
+    upsert_history_rows,
+)
+from markdown_flashcards.parsing import CardTypes
+
+NUMBER_OF_IMAGES = 8
+
+
+class DeckSpec(NamedTuple):
+    """
+    What a synthetic deck looks like.
+
+    Dependencies form a DAG in `depth` layers, each card depending on up to `fan_out` cards in earlier layers.
+    `image_ratio` and `history_ratio` are the fractions of cards that show an image and that already have rows in `Cards`.
+    """
+
+    cards: int = 1000
+    cloze_ratio: float = 0.3
+    max_occlusions: int = 8
+    nested_ratio: float = 0.2
+    depth: int = 10
+    fan_out: int = 3
+    image_ratio: float = 0.05
+    history_ratio: float = 0.8
+    seed: int = 0
+
+
+DEFAULT_SPEC = DeckSpec()
+
+
+def card_path(index: int) -> str:
+    return f"topic{index % 100}/card{index}.md"
+
+
+def dependencies(spec: DeckSpec, rng: random.Random, index: int) -> List[str]:
+    layer_size = max(1, spec.cards // spec.depth)
+    earlier = index - index % layer_size
+    if not earlier:
+        return []
+    return sorted(
+        {card_path(rng.randrange(earlier)) for _ in range(rng.randint(0, spec.fan_out))}
+    )
+
+
+def image_reference(spec: DeckSpec, rng: random.Random) -> str:
+    if rng.random() >= spec.image_ratio:
+        return ""
+    return f"\n\n![diagram](images/diagram{rng.randrange(NUMBER_OF_IMAGES)}.png)\n"
+
+
+def cloze_body(spec: DeckSpec, rng: random.Random) -> str:
+    parts = []
+    for occlusion in range(1, rng.randint(1, spec.max_occlusions) + 1):
+        inner = f"answer *{occlusion}* {{x}}"
+        if occlusion > 1 and rng.random() < spec.nested_ratio:
+            # nested in the previous occlusion
+            parts[-1] = parts[-1][:-1] + f" and £{{c{occlusion}:{inner}}}}}"
+        else:
+            parts.append(f"Sentence {occlusion} is about £{{c{occlusion}:{inner}}}")
+    return ". ".join(parts) + "."
+
+
+def normal_body(index: int) -> str:
+    return (
+        f"What is **card {index}** about?\n\n- a point\n- another point\n"
+        + "\n---\n"
+        + f"Card {index} is about _this_. " * 10
+    )
+
+
+def history_rows(
+    spec: DeckSpec, rng: random.Random, relative_path: str, variants: List[int]
+) -> List[tuple]:
+    if rng.random() >= spec.history_ratio:
+        return []
+    card_type = CardTypes.CLOZE if variants != [0] else CardTypes.NORMAL
+    now = datetime.datetime.now()
+    return [
+        encode_history_row(
+            card_type,
+            variant,
+            relative_path,
+            now
+            - datetime.timedelta(days=rng.randint(0, 30), minutes=rng.randint(0, 1440)),
+            rng.randint(1, 4),
+            datetime.timedelta(days=rng.randint(1, 20)),
+        )
+        for variant in variants
+    ]
+
+
+def write_images(directory: Path) -> None:
+    # comes with textual-image
+    from PIL import Image  # type: ignore
+
+    (directory / "images").mkdir(exist_ok=True)
+    for index in range(NUMBER_OF_IMAGES):
+        Image.new("RGB", (800, 600), (30 * index, 100, 200)).save(
+            directory / "images" / f"diagram{index}.png"
+        )
+
+
+def generate_deck(directory: Path, spec: DeckSpec) -> None:
+    rng = random.Random(spec.seed)
+    rows = []
+    for index in range(spec.cards):
+        relative_path = card_path(index)
+        path = directory / relative_path
+        path.parent.mkdir(exist_ok=True)
+        card_dependencies = "".join(
+            f"\n  - {dependency}" for dependency in dependencies(spec, rng, index)
+        )
+        header = (
+            f"---\ntags: [tag{index % 7}]\n"
+            f"dependencies:{card_dependencies or ' []'}\n---\n"
+        )
+        if rng.random() < spec.cloze_ratio:
+            body = cloze_body(spec, rng)
+            variants = list(range(1, body.count("£{c") + 1))
+        else:
+            body = normal_body(index)
+            variants = [0]
+        path.write_text(header + body + image_reference(spec, rng) + "\n")
+        rows.extend(history_rows(spec, rng, relative_path, variants))
+    if spec.image_ratio:
+        write_images(directory)
+    if rows:
+        con = sqlite3.connect(directory / "learning-history.db")
+        create_cards_table(con.cursor())
+        with con:
+            upsert_history_rows(con, rows)
+        con.close()
+
+
+@click.command()
+@click.argument(
+    "directory", type=click.Path(file_okay=False, writable=True, path_type=Path)
+)
+@click.option("--cards", default=DEFAULT_SPEC.cards)
+@click.option("--cloze-ratio", default=DEFAULT_SPEC.cloze_ratio)
+@click.option("--max-occlusions", default=DEFAULT_SPEC.max_occlusions)
+@click.option("--depth", default=DEFAULT_SPEC.depth)
+@click.option("--fan-out", default=DEFAULT_SPEC.fan_out)
+@click.option("--image-ratio", default=DEFAULT_SPEC.image_ratio)
+@click.option("--history-ratio", default=DEFAULT_SPEC.history_ratio)
+@click.option("--seed", default=DEFAULT_SPEC.seed)
+def main(directory, **spec):
+    directory.mkdir(parents=True, exist_ok=True)
+    generate_deck(directory, DeckSpec(**spec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Time `stats` on a large review history and check its vectorized due dates against `compute_due_date`, row by row.
+
+Run with `python -m benchmarks.forecast`.
+"""
+
+import datetime
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import click  # type: ignore
+import numpy as np  # type: ignore
+
+from markdown_flashcards.forecast import (
+    due_dates,
+    load_forecast,
+    local_wall_seconds,
+    wall_seconds,
+)
+from markdown_flashcards.history import (
+    connect,
+    create_cards_table,
+    decode_history_values,
+    encode_history_row,
+    upsert_history_rows,
+)
+from markdown_flashcards.parsing import CardTypes
+from markdown_flashcards.scheduling import compute_due_date
+
+
+def populate(directory: Path, number_of_rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    rows = []
+    for index in range(number_of_rows):
+        relative_path = f"chapter{index % 50}/section{index % 1000}/card{index}.md"
+        if rng.random() < 0.1:
+            # new
+            rows.append(
+                encode_history_row(CardTypes.NORMAL, 0, relative_path, None, None, None)
+            )
+            continue
+        rows.append(
+            encode_history_row(
+                CardTypes.NORMAL,
+                0,
+                relative_path,
+                now
+                - datetime.timedelta(
+                    days=rng.randint(0, 200), seconds=rng.randint(0, 86400)
+                ),
+                rng.randint(1, 4),
+                # includes short and whole-day deltas, which take other branches
+                rng.choice(
+                    [
+                        datetime.timedelta(seconds=rng.randint(1, 86400 * 5)),
+                        datetime.timedelta(days=rng.randint(1, 5)),
+                        datetime.timedelta(days=rng.randint(1, 200)),
+                    ]
+                ),
+            )
+        )
+    con = connect(directory)
+    create_cards_table(con.cursor())
+    with con:
+        upsert_history_rows(con, rows)
+    con.close()
+
+
+def check_due_dates(directory: Path, now: datetime.datetime, sample: int) -> None:
+    con = sqlite3.connect(directory / "learning-history.db")
+    rows = con.execute(
+        "select LastReviewDate, ConfidenceScore, PreviousTimeDelta from Cards order by random() limit ?",
+        (sample,),
+    ).fetchall()
+    con.close()
+    values = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    vectorized = due_dates(
+        local_wall_seconds(values[:, 0]), values[:, 1], values[:, 2], wall_seconds(now)
+    )
+    for row, due in zip(rows, vectorized.tolist()):
+        expected = compute_due_date(*decode_history_values(*row)) or now
+        # timedelta rounds to microseconds
+        assert abs(wall_seconds(expected) - due) < 1e-3, (row, expected, due)
+
+
+@click.command()
+@click.option("--rows", default=500000, help="Number of rows in Cards.")
+@click.option("--runs", default=5, help="Number of runs, the median is reported.")
+@click.option("--days", default=14, help="Number of days to forecast.")
+@click.option("--sample", default=20000, help="Number of rows to check one by one.")
+def main(rows, runs, days, sample):
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = Path(temporary_directory)
+        populate(directory, rows)
+        now = datetime.datetime.now()
+        check_due_dates(directory, now, sample)
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            forecast = load_forecast(directory, now, days)
+            times.append(time.perf_counter() - start)
+    print(
+        f"{rows} rows: forecast in {statistics.median(times) * 1000:.0f}ms, "
+        f"{forecast.new} new, {forecast.overdue} overdue, {forecast.daily[0]} due today; "
+        f"{sample} due dates agree with compute_due_date"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Compare the `DependencyGraph` that sessions build with the `nx.DiGraph` keyed by path strings that they used to build.
+
+For every size, this measures the memory the graph takes and the time to build it from the dependencies of every card, to find the strongly connected components in topological order, and to collect the descendants of a sample of cards.
+
+Run with `python -m benchmarks.graph`.
+"""
+
+import gc
+import random
+import time
+import tracemalloc
+from typing import Dict, List
+
+import click  # type: ignore
+import networkx as nx  # type: ignore
+
+from markdown_flashcards.dependencies import DependencyGraph
+
+
+def dependencies_by_path(
+    number_of_nodes: int, depth: int, fan_out: int, seed: int = 0
+) -> Dict[str, List[str]]:
+    """
+    The same random DAG as `benchmarks.closure.layered`, with paths like the ones in `benchmarks.deck`.
+    """
+    rng = random.Random(seed)
+    layer_size = max(1, number_of_nodes // depth)
+
+    def path(index: int) -> str:
+        return f"topic{index % 100}/card{index}.md"
+
+    dependencies: Dict[str, List[str]] = {}
+    for index in range(number_of_nodes):
+        earlier = index - index % layer_size
+        dependencies[path(index)] = sorted(
+            {
+                path(rng.randrange(earlier))
+                for _ in range(rng.randint(0, fan_out) if earlier else 0)
+            }
+        )
+    return dependencies
+
+
+def build_networkx(dependencies: Dict[str, List[str]]) -> nx.DiGraph:
+    # the way sessions built it before DependencyGraph
+    graph = nx.DiGraph()
+    for relative_path, card_dependencies in dependencies.items():
+        graph.add_node(relative_path)
+        for dependency in card_dependencies:
+            graph.add_node(dependency)
+            graph.add_edge(relative_path, dependency)
+    return graph
+
+
+def build_compact(dependencies: Dict[str, List[str]]) -> DependencyGraph:
+    graph = DependencyGraph()
+    for relative_path, card_dependencies in dependencies.items():
+        graph.set_dependencies(relative_path, card_dependencies)
+    # the arrays are only built by the first read
+    graph.number_of_edges()
+    return graph
+
+
+def held_memory(function) -> int:
+    """
+    How much memory the result of `function` holds on to.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return held
+
+
+def timed(function):
+    """
+    The result of `function` and how long it took, without tracemalloc, which slows down allocations.
+    """
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option(
+    "--sizes", default="10000,50000,200000", help="Comma-separated card counts."
+)
+@click.option("--depth", default=20, help="Number of layers in the random DAG.")
+@click.option("--fan-out", default=3, help="Maximum direct dependencies per card.")
+@click.option(
+    "--sample", default=200, help="Number of cards to collect descendants of."
+)
+def main(sizes, depth, fan_out, sample):
+    for number_of_nodes in map(int, sizes.split(",")):
+        dependencies = dependencies_by_path(number_of_nodes, depth, fan_out)
+        sampled = random.Random(0).sample(list(dependencies), sample)
+        networkx_memory = held_memory(lambda: build_networkx(dependencies))
+        graph, networkx_build = timed(lambda: build_networkx(dependencies))
+        _, networkx_order = timed(
+            lambda: list(nx.topological_sort(nx.condensation(graph)))
+        )
+        expected, networkx_descendants = timed(
+            lambda: {node: nx.descendants(graph, node) for node in sampled}
+        )
+        graph = None
+        compact_memory = held_memory(lambda: build_compact(dependencies))
+        compact, compact_build = timed(lambda: build_compact(dependencies))
+        _, compact_order = timed(compact.strongly_connected_components)
+        descendants, compact_descendants = timed(
+            lambda: {node: compact.descendants(node) for node in sampled}
+        )
+        assert descendants == expected
+        print(
+            f"{number_of_nodes} cards, {compact.number_of_edges()} edges:\n"
+            f"  nx.DiGraph      {networkx_memory / 2**20:7.1f} MiB, built in {networkx_build:.2f}s, "
+            f"condensation in {networkx_order:.2f}s, {sample} descendants in {networkx_descendants:.2f}s\n"
+            f"  DependencyGraph {compact_memory / 2**20:7.1f} MiB, built in {compact_build:.2f}s, "
+            f"components in {compact_order:.2f}s, {sample} descendants in {compact_descendants:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Compare the per-card `Cards` lookups `quiz` used to do against a single bulk load.
+
+Run with `python -m benchmarks.history_load`.
+"""
+
+import datetime
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import click  # type: ignore
+
+from markdown_flashcards.history import (
+    create_cards_table,
+    encode_history_row,
+    group_by_path,
+    load_card_types,
+    load_history,
+    paths_without_files,
+    upsert_history_rows,
+)
+from markdown_flashcards.parsing import CardTypes
+from markdown_flashcards.scheduling import ONE_DAY
+
+
+def populate(directory: Path, number_of_cards: int, cloze_ratio: float = 0.3):
+    """
+    Create empty Markdown files and matching `Cards` rows.
+
+    A few rows do not get a file, so the missing-file check has something to find.
+    """
+    rng = random.Random(number_of_cards)
+    con = sqlite3.connect(directory / "learning-history.db")
+    cur = con.cursor()
+    create_cards_table(cur)
+    rows = []
+    last_review_date = datetime.datetime(2024, 1, 1, 12)
+    for index in range(number_of_cards):
+        relative_path = f"topic{index % 100}/card{index}.md"
+        if index % 1000:
+            card_path = directory / relative_path
+            card_path.parent.mkdir(exist_ok=True)
+            card_path.touch()
+        if rng.random() < cloze_ratio:
+            card_type, variants = CardTypes.CLOZE, range(1, rng.randint(2, 5))
+        else:
+            card_type, variants = CardTypes.NORMAL, range(1)
+        rows.extend(
+            encode_history_row(
+                card_type, variant, relative_path, last_review_date, 3, ONE_DAY
+            )
+            for variant in variants
+        )
+    upsert_history_rows(cur, rows)
+    con.commit()
+    con.close()
+
+
+def per_card(directory: Path):
+    con = sqlite3.connect(directory / "learning-history.db")
+    cur = con.cursor()
+    missing = set()
+    for (relative_path,) in cur.execute("select RelativePath from Files").fetchall():
+        if not (directory / relative_path).exists():
+            missing.add(relative_path)
+    card_paths = set(directory.glob("**/*.md"))
+    entries = {}
+    for card_path in card_paths:
+        relative_path = str(card_path.relative_to(directory))
+        cur.execute(
+            "select CardType, ClozeVariant, LastReviewDate, ConfidenceScore, PreviousTimeDelta from Cards join Files using (FileId) where RelativePath=?",
+            (relative_path,),
+        )
+        entries[relative_path] = list(cur.fetchall())
+    con.close()
+    return missing, entries
+
+
+def bulk(directory: Path):
+    con = sqlite3.connect(directory / "learning-history.db")
+    cur = con.cursor()
+    card_types = load_card_types(cur)
+    history = load_history(cur)
+    relative_card_paths = [
+        str(card_path.relative_to(directory)) for card_path in directory.glob("**/*.md")
+    ]
+    missing = paths_without_files(card_types, relative_card_paths)
+    entries = group_by_path(history)
+    con.close()
+    return missing, entries
+
+
+@click.command()
+@click.option(
+    "--sizes", default="10000,50000,100000", help="Comma-separated card counts."
+)
+@click.option(
+    "--max-per-card",
+    default=20000,
+    help="Skip the per-card approach above this many cards.",
+)
+def main(sizes, max_per_card):
+    for number_of_cards in [int(size) for size in sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            directory = Path(temporary_directory)
+            populate(directory, number_of_cards)
+            start = time.perf_counter()
+            missing, _ = bulk(directory)
+            bulk_time = time.perf_counter() - start
+            report = f"{number_of_cards:>7} cards ({len(missing)} without file): bulk {bulk_time:.2f}s"
+            if number_of_cards <= max_per_card:
+                start = time.perf_counter()
+                per_card(directory)
+                per_card_time = time.perf_counter() - start
+                report += f", per card {per_card_time:.2f}s ({per_card_time / bulk_time:.1f}x)"
+            print(report)
+
+
+if __name__ == "__main__":
+    main()
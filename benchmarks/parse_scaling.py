@@ -0,0 +1,54 @@
+"""
+How scanning and parsing a deck without a warm parse cache scales with `--jobs`.
+
+Run with `python -m benchmarks.parse_scaling`.
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import click  # type: ignore
+
+from benchmarks.deck import DeckSpec, generate_deck
+from markdown_flashcards.parsing import ParseCache, scan_markdown_files
+
+
+def parse(directory: Path, jobs: int):
+    card_paths = scan_markdown_files(directory)
+    relative_paths = [str(card_path.relative_to(directory)) for card_path in card_paths]
+    return ParseCache(sqlite3.connect(":memory:")).get_all(
+        directory, card_paths, relative_paths, jobs=jobs
+    )
+
+
+@click.command()
+@click.option("--cards", default=20000, help="Number of cards.")
+@click.option(
+    "--max-jobs", default=os.cpu_count() or 1, help="Highest number of jobs to try."
+)
+def main(cards, max_jobs):
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        directory = Path(temporary_directory)
+        # only the files are parsed, so no history or images
+        generate_deck(directory, DeckSpec(cards=cards, history_ratio=0, image_ratio=0))
+        sequential = None
+        jobs = 1
+        while jobs <= max_jobs:
+            start = time.perf_counter()
+            parsed_cards = parse(directory, jobs)
+            elapsed = time.perf_counter() - start
+            if sequential is None:
+                sequential = (parsed_cards, elapsed)
+            assert list(parsed_cards.items()) == list(sequential[0].items())
+            print(
+                f"{cards} cards, {jobs} job(s): {elapsed:.2f}s "
+                f"({sequential[1] / elapsed:.1f}x)"
+            )
+            jobs *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Time pushing and popping every card of a large random DAG through the review queue.
+
+The ordering invariants are checked in `tests/test_scheduler.py`.
+
+Run with `python -m benchmarks.scheduler`.
+"""
+
+import datetime
+import random
+import time
+
+import click  # type: ignore
+
+from benchmarks.closure import layered
+from markdown_flashcards.dependencies import DependencyGraph, DependencyLayers
+from markdown_flashcards.cards import START_TIME, NormalCard
+from markdown_flashcards.scheduler import Scheduler
+
+
+def random_cards(layers: DependencyLayers, seed: int):
+    rng = random.Random(seed)
+    cards = []
+    for relative_path in layers.paths:
+        reviewed = rng.random() < 0.8
+        last_review_date = START_TIME - datetime.timedelta(
+            days=rng.randint(0, 30), minutes=rng.randint(0, 1440)
+        )
+        cards.append(
+            NormalCard(
+                relative_path,
+                [],
+                last_review_date if reviewed else None,
+                rng.randint(1, 4) if reviewed else None,
+                datetime.timedelta(days=rng.randint(1, 20)) if reviewed else None,
+                "front",
+                "back",
+            )
+        )
+    return cards
+
+
+@click.command()
+@click.option("--nodes", default=50000, help="Number of cards.")
+@click.option("--depth", default=20, help="Number of layers in the random DAG.")
+@click.option("--fan-out", default=2, help="Maximum direct dependencies per card.")
+def main(nodes, depth, fan_out):
+    layers = DependencyLayers(
+        DependencyGraph.from_networkx(layered(nodes, depth, fan_out))
+    )
+    cards = random_cards(layers, 0)
+    scheduler = Scheduler(layers.layers)
+    start = time.perf_counter()
+    for card in cards:
+        scheduler.push(card)
+    while scheduler.pop():
+        pass
+    print(f"{nodes} cards: pushed and popped in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Compare the size and load time of a `Cards` history in the text layout of schema version 1 with the current one, and time the migration in between.
+
+Run with `python -m benchmarks.schema`.
+"""
+
+import datetime
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import click  # type: ignore
+
+from markdown_flashcards.history import (
+    MIGRATIONS,
+    HistoryEntry,
+    create_cards_table,
+    load_history,
+)
+from markdown_flashcards.parsing import CardTypes
+
+
+def populate_version_1(con: sqlite3.Connection, number_of_cards: int) -> None:
+    rng = random.Random(number_of_cards)
+    cur = con.cursor()
+    MIGRATIONS[0](cur)
+    cur.execute("pragma user_version=1")
+    now = datetime.datetime.now()
+    rows = []
+    for index in range(number_of_cards):
+        relative_path = f"chapter{index % 50}/section{index % 1000}/card{index}.md"
+        if rng.random() < 0.3:
+            card_type, variants = CardTypes.CLOZE, range(1, rng.randint(2, 8))
+        else:
+            card_type, variants = CardTypes.NORMAL, range(1)
+        for variant in variants:
+            last_review_date = now - datetime.timedelta(
+                days=rng.randint(0, 300), seconds=rng.randint(0, 86400)
+            )
+            previous_time_delta = datetime.timedelta(
+                days=rng.randint(1, 60), seconds=rng.randint(0, 86400)
+            )
+            rows.append(
+                (
+                    card_type.value,
+                    variant,
+                    relative_path,
+                    last_review_date.isoformat(),
+                    rng.randint(1, 4),
+                    str(previous_time_delta.total_seconds()),
+                    # what version 1 stored, the value doesn't matter for loading
+                    (last_review_date + previous_time_delta).isoformat(),
+                )
+            )
+    cur.executemany("insert into Cards values (?, ?, ?, ?, ?, ?, ?)", rows)
+    con.commit()
+
+
+def decode_version_1(
+    last_review_date: Optional[str],
+    confidence_score: Optional[int],
+    previous_time_delta: Optional[str],
+) -> Tuple[Optional[datetime.datetime], Optional[int], Optional[datetime.timedelta]]:
+    # decode_history_values as it was for schema version 1
+    return (
+        datetime.datetime.fromisoformat(last_review_date) if last_review_date else None,
+        int(confidence_score) if confidence_score else None,
+        datetime.timedelta(seconds=int(float(previous_time_delta)))
+        if previous_time_delta
+        else None,
+    )
+
+
+def load_version_1(cur: sqlite3.Cursor) -> Dict[Tuple[str, int], HistoryEntry]:
+    # load_history as it was for schema version 1
+    return {
+        (relative_path, cloze_variant): HistoryEntry(
+            relative_path,
+            card_type,
+            cloze_variant,
+            *decode_version_1(last_review_date, confidence_score, previous_time_delta),
+        )
+        for (
+            relative_path,
+            card_type,
+            cloze_variant,
+            last_review_date,
+            confidence_score,
+            previous_time_delta,
+        ) in cur.execute(
+            "select RelativePath, CardType, ClozeVariant, LastReviewDate, ConfidenceScore, PreviousTimeDelta from Cards"
+        )
+    }
+
+
+def size_in_mib(con: sqlite3.Connection, path: Path) -> float:
+    con.execute("vacuum")
+    return path.stat().st_size / 2**20
+
+
+def median_time(function, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+@click.command()
+@click.option("--sizes", default="10000,100000", help="Comma-separated card counts.")
+@click.option("--runs", default=5, help="Number of loads, the median is reported.")
+def main(sizes, runs):
+    for number_of_cards in map(int, sizes.split(",")):
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            path = Path(temporary_directory) / "learning-history.db"
+            con = sqlite3.connect(path)
+            populate_version_1(con, number_of_cards)
+            cur = con.cursor()
+            legacy_history = load_version_1(cur)
+            legacy_size = size_in_mib(con, path)
+            legacy_time = median_time(lambda: load_version_1(cur), runs)
+            start = time.perf_counter()
+            create_cards_table(cur)
+            migration_time = time.perf_counter() - start
+            history = load_history(cur)
+            # only the fractions of seconds are lost
+            assert history.keys() == legacy_history.keys()
+            assert all(
+                entry.last_review_date
+                == legacy_history[key].last_review_date.replace(microsecond=0)
+                and entry.previous_time_delta == legacy_history[key].previous_time_delta
+                for key, entry in history.items()
+            )
+            size = size_in_mib(con, path)
+            load_time = median_time(lambda: load_history(cur), runs)
+            con.close()
+        print(
+            f"{number_of_cards:>7} cards, {len(history)} rows: "
+            f"version 1 {legacy_size:.1f} MiB, loaded in {legacy_time * 1000:.0f}ms; "
+            f"current {size:.1f} MiB, loaded in {load_time * 1000:.0f}ms; "
+            f"migrated in {migration_time:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare how long `ReviewSession` takes to start on a whole deck with a session scoped with `paths` or `tags`, on synthetic decks of increasing size.
+
+Every deck is reviewed once first, so the parse cache and the tag index are filled, as they would be after the first session.
+A session scoped with `paths` should start in time proportional to the cards in its scope, not to the deck.
+With `tags`, the whole deck is still walked and stat'ed, to find files that are new or changed since the tag index was filled, but only those files and the tagged ones are parsed.
+
+Run with `python -m benchmarks.scope`.
+"""
+
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import click  # type: ignore
+
+from benchmarks.deck import DEFAULT_SPEC, generate_deck
+from markdown_flashcards.session import ReviewSession
+
+
+def time_start(directory: Path, runs: int, **scope) -> tuple:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with ReviewSession(directory, **scope) as session:
+            queued = session.start()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), len(session.relative_card_paths), queued
+
+
+@click.command()
+@click.option(
+    "--sizes", default="1000,10000,50000", help="Comma-separated card counts."
+)
+@click.option("--runs", default=5, help="Number of starts, the median is reported.")
+@click.option("--fan-out", default=1, help="See DeckSpec, prerequisites are in scope.")
+def main(sizes, runs, fan_out):
+    for number_of_cards in map(int, sizes.split(",")):
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            directory = Path(temporary_directory)
+            generate_deck(
+                directory,
+                DEFAULT_SPEC._replace(
+                    cards=number_of_cards, fan_out=fan_out, image_ratio=0
+                ),
+            )
+            # fills the parse cache and the tag index
+            time_start(directory, 1)
+            for label, scope in [
+                ("whole deck", {}),
+                ("--path topic0", {"paths": ["topic0"]}),
+                ("--tag tag0", {"tags": ["tag0"]}),
+            ]:
+                seconds, files, queued = time_start(directory, runs, **scope)
+                print(
+                    f"{number_of_cards:>6} cards, {label:<14}: {seconds * 1000:7.1f}ms "
+                    f"for {files} files, {queued} cards queued"
+                )
+
+
+if __name__ == "__main__":
+    main()
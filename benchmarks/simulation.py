@@ -0,0 +1,109 @@
+"""
+Simulate years of reviews under the current scheduling policy and a variation of it.
+
+That the simulation schedules like the `Card` classes and `compute_due_date` is checked in `tests/test_simulation.py`.
+
+Run with `python -m benchmarks.simulation`, e.g. with `--easy-factor 2.5` to see what a steeper "very easy" does.
+"""
+
+import datetime
+import random
+import time
+
+import click  # type: ignore
+
+from markdown_flashcards.cards import ClozeVariant, NormalCard
+from markdown_flashcards.scheduling import DEFAULT_POLICY, Policy
+from markdown_flashcards.simulation import simulate, summarize
+
+
+def random_state(rng: random.Random):
+    """
+    Stored values of a card, including missing ones, with dates around daylight saving time changes.
+    Also used by `tests/test_simulation.py`.
+    """
+    last_review_date = datetime.datetime(
+        rng.randint(2000, 2030), rng.choice([1, 3, 6, 10, 12]), rng.randint(1, 28)
+    ) + datetime.timedelta(seconds=rng.uniform(0, 24 * 60 * 60))
+    previous_time_delta = datetime.timedelta(
+        seconds=rng.choice([0, 59, 24 * 60 * 60, 4 * 24 * 60 * 60])
+        + rng.expovariate(1 / (30 * 24 * 60 * 60)) * rng.randint(0, 1)
+    )
+    return (
+        last_review_date if rng.random() < 0.9 else None,
+        rng.choice([None, 1, 2, 3, 4, 4, 3, 2]),
+        previous_time_delta if rng.random() < 0.9 else None,
+    )
+
+
+def seconds_per_card_review(samples: int, seed: int = 0) -> float:
+    """
+    How long rating a `Card` takes, to compare with the simulation.
+    """
+    rng = random.Random(seed)
+    cards = [
+        NormalCard(f"card{index}.md", [], *random_state(rng), "front", "back")
+        if index % 2
+        else ClozeVariant(f"card{index}.md", [], *random_state(rng), "front", 1)
+        for index in range(samples)
+    ]
+    start = time.perf_counter()
+    for card in cards:
+        card.update_with_confidence_score(rng.randint(1, 4))
+    return (time.perf_counter() - start) / samples
+
+
+@click.command()
+@click.option("--users", default=200, help="Number of synthetic users.")
+@click.option("--cards", default=1000, help="Number of cards per user.")
+@click.option("--years", default=3, help="Number of years to simulate.")
+@click.option("--jobs", default=1, help="Number of processes.")
+@click.option("--seed", default=0, help="Seed for the random numbers.")
+@click.option("--samples", default=20000, help="Number of Card objects to rate.")
+# the defaults of some of these are whole numbers, so click would only accept integers
+@click.option("--hard-factor", type=float, default=DEFAULT_POLICY.hard_factor)
+@click.option(
+    "--hard-minimum-minutes", type=float, default=DEFAULT_POLICY.hard_minimum_minutes
+)
+@click.option("--good-factor", type=float, default=DEFAULT_POLICY.good_factor)
+@click.option(
+    "--good-factor-from-days", type=float, default=DEFAULT_POLICY.good_factor_from_days
+)
+@click.option("--good-maximum-days", default=DEFAULT_POLICY.good_maximum_days)
+@click.option("--easy-factor", type=float, default=DEFAULT_POLICY.easy_factor)
+@click.option(
+    "--easy-factor-from-days", type=float, default=DEFAULT_POLICY.easy_factor_from_days
+)
+@click.option("--easy-maximum-days", default=DEFAULT_POLICY.easy_maximum_days)
+def main(users, cards, years, jobs, seed, samples, **policy):
+    card_seconds = seconds_per_card_review(samples, seed)
+    policies = {"current": DEFAULT_POLICY, "variation": Policy(**policy)}
+    if policies["variation"] == DEFAULT_POLICY:
+        del policies["variation"]
+    summaries = {}
+    for name, chosen_policy in policies.items():
+        start = time.perf_counter()
+        result = simulate(
+            chosen_policy,
+            users=users,
+            cards_per_user=cards,
+            days=years * 365,
+            seed=seed,
+            jobs=jobs,
+        )
+        seconds = time.perf_counter() - start
+        summaries[name] = summarize(result)
+        print(
+            f"{name}: {int(result.reviews.sum())} reviews of {result.cards} cards over {years} years in {seconds:.1f}s, "
+            f"{seconds / result.reviews.sum() * 1e6:.2f}µs per review "
+            f"(rating Card objects takes {card_seconds * 1e6:.2f}µs per review)"
+        )
+    for metric in summaries["current"]:
+        print(
+            f"  {metric:<40}"
+            + "".join(f"{summary[metric]:>12.3f}" for summary in summaries.values())
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Time how long `markdown_flashcards.main` takes to import, with `python -X importtime`, and how long `--help` takes.
+
+The numbers depend on the machine, so this only reports them.
+That the heavy dependencies are not imported at startup is tested in `tests/test_startup.py`.
+
+Run with `python -m benchmarks.startup`.
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+import click  # type: ignore
+
+
+def import_time_in_microseconds(module: str) -> int:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, name = line.rsplit("|", 2)
+        if name.strip() == module:
+            return int(cumulative)
+    raise ValueError(f"{module} not found in -X importtime output")
+
+
+@click.command()
+@click.option("--runs", default=7, help="Number of runs, the median is reported.")
+def main(runs):
+    module = "markdown_flashcards.main"
+    import_times = [import_time_in_microseconds(module) / 1000 for _ in range(runs)]
+    print(f"import {module}: {statistics.median(import_times):.1f}ms")
+    help_times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", module, "--help"], capture_output=True, check=True
+        )
+        help_times.append(time.perf_counter() - start)
+    print(f"--help: {statistics.median(help_times) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmark `quiz` on synthetic decks of increasing size.
+
+For every size, this measures:
+- startup: `quiz` in a subprocess with stdin closed, so it stops at the first prompt, once with a cold and once with a warm parse cache, broken down with `--profile-json`
+- render: rendering the question and answer of a sample of cards to an in-memory console
+- replay: rating every due card through `ReviewSession`, including the queue and database writes
+
+Run with `python -m benchmarks.suite`.
+"""
+
+import io
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Tuple
+
+import click  # type: ignore
+
+from benchmarks.deck import DEFAULT_SPEC, DeckSpec, generate_deck
+from markdown_flashcards.history import connect
+from markdown_flashcards.cards import ClozeVariant, NormalCard
+from markdown_flashcards.parsing import CardTypes, ParseCache, scan_markdown_files
+from markdown_flashcards.session import ReviewSession
+
+STARTUP_PHASES = ["database load", "scan", "parse", "graph build", "queue build"]
+
+
+def run_quiz(directory: Path) -> dict:
+    """
+    Run `quiz` until its first prompt and return its profile, with the wall-clock time of the whole process.
+    """
+    profile_path = directory / "profile.json"
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "markdown_flashcards.main",
+            str(directory),
+            "--prefetch",
+            "0",
+            "--profile-json",
+            str(profile_path),
+        ],
+        cwd=directory,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+    )
+    profile = json.loads(profile_path.read_text())
+    profile["process_seconds"] = time.perf_counter() - start
+    return profile
+
+
+def sample_cards(directory: Path, sample: int, seed: int):
+    card_paths = scan_markdown_files(directory)
+    relative_paths = [str(path.relative_to(directory)) for path in card_paths]
+    con = connect(directory)
+    parse_cache = ParseCache(con)
+    parsed_cards = parse_cache.get_all(directory, card_paths, relative_paths)
+    cards = []
+    for relative_path in random.Random(seed).sample(
+        relative_paths, min(sample, len(relative_paths))
+    ):
+        parsed = parse_cache.with_body(relative_path)
+        if parsed.kind == CardTypes.NORMAL:
+            cards.append(
+                NormalCard(
+                    relative_path,
+                    [],
+                    None,
+                    None,
+                    None,
+                    parsed.front,
+                    parsed.back,
+                )
+            )
+        elif parsed.occlusion_numbers:
+            cards.append(
+                ClozeVariant(
+                    relative_path,
+                    [],
+                    None,
+                    None,
+                    None,
+                    parsed.cloze_front,
+                    parsed.occlusion_numbers[0],
+                )
+            )
+    con.close()
+    del parsed_cards
+    return cards
+
+
+def render_throughput(directory: Path, cards) -> float:
+    from rich.console import Console  # type: ignore
+
+    from markdown_flashcards.rendering import CARD_THEME
+
+    console = Console(file=io.StringIO(), theme=CARD_THEME, width=100)
+    start = time.perf_counter()
+    for card in cards:
+        for component in card.get_displayed_question(directory):
+            console.print(component)
+        for component in card.get_displayed_answer(directory):
+            console.print(component)
+    return len(cards) / (time.perf_counter() - start)
+
+
+def replay_throughput(directory: Path, flush_every: int) -> Tuple[int, float]:
+    """
+    Rate every due card through `ReviewSession`, as `quiz` would without the terminal.
+    Returns the number of ratings and ratings per second.
+    """
+    rng = random.Random(0)
+    with ReviewSession(directory) as session:
+        session.start()
+        start = time.perf_counter()
+        ratings = 0
+        for card in session.due_cards():
+            session.rate(card, rng.randint(1, 4))
+            ratings += 1
+            if ratings % flush_every == 0:
+                session.flush()
+        session.flush()
+        elapsed = time.perf_counter() - start
+    return ratings, ratings / elapsed
+
+
+@click.command()
+@click.option(
+    "--sizes", default="1000,10000", help="Comma-separated deck sizes, up to 200000."
+)
+@click.option("--cloze-ratio", default=DEFAULT_SPEC.cloze_ratio)
+@click.option("--max-occlusions", default=DEFAULT_SPEC.max_occlusions)
+@click.option("--depth", default=DEFAULT_SPEC.depth)
+@click.option("--fan-out", default=DEFAULT_SPEC.fan_out)
+@click.option("--image-ratio", default=DEFAULT_SPEC.image_ratio)
+@click.option("--history-ratio", default=DEFAULT_SPEC.history_ratio)
+@click.option("--render-sample", default=200, help="Cards rendered per deck.")
+@click.option(
+    "--flush-every",
+    default=1,
+    help="Ratings per database commit, 1 is what quiz does.",
+)
+@click.option(
+    "--json",
+    "json_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write the results to this file.",
+)
+def main(
+    sizes,
+    cloze_ratio,
+    max_occlusions,
+    depth,
+    fan_out,
+    image_ratio,
+    history_ratio,
+    render_sample,
+    flush_every,
+    json_path,
+):
+    results = []
+    for size in map(int, sizes.split(",")):
+        spec = DeckSpec(
+            cards=size,
+            cloze_ratio=cloze_ratio,
+            max_occlusions=max_occlusions,
+            depth=depth,
+            fan_out=fan_out,
+            image_ratio=image_ratio,
+            history_ratio=history_ratio,
+        )
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            directory = Path(temporary_directory)
+            start = time.perf_counter()
+            generate_deck(directory, spec)
+            print(f"{size} cards generated in {time.perf_counter() - start:.1f}s")
+            cold = run_quiz(directory)
+            warm = run_quiz(directory)
+            cards = sample_cards(directory, render_sample, spec.seed)
+            result = {
+                "spec": spec._asdict(),
+                "cold_start": cold,
+                "warm_start": warm,
+                "renders_per_second": render_throughput(directory, cards),
+            }
+            result["ratings"], result["ratings_per_second"] = replay_throughput(
+                directory, flush_every
+            )
+        results.append(result)
+        for name in ["cold_start", "warm_start"]:
+            phases = result[name]["phases"]
+            breakdown = ", ".join(
+                f"{phase} {phases[phase]['total_seconds']:.2f}s"
+                for phase in STARTUP_PHASES
+                if phase in phases
+            )
+            print(
+                f"  {name.replace('_', ' ')}: {result[name]['process_seconds']:.2f}s "
+                f"({breakdown}), {result[name]['counts'].get('queued cards', 0)} queued"
+            )
+        print(f"  render: {result['renders_per_second']:.0f} cards/s")
+        print(
+            f"  replay: {result['ratings']} ratings, {result['ratings_per_second']:.0f} ratings/s"
+        )
+    if json_path:
+        json_path.write_text(json.dumps(results, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import datetime
+import logging
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
+
+# rich and textual_image are imported where they are used
+# so --help and sessions with nothing due don't pay for them
+if TYPE_CHECKING:
+    from rich.markdown import Markdown  # type: ignore
+    from textual_image.renderable import Image  # type: ignore
+
+from markdown_flashcards.cloze import render_cloze, tokenize_cloze
+from markdown_flashcards.history import encode_history_row, upsert_history_rows
+from markdown_flashcards.images import IMAGE_CACHE, resolve_image_path
+from markdown_flashcards.parsing import CardBodies, CardTypes
+from markdown_flashcards.scheduling import compute_due_date
+
+START_TIME = datetime.datetime.now()
+TODAY = START_TIME.date()
+LOGGER = logging.getLogger(__name__)
+MD_IMG_REGEX = re.compile(r"!\[[^\]]*\]\((?P<path>[^\)]*)\)")
+
+
+def can_mark(front: str) -> bool:
+    # the highlight works on Markdown segments, so an occlusion around an image would leave its markers as text
+    return not MD_IMG_REGEX.search(front)
+
+
+def substitute_images_in_md_text(
+    directory: Path, relative_card_path: Path, source: str
+) -> List[Union["Markdown", "Image"]]:
+    from markdown_flashcards.rendering import CardMarkdown
+
+    # would be nicer if this was actually based on parse tree
+    # but this'll work fine in practice
+    document_path = directory / relative_card_path
+    segments = MD_IMG_REGEX.split(source)
+    replacements = []
+    for index, segment in enumerate(segments, start=0):
+        LOGGER.debug("Processing segment %s", segment)
+        if index % 2:
+            image_path = segment
+            if image_path.startswith("./") or image_path.startswith("../"):
+                absolute_image_path = resolve_image_path(
+                    document_path.parent, image_path
+                )
+            else:
+                # an absolute image_path replaces directory
+                absolute_image_path = resolve_image_path(directory, image_path)
+            # already imported on the main thread by quiz, because importing it queries the terminal
+            from textual_image.renderable import Image  # type: ignore
+
+            # decoded once per file, not once per display
+            replacements.append(Image(IMAGE_CACHE.get(absolute_image_path)))
+        else:
+            replacements.append(CardMarkdown(segment))
+    return replacements
+
+
+class Card(ABC):
+    # cards are never modified, only replaced (see update_with_confidence_score)
+    # so the due date and everything derived from it is computed once, in __init__
+    __slots__ = (
+        "relative_path",
+        "tags",
+        "last_review_date",
+        "confidence_score",
+        "previous_time_delta",
+        "due_date",
+        "is_due_at_start",
+        "is_due_today",
+    )
+
+    def __init__(
+        self,
+        relative_path,
+        tags,
+        last_review_date,
+        confidence_score,
+        previous_time_delta,
+    ):
+        self.relative_path = relative_path
+        self.tags = tags
+        self.last_review_date = last_review_date
+        self.confidence_score = confidence_score
+        self.previous_time_delta = previous_time_delta
+        self.due_date: datetime.datetime = (
+            compute_due_date(last_review_date, confidence_score, previous_time_delta)
+            or START_TIME
+        )
+        # not using a normal `is_due` because now() would be used in comparisons
+        self.is_due_at_start = self.due_date <= START_TIME
+        self.is_due_today = self.due_date.date() <= TODAY
+
+    @abstractmethod
+    def get_displayed_question(
+        self, topics_directory: Path
+    ) -> List[Union["Markdown", "Image"]]:
+        return NotImplemented
+
+    @abstractmethod
+    def get_displayed_answer(
+        self, topics_directory: Path
+    ) -> List[Union["Markdown", "Image"]]:
+        return NotImplemented
+
+    @abstractmethod
+    def update_with_confidence_score(self, score):
+        return NotImplemented
+
+    @abstractmethod
+    def history_row(self):
+        return NotImplemented
+
+    def upsert(self, cur):
+        upsert_history_rows(cur, [self.history_row()])
+
+
+class NormalCard(Card):
+    __slots__ = ("_front", "_back", "bodies")
+
+    def __init__(
+        self,
+        relative_path,
+        tags,
+        last_review_date,
+        confidence_score,
+        previous_time_delta,
+        front,
+        back,
+        bodies: Optional[CardBodies] = None,
+    ):
+        super().__init__(
+            relative_path,
+            tags,
+            last_review_date,
+            confidence_score,
+            previous_time_delta,
+        )
+        # with `bodies`, front and back can be None and are only read when displayed
+        self._front = front
+        self._back = back
+        self.bodies = bodies
+
+    @property
+    def front(self):
+        if self._front is None and self.bodies:
+            return self.bodies.get(self.relative_path).front
+        return self._front
+
+    @property
+    def back(self):
+        if self._back is None and self.bodies:
+            return self.bodies.get(self.relative_path).back
+        return self._back
+
+    def get_displayed_question(self, topics_directory):
+        return substitute_images_in_md_text(
+            topics_directory, self.relative_path, self.front
+        )
+
+    def get_displayed_answer(self, topics_directory):
+        return substitute_images_in_md_text(
+            topics_directory, self.relative_path, self.back
+        )
+
+    def update_with_confidence_score(self, score):
+        now = datetime.datetime.now()
+        return NormalCard(
+            self.relative_path,
+            self.tags,
+            now,
+            score,
+            now - self.last_review_date if self.last_review_date else now - START_TIME,
+            self._front,
+            self._back,
+            self.bodies,
+        )
+
+    def history_row(self):
+        return encode_history_row(
+            CardTypes.NORMAL,
+            0,
+            self.relative_path,
+            self.last_review_date,
+            self.confidence_score,
+            self.previous_time_delta,
+        )
+
+
+class ClozeVariant(Card):
+    __slots__ = ("_front", "variant_number", "bodies")
+
+    def __init__(
+        self,
+        relative_path,
+        tags,
+        last_review_date,
+        confidence_score,
+        previous_time_delta,
+        front,
+        variant_number,
+        bodies: Optional[CardBodies] = None,
+    ):
+        super().__init__(
+            relative_path,
+            tags,
+            last_review_date,
+            confidence_score,
+            previous_time_delta,
+        )
+        # with `bodies`, front can be None and is only read when displayed
+        self._front = front
+        self.variant_number = variant_number
+        self.bodies = bodies
+
+    @property
+    def front(self):
+        if self._front is None and self.bodies:
+            return self.bodies.get(self.relative_path).cloze_front
+        return self._front
+
+    def get_displayed_question(self, topics_directory):
+        LOGGER.debug(
+            "Displaying a Cloze card. Variant number is %s. Type of self.variant_number is %s",
+            self.variant_number,
+            type(self.variant_number),
+        )
+        front = self.front
+        # shared by all variants of the card, see tokenize_cloze
+        tokens = tokenize_cloze(front)
+        if tokens is None:
+            from markdown_flashcards.rendering import CardMarkdown
+
+            return [CardMarkdown("Error: mismatched opening occlusion")]
+        return substitute_images_in_md_text(
+            topics_directory,
+            self.relative_path,
+            render_cloze(tokens, self.variant_number, mark=can_mark(front)),
+        )
+
+    def get_displayed_answer(self, topics_directory):
+        front = self.front
+        tokens = tokenize_cloze(front)
+        if tokens is None:
+            from markdown_flashcards.rendering import CardMarkdown
+
+            return [CardMarkdown("Error: mismatched opening occlusion")]
+        return substitute_images_in_md_text(
+            topics_directory,
+            self.relative_path,
+            # highlight what was hidden in the question
+            render_cloze(
+                tokens, self.variant_number, reveal=True, mark=can_mark(front)
+            ),
+        )
+
+    def update_with_confidence_score(self, score):
+        now = datetime.datetime.now()
+        return ClozeVariant(
+            self.relative_path,
+            self.tags,
+            now,
+            score,
+            now - self.last_review_date if self.last_review_date else now - START_TIME,
+            self._front,
+            self.variant_number,
+            self.bodies,
+        )
+
+    def history_row(self):
+        return encode_history_row(
+            CardTypes.CLOZE,
+            self.variant_number,
+            self.relative_path,
+            self.last_review_date,
+            self.confidence_score,
+            self.previous_time_delta,
+        )
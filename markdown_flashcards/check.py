@@ -0,0 +1,216 @@
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from markdown_flashcards.cloze import tokenize_cloze
+from markdown_flashcards.dependencies import DependencyGraph
+from markdown_flashcards.history import (
+    SCHEMA_VERSION,
+    connect_read_only,
+    create_cards_table,
+    load_card_types,
+    schema_version,
+    snapshot,
+)
+from markdown_flashcards.parsing import (
+    PARSE_CACHE_TABLES,
+    CardTypes,
+    ParseCache,
+    ParsedCard,
+    scan_markdown_files,
+)
+
+
+class Problem(NamedTuple):
+    """
+    Something about a card that `quiz` would complain about halfway through a session, or skip without saying.
+    """
+
+    relative_path: str
+    # e.g. "missing-dependency", for filtering the JSON output
+    kind: str
+    message: str
+
+
+def parse_deck(
+    parse_cache: ParseCache,
+    directory: Path,
+    card_paths: List[Path],
+    relative_paths: List[str],
+    jobs: int,
+) -> Tuple[Dict[str, ParsedCard], List[Problem]]:
+    try:
+        return parse_cache.get_all(directory, card_paths, relative_paths, jobs=jobs), []
+    except Exception:
+        # some file can't be parsed, find out which ones without giving up on the others
+        pass
+    parsed_cards = {}
+    problems = []
+    for card_path, relative_path in zip(card_paths, relative_paths):
+        try:
+            parsed_cards[relative_path] = parse_cache.get(
+                directory, card_path, relative_path
+            )
+        except Exception as error:
+            problems.append(
+                Problem(relative_path, "unparseable", f"Cannot be parsed: {error}")
+            )
+    return parsed_cards, problems
+
+
+def check_card(parsed_card: ParsedCard, present: Set[str]) -> List[Problem]:
+    relative_path = parsed_card.relative_path
+    problems = [
+        Problem(
+            relative_path,
+            "missing-dependency",
+            f"Depends on {dependency}, but there is no Markdown file with this path.",
+        )
+        for dependency in map(str, parsed_card.dependencies)
+        if dependency not in present
+    ]
+    if parsed_card.kind is None:
+        problems.append(
+            Problem(
+                relative_path,
+                "no-pattern",
+                "Does not match either the normal or the cloze pattern.",
+            )
+        )
+    elif parsed_card.kind == CardTypes.CLOZE:
+        if not parsed_card.occlusion_numbers:
+            problems.append(
+                Problem(
+                    relative_path, "no-occlusions", "Cloze card without occlusions."
+                )
+            )
+        elif tokenize_cloze(parsed_card.cloze_front) is None:
+            problems.append(
+                Problem(
+                    relative_path,
+                    "unclosed-occlusion",
+                    "An occlusion is never closed, check the braces after every £{c...:.",
+                )
+            )
+    return problems
+
+
+def check_cycles(dependency_graph: DependencyGraph) -> List[Problem]:
+    return [
+        Problem(
+            cycle[0],
+            "dependency-cycle",
+            "Depends on itself."
+            if len(cycle) == 1
+            else f"Depends on itself through {', '.join(cycle[1:])}.",
+        )
+        for cycle in dependency_graph.cycles()
+    ]
+
+
+def check_history(
+    card_types: Dict[str, Dict[int, str]],
+    parsed_cards: Dict[str, ParsedCard],
+    present: Set[str],
+) -> List[Problem]:
+    """
+    Compare the rows in `Cards` with the files, like `ReviewSession` does when it queues cards.
+    """
+    problems = []
+    for relative_path, db_card_types in sorted(card_types.items()):
+        parsed_card = parsed_cards.get(relative_path)
+        if relative_path not in present:
+            problems.append(
+                Problem(
+                    relative_path,
+                    "missing-file",
+                    "Is in the database, but there is no Markdown file with this path.",
+                )
+            )
+            continue
+        if parsed_card is None or parsed_card.kind is None:
+            # reported already
+            continue
+        card_types_in_db = set(db_card_types.values())
+        if len(card_types_in_db) > 1:
+            message = "The database has more than one card type for this card."
+        elif CardTypes.NORMAL in card_types_in_db and len(db_card_types) > 1:
+            message = "A normal card according to the database, but it has rows for several cloze variants."
+        elif CardTypes.NORMAL in card_types_in_db:
+            if parsed_card.kind == CardTypes.NORMAL:
+                continue
+            message = "A normal card according to the database, but it does not match the pattern for a normal card."
+        elif set(parsed_card.occlusion_numbers) != set(db_card_types):
+            message = f"Uses occlusion numbers {sorted(parsed_card.occlusion_numbers)}, but the database has {sorted(db_card_types)}."
+        else:
+            continue
+        problems.append(Problem(relative_path, "database-mismatch", message))
+    return problems
+
+
+def open_history(directory: Path) -> Tuple[sqlite3.Connection, bool]:
+    """
+    The database of `directory`, read-only, and whether that is the file itself.
+
+    Like `forecast.load_forecast`, an in-memory copy is only made when it has to be written to first: to migrate it, to add the parse cache, or because there is no database yet.
+    """
+    if (directory / "learning-history.db").exists():
+        con = connect_read_only(directory)
+        cur = con.cursor()
+        tables = {
+            name
+            for (name,) in cur.execute(
+                "select name from sqlite_master where type='table'"
+            )
+        }
+        if schema_version(cur) == SCHEMA_VERSION and tables.issuperset(
+            PARSE_CACHE_TABLES
+        ):
+            return con, True
+        con.close()
+    con = snapshot(directory)
+    # migrates the copy if needed
+    create_cards_table(con.cursor())
+    return con, False
+
+
+def check_deck(
+    directory: Path, jobs: int = 1, verify_hashes: bool = False
+) -> List[Problem]:
+    """
+    Every problem with the cards in `directory` and their history, sorted by path.
+
+    The database is only read, so the parse cache in it is used but not updated.
+    """
+    con, read_only = open_history(directory)
+    try:
+        cur = con.cursor()
+        parse_cache = ParseCache(con, verify_hashes=verify_hashes, read_only=read_only)
+        card_paths = scan_markdown_files(directory)
+        relative_paths = [
+            str(card_path.relative_to(directory, walk_up=True))
+            for card_path in card_paths
+        ]
+        present = set(relative_paths)
+        parsed_cards, problems = parse_deck(
+            parse_cache, directory, card_paths, relative_paths, jobs
+        )
+        dependency_graph = DependencyGraph()
+        for relative_path, parsed_card in parsed_cards.items():
+            if parsed_card.kind == CardTypes.CLOZE:
+                # the front is needed to check the braces
+                parsed_card = parse_cache.read_body(relative_path)
+            problems.extend(check_card(parsed_card, present))
+            dependency_graph.set_dependencies(
+                relative_path,
+                [
+                    dependency
+                    for dependency in map(str, parsed_card.dependencies)
+                    if dependency in present
+                ],
+            )
+        problems.extend(check_cycles(dependency_graph))
+        problems.extend(check_history(load_card_types(cur), parsed_cards, present))
+    finally:
+        con.close()
+    return sorted(problems)
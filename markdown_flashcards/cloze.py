@@ -0,0 +1,83 @@
+import functools
+import re
+from typing import List, Optional, Tuple, Union
+
+# the start of an occlusion, or a brace that may close one
+CLOZE_TOKEN_REGEX = re.compile(r"£{c(?P<occlusion_number>\d+):|(?P<brace>[{}])")
+
+# text, the number of an occlusion that starts here, or None where an occlusion ends
+ClozeToken = Union[str, int, None]
+
+
+@functools.lru_cache(maxsize=256)
+def tokenize_cloze(front: str) -> Optional[Tuple[ClozeToken, ...]]:
+    """
+    Split the front of a cloze card into text and occlusion boundaries, in a single pass.
+
+    Occlusions can be nested, and other braces inside an occlusion have to be balanced before it is closed.
+    Returns `None` if an occlusion is never closed.
+    Cached on the text, so all variants of a card share one token list.
+    """
+    tokens: List[ClozeToken] = []
+    # True for an open occlusion, False for an open brace inside one
+    open_brackets: List[bool] = []
+    position = 0
+    for match in CLOZE_TOKEN_REGEX.finditer(front):
+        if match.start() > position:
+            tokens.append(front[position : match.start()])
+        position = match.end()
+        brace = match.group("brace")
+        if brace is None:
+            tokens.append(int(match.group("occlusion_number")))
+            open_brackets.append(True)
+        elif not open_brackets:
+            # braces outside of occlusions are just text
+            tokens.append(brace)
+        elif brace == "{":
+            tokens.append(brace)
+            open_brackets.append(False)
+        elif open_brackets.pop():
+            tokens.append(None)
+        else:
+            tokens.append(brace)
+    if open_brackets:
+        return None
+    if position < len(front):
+        tokens.append(front[position:])
+    return tuple(tokens)
+
+
+def render_cloze(
+    tokens: Tuple[ClozeToken, ...],
+    variant_number: Optional[int],
+    reveal: bool = False,
+    mark: bool = False,
+) -> str:
+    """
+    The text with occlusion `variant_number` replaced by `[...]` and every other occlusion by its contents.
+
+    Occlusions nested in the hidden one are hidden along with it.
+    With `reveal`, the occlusion's contents are shown instead, which is the answer side of the variant.
+    With `mark`, what is shown in its place stays wrapped in `£{c...:...}`, for the highlight rule in `rendering`.
+    """
+    parts: List[str] = []
+    # how many occlusions deep into the variant's occlusion we are
+    depth = 0
+    for token in tokens:
+        if isinstance(token, str):
+            if reveal or not depth:
+                parts.append(token)
+        elif token is None:
+            if depth:
+                depth -= 1
+                if not depth and reveal and mark:
+                    parts.append("}")
+        elif depth:
+            depth += 1
+        elif token == variant_number:
+            depth = 1
+            if not reveal:
+                parts.append(f"£{{c{token}:[...]}}" if mark else "[...]")
+            elif mark:
+                parts.append(f"£{{c{token}:")
+    return "".join(parts)
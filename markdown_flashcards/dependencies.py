@@ -0,0 +1,380 @@
+from array import array
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    import networkx as nx  # type: ignore
+
+
+class PathTable:
+    """
+    Relative paths interned as small integer ids, in order of first use.
+
+    Ids are never reused, so they stay valid when a card is removed.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.paths: List[str] = []
+
+    def intern(self, relative_path: str) -> int:
+        identifier = self.ids.get(relative_path)
+        if identifier is None:
+            identifier = self.ids[relative_path] = len(self.paths)
+            self.paths.append(relative_path)
+        return identifier
+
+    def __getitem__(self, identifier: int) -> str:
+        return self.paths[identifier]
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+class DependencyGraph:
+    """
+    Which cards every card depends on, with edges from a card to its dependencies.
+    """
+
+    def __init__(self):
+        self.path_table = PathTable()
+        self._alive = bytearray()
+        # CSR: the dependencies of node i are targets[offsets[i]:offsets[i + 1]], the same in reverse for dependents
+        self._offsets = array("i", [0])
+        self._targets = array("i")
+        self._reverse_offsets = array("i", [0])
+        self._reverse_targets = array("i")
+        # node id -> dependency ids, for nodes edited since the arrays were built
+        # the first read after an edit rebuilds the arrays, so patch the graph in one go
+        self._edits: Dict[int, List[int]] = {}
+        self._stale = False
+
+    def add_node(self, relative_path: str) -> int:
+        identifier = self.path_table.intern(relative_path)
+        if identifier >= len(self._alive):
+            self._alive.extend(bytes(identifier + 1 - len(self._alive)))
+        if not self._alive[identifier]:
+            self._alive[identifier] = 1
+            self._edits[identifier] = []
+            self._stale = True
+        return identifier
+
+    def set_dependencies(self, relative_path: str, dependencies: Iterable[str]) -> None:
+        """
+        Replace the dependencies of a card, adding it and them as nodes where needed.
+        """
+        identifier = self.add_node(relative_path)
+        self._edits[identifier] = sorted(
+            {self.add_node(dependency) for dependency in dependencies}
+        )
+        self._stale = True
+
+    def remove_node(self, relative_path: str) -> None:
+        """
+        Remove a card along with the edges from and to it.
+        """
+        identifier = self.path_table.ids.get(relative_path)
+        if identifier is not None and self._alive[identifier]:
+            self._alive[identifier] = 0
+            self._edits.pop(identifier, None)
+            self._stale = True
+
+    def _build(self) -> None:
+        if not self._stale:
+            return
+        number_of_nodes = len(self._alive)
+        alive = self._alive
+        offsets = array("i", [0]) * (number_of_nodes + 1)
+        targets = array("i")
+        old_offsets, old_targets = self._offsets, self._targets
+        for identifier in range(number_of_nodes):
+            if alive[identifier]:
+                edited = self._edits.get(identifier)
+                if edited is None:
+                    edited = old_targets[
+                        old_offsets[identifier] : old_offsets[identifier + 1]
+                    ]
+                # edges to removed nodes go with them
+                targets.extend(target for target in edited if alive[target])
+            offsets[identifier + 1] = len(targets)
+        # the same edges the other way around, with a counting sort
+        reverse_offsets = array("i", [0]) * (number_of_nodes + 1)
+        for target in targets:
+            reverse_offsets[target + 1] += 1
+        for identifier in range(number_of_nodes):
+            reverse_offsets[identifier + 1] += reverse_offsets[identifier]
+        reverse_targets = array("i", [0]) * len(targets)
+        position = array("i", reverse_offsets[:-1])
+        for identifier in range(number_of_nodes):
+            for index in range(offsets[identifier], offsets[identifier + 1]):
+                target = targets[index]
+                reverse_targets[position[target]] = identifier
+                position[target] += 1
+        self._offsets, self._targets = offsets, targets
+        self._reverse_offsets, self._reverse_targets = reverse_offsets, reverse_targets
+        self._edits = {}
+        self._stale = False
+
+    def __contains__(self, relative_path) -> bool:
+        identifier = self.path_table.ids.get(relative_path)
+        return identifier is not None and self._alive[identifier] == 1
+
+    def __len__(self) -> int:
+        return sum(self._alive)
+
+    @property
+    def nodes(self) -> List[str]:
+        return [
+            self.path_table[identifier]
+            for identifier in range(len(self._alive))
+            if self._alive[identifier]
+        ]
+
+    def number_of_edges(self) -> int:
+        self._build()
+        return len(self._targets)
+
+    def csr(self) -> Tuple[array, array]:
+        """
+        The `offsets` and `targets` arrays, for loops that would otherwise slice them for every node.
+        """
+        self._build()
+        return self._offsets, self._targets
+
+    def successor_ids(self, identifier: int) -> array:
+        self._build()
+        return self._targets[self._offsets[identifier] : self._offsets[identifier + 1]]
+
+    def predecessor_ids(self, identifier: int) -> array:
+        self._build()
+        return self._reverse_targets[
+            self._reverse_offsets[identifier] : self._reverse_offsets[identifier + 1]
+        ]
+
+    def successors(self, relative_path: str) -> List[str]:
+        return [
+            self.path_table[identifier]
+            for identifier in self.successor_ids(self.path_table.ids[relative_path])
+        ]
+
+    def predecessors(self, relative_path: str) -> List[str]:
+        return [
+            self.path_table[identifier]
+            for identifier in self.predecessor_ids(self.path_table.ids[relative_path])
+        ]
+
+    def _reachable(self, start: Iterable[int], reverse: bool) -> Set[int]:
+        self._build()
+        offsets, targets = (
+            (self._reverse_offsets, self._reverse_targets)
+            if reverse
+            else (self._offsets, self._targets)
+        )
+        seen: Set[int] = set()
+        pending = list(start)
+        while pending:
+            identifier = pending.pop()
+            for index in range(offsets[identifier], offsets[identifier + 1]):
+                target = targets[index]
+                if target not in seen:
+                    seen.add(target)
+                    pending.append(target)
+        return seen
+
+    def descendants(self, relative_path: str) -> Set[str]:
+        """
+        What a card depends on, directly or not, like `nx.descendants`.
+        """
+        start = self.path_table.ids[relative_path]
+        # a card in a cycle reaches itself, but is not its own descendant
+        return {
+            self.path_table[identifier]
+            for identifier in self._reachable([start], reverse=False) - {start}
+        }
+
+    def ancestor_ids(self, identifiers: Iterable[int]) -> Set[int]:
+        """
+        The nodes that depend on any of `identifiers`, directly or not.
+        """
+        return self._reachable(identifiers, reverse=True)
+
+    def ancestors(self, relative_path: str) -> Set[str]:
+        start = self.path_table.ids[relative_path]
+        return {
+            self.path_table[identifier]
+            for identifier in self.ancestor_ids([start]) - {start}
+        }
+
+    def strongly_connected_components(
+        self, identifiers: Optional[Iterable[int]] = None
+    ) -> List[List[int]]:
+        """
+        The strongly connected components of the graph, or of the subgraph of `identifiers`, dependencies first.
+
+        This is Tarjan's algorithm with an explicit stack, which finds a component only after every component it depends on.
+        """
+        self._build()
+        number_of_nodes = len(self._alive)
+        offsets, targets = self._offsets, self._targets
+        if identifiers is None:
+            included = self._alive
+            roots: Iterable[int] = range(number_of_nodes)
+        else:
+            roots = sorted(identifiers)
+            included = bytearray(number_of_nodes)
+            for identifier in roots:
+                included[identifier] = 1
+        order = array("i", [-1]) * number_of_nodes
+        lowest = array("i", [0]) * number_of_nodes
+        on_stack = bytearray(number_of_nodes)
+        stack: List[int] = []
+        components: List[List[int]] = []
+        counter = 0
+        for root in roots:
+            if not included[root] or order[root] != -1:
+                continue
+            order[root] = lowest[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            work = [(root, offsets[root])]
+            while work:
+                node, index = work[-1]
+                end = offsets[node + 1]
+                while index < end:
+                    target = targets[index]
+                    index += 1
+                    if not included[target]:
+                        continue
+                    if order[target] == -1:
+                        work[-1] = (node, index)
+                        order[target] = lowest[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack[target] = 1
+                        work.append((target, offsets[target]))
+                        break
+                    if on_stack[target] and order[target] < lowest[node]:
+                        lowest[node] = order[target]
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        if lowest[node] < lowest[parent]:
+                            lowest[parent] = lowest[node]
+                    if lowest[node] == order[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = 0
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        return components
+
+    def cycles(self) -> List[List[str]]:
+        """
+        The groups of cards that depend on each other, including cards that depend on themselves.
+        """
+        return [
+            sorted(self.path_table[identifier] for identifier in component)
+            for component in self.strongly_connected_components()
+            if len(component) > 1 or component[0] in self.successor_ids(component[0])
+        ]
+
+    def to_networkx(self) -> "nx.DiGraph":
+        import networkx as nx  # type: ignore
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_edges_from(
+            (relative_path, dependency)
+            for relative_path in self.nodes
+            for dependency in self.successors(relative_path)
+        )
+        return graph
+
+    @classmethod
+    def from_networkx(cls, graph: "nx.DiGraph") -> "DependencyGraph":
+        dependency_graph = cls()
+        for node in graph.nodes:
+            dependency_graph.set_dependencies(node, graph.successors(node))
+        return dependency_graph
+
+
+class DependencyLayers:
+    """
+    The layer of every node of a `DependencyGraph`, dependencies in lower layers.
+    """
+
+    def __init__(self, dependency_graph: DependencyGraph):
+        self.graph = dependency_graph
+        # in topological order, dependencies first
+        self.paths: List[str] = []
+        self.layers: Dict[str, int] = {}
+        # by node id
+        self._layers = array("i")
+        self._grow()
+        components = dependency_graph.strongly_connected_components()
+        self.paths.extend(
+            dependency_graph.path_table[identifier]
+            for component in components
+            for identifier in sorted(component)
+        )
+        self._close(components)
+
+    def _grow(self) -> None:
+        # room for every node id in the graph, at once
+        missing = len(self.graph.path_table) - len(self._layers)
+        if missing > 0:
+            self._layers.frombytes(bytes(missing * self._layers.itemsize))
+
+    def _close(self, components: List[List[int]]) -> None:
+        """
+        Compute the layer of every node in `components`, which come dependencies first.
+
+        The layers of dependencies outside of `components` are taken as they are.
+        """
+        layers = self._layers
+        offsets, targets = self.graph.csr()
+        path_table = self.graph.path_table
+        for component in components:
+            members = set(component)
+            layer = 0
+            for identifier in component:
+                for index in range(offsets[identifier], offsets[identifier + 1]):
+                    target = targets[index]
+                    if target not in members and layers[target] >= layer:
+                        layer = layers[target] + 1
+            for identifier in component:
+                layers[identifier] = layer
+                self.layers[path_table[identifier]] = layer
+
+    def update(
+        self,
+        dependency_graph: DependencyGraph,
+        changed: Iterable[str],
+        removed: Iterable[str] = (),
+    ) -> Set[str]:
+        """
+        Catch up with `dependency_graph` after the dependencies of the nodes in `changed` were edited, new nodes included, and the nodes in `removed` were taken out.
+
+        Only `changed` and the nodes that transitively depend on them are recomputed, the rest is still valid.
+        A removed node's dependents have lost an edge, so they have to be in `changed` as well.
+        Returns the recomputed nodes, whose layer may have changed.
+        """
+        path_table = dependency_graph.path_table
+        for node in removed:
+            self.layers.pop(node, None)
+        changed_ids = {
+            path_table.ids[node] for node in changed if node in dependency_graph
+        }
+        affected_ids = changed_ids | dependency_graph.ancestor_ids(changed_ids)
+        self._grow()
+        for identifier in sorted(
+            affected_ids, key=lambda identifier: path_table[identifier]
+        ):
+            if path_table[identifier] not in self.layers:
+                self.paths.append(path_table[identifier])
+        self._close(dependency_graph.strongly_connected_components(affected_ids))
+        return {path_table[identifier] for identifier in affected_ids}
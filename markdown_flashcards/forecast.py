@@ -0,0 +1,294 @@
+import datetime
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from markdown_flashcards.history import (
+    SCHEMA_VERSION,
+    connect_read_only,
+    create_cards_table,
+    schema_version,
+    snapshot,
+)
+from markdown_flashcards.scheduling import DEFAULT_POLICY, Policy
+
+SECONDS_PER_DAY = 24 * 60 * 60
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def wall_seconds(moment: datetime.datetime) -> float:
+    # a naive local datetime as seconds since 1970-01-01, so every day starts at a multiple of SECONDS_PER_DAY
+    return (moment - EPOCH).total_seconds()
+
+
+def local_wall_seconds(timestamps: np.ndarray) -> np.ndarray:
+    """
+    Unix timestamps in `wall_seconds` of the naive local datetimes that `decode_history_values` makes of them.
+    NaN stays NaN.
+    """
+    result = np.full_like(timestamps, np.nan)
+    valid = ~np.isnan(timestamps)
+    # UTC offsets only change on the quarter hour, so one lookup per quarter hour instead of one per row
+    quarters, inverse = np.unique(timestamps[valid] // 900, return_inverse=True)
+    offsets = np.fromiter(
+        (
+            wall_seconds(datetime.datetime.fromtimestamp(quarter * 900)) - quarter * 900
+            for quarter in quarters.tolist()
+        ),
+        dtype=np.float64,
+        count=len(quarters),
+    )
+    result[valid] = timestamps[valid] + offsets[inverse]
+    return result
+
+
+def due_dates(
+    last_review_dates: np.ndarray,
+    confidence_scores: np.ndarray,
+    previous_time_deltas: np.ndarray,
+    now,
+    policy: Policy = DEFAULT_POLICY,
+) -> np.ndarray:
+    """
+    `compute_due_date` for arrays of stored values, with dates in `wall_seconds` and time deltas in seconds.
+
+    Where `compute_due_date` returns `None`, or values are missing (NaN), the result is `now`, like for `Card.due_date`.
+    `now` is a number or an array of them.
+    """
+    last_review_dates = np.asarray(last_review_dates, dtype=np.float64)
+    confidence_scores = np.asarray(confidence_scores, dtype=np.float64)
+    previous_time_deltas = np.asarray(previous_time_deltas, dtype=np.float64)
+    # like decode_history_values, a score or time delta of 0 is missing
+    reviewed = (
+        ~np.isnan(last_review_dates)
+        & (np.nan_to_num(confidence_scores) != 0)
+        & (np.nan_to_num(previous_time_deltas) != 0)
+    )
+    start_of_day = np.floor(last_review_dates / SECONDS_PER_DAY) * SECONDS_PER_DAY
+    hard = np.maximum(
+        last_review_dates + policy.hard_minimum_minutes * 60,
+        last_review_dates + previous_time_deltas * policy.hard_factor,
+    )
+    good = np.minimum(
+        np.where(
+            previous_time_deltas >= policy.good_factor_from_days * SECONDS_PER_DAY,
+            last_review_dates + previous_time_deltas * policy.good_factor,
+            # round_timedelta_days_up, from midnight
+            start_of_day
+            + np.ceil(previous_time_deltas / SECONDS_PER_DAY) * SECONDS_PER_DAY,
+        ),
+        last_review_dates + policy.good_maximum_days * SECONDS_PER_DAY,
+    )
+    easy = np.minimum(
+        np.where(
+            previous_time_deltas >= policy.easy_factor_from_days * SECONDS_PER_DAY,
+            last_review_dates + previous_time_deltas * policy.easy_factor,
+            start_of_day + 2 * SECONDS_PER_DAY,
+        ),
+        last_review_dates + policy.easy_maximum_days * SECONDS_PER_DAY,
+    )
+    return np.select(
+        [
+            reviewed & (confidence_scores == 2),
+            reviewed & (confidence_scores == 3),
+            reviewed & (confidence_scores == 4),
+        ],
+        [hard, good, easy],
+        default=now,
+    )
+
+
+def day_numbers(moments: np.ndarray) -> np.ndarray:
+    # in wall_seconds, like date() for a datetime
+    return np.floor(moments / SECONDS_PER_DAY).astype(np.int64)
+
+
+# rows, rows due on the first day and rows due within the forecast
+Breakdown = Dict[str, Tuple[int, int, int]]
+
+
+class Forecast(NamedTuple):
+    """
+    How many reviews are coming, counting every cloze variant as a card, like the review queue does.
+
+    `daily` has the number of cards due on each day from `first_day`, where the first day includes the new and overdue cards.
+    `by_tag` is `None` if no session has filled the tag index yet.
+    """
+
+    first_day: datetime.date
+    daily: List[int]
+    cards: int
+    new: int
+    overdue: int
+    by_directory: Breakdown
+    by_tag: Optional[Breakdown]
+
+
+def breakdown(
+    names: List[str], groups: np.ndarray, weights: List[np.ndarray]
+) -> Breakdown:
+    """
+    The sums of each of the three `weights` per group, for the groups that have any rows.
+    """
+    sums = [
+        np.bincount(groups, weights=group_weights, minlength=len(names))
+        for group_weights in weights
+    ]
+    return {
+        name: (int(sums[0][index]), int(sums[1][index]), int(sums[2][index]))
+        for index, name in enumerate(names)
+        if sums[0][index]
+    }
+
+
+def numeric_columns(con: sqlite3.Connection, query: str) -> List[np.ndarray]:
+    """
+    The columns of `query`, which selects one `group_concat` of numbers per column, as float arrays.
+
+    One string per column parses much faster than a tuple per row. Use `ifnull(column, 'nan')` for nullable columns.
+    """
+    return [
+        np.fromstring(column or "", sep=",") for column in con.execute(query).fetchone()
+    ]
+
+
+def compute_forecast(
+    con: sqlite3.Connection, now: datetime.datetime, days: int
+) -> Forecast:
+    file_ids, last_review_dates, confidence_scores, previous_time_deltas = (
+        numeric_columns(
+            con,
+            "select group_concat(FileId), group_concat(ifnull(LastReviewDate, 'nan')), "
+            "group_concat(ifnull(ConfidenceScore, 'nan')), group_concat(ifnull(PreviousTimeDelta, 'nan')) "
+            "from Cards",
+        )
+    )
+    file_ids = file_ids.astype(np.int64)
+    last_review_dates = local_wall_seconds(last_review_dates)
+    due = due_dates(
+        last_review_dates, confidence_scores, previous_time_deltas, wall_seconds(now)
+    )
+    first_day = now.date()
+    day_offsets = day_numbers(due) - (first_day - EPOCH.date()).days
+    new = np.isnan(last_review_dates)
+    overdue = (day_offsets < 0) & ~new
+    day_offsets = np.maximum(day_offsets, 0)
+    weights = [
+        np.ones(len(file_ids)),
+        (day_offsets == 0).astype(np.float64),
+        (day_offsets < days).astype(np.float64),
+    ]
+    daily = np.bincount(day_offsets[day_offsets < days], minlength=days)
+
+    ids_in_files, relative_paths = con.execute(
+        "select group_concat(FileId), group_concat(RelativePath, char(0)) from Files"
+    ).fetchone()
+    files = np.fromstring(ids_in_files or "", sep=",").astype(np.int64)
+    number_of_files = int(files.max(initial=-1)) + 1
+    directories: Dict[str, int] = {}
+    # relative paths always use /, so this is os.path.dirname without the overhead
+    directory_ids = [
+        directories.setdefault(
+            relative_path.rpartition("/")[0] or ".", len(directories)
+        )
+        for relative_path in (relative_paths.split("\0") if relative_paths else [])
+    ]
+    directory_of_file = np.zeros(max(number_of_files, 1), dtype=np.int64)
+    directory_of_file[files] = directory_ids
+    by_directory = breakdown(list(directories), directory_of_file[file_ids], weights)
+
+    by_tag = None
+    has_tag_index = con.execute(
+        "select 1 from sqlite_master where type='table' and name='CardTags'"
+    ).fetchone()
+    if has_tag_index:
+        # a row for every pair of a tag and a card with that tag, like CardTags
+        tag_names, ids_with_tags = con.execute(
+            "select group_concat(Tag, char(0)), group_concat(FileId) "
+            "from CardTags join Files using (RelativePath)"
+        ).fetchone()
+        tags: Dict[str, int] = {}
+        tag_ids = np.array(
+            [
+                tags.setdefault(tag, len(tags))
+                for tag in (tag_names.split("\0") if tag_names else [])
+            ],
+            dtype=np.int64,
+        )
+        files_with_tags = np.fromstring(ids_with_tags or "", sep=",").astype(np.int64)
+        # per file first, then per tag through the pairs
+        per_file = [
+            np.bincount(file_ids, weights=row_weights, minlength=number_of_files)
+            for row_weights in weights
+        ]
+        by_tag = breakdown(
+            list(tags),
+            tag_ids,
+            [file_weights[files_with_tags] for file_weights in per_file],
+        )
+
+    return Forecast(
+        first_day,
+        [int(count) for count in daily],
+        len(file_ids),
+        int(new.sum()),
+        int(overdue.sum()),
+        by_directory,
+        by_tag,
+    )
+
+
+def load_forecast(directory: Path, now: datetime.datetime, days: int) -> Forecast:
+    """
+    The `Forecast` for the history in `directory`, which is only read.
+    """
+    con = connect_read_only(directory)
+    try:
+        if schema_version(con.cursor()) != SCHEMA_VERSION:
+            # migrate a copy, the next session migrates the file
+            con.close()
+            con = snapshot(directory)
+            create_cards_table(con.cursor())
+        return compute_forecast(con, now, days)
+    finally:
+        con.close()
+
+
+def print_forecast(forecast: Forecast) -> None:
+    from rich.console import Console  # type: ignore
+    from rich.table import Table  # type: ignore
+
+    console = Console()
+    days = len(forecast.daily)
+    console.print(
+        f"{forecast.cards} cards, {forecast.new} new, {forecast.overdue} overdue."
+    )
+    table = Table(title="Due per day")
+    table.add_column("Date", justify="left")
+    table.add_column("Due", justify="right")
+    for offset, count in enumerate(forecast.daily):
+        day = forecast.first_day + datetime.timedelta(days=offset)
+        table.add_row(
+            f"{day.isoformat()}{' (today, with new and overdue)' if not offset else ''}",
+            str(count),
+        )
+    console.print(table)
+    for title, counts in [
+        ("Per directory", forecast.by_directory),
+        ("Per tag", forecast.by_tag),
+    ]:
+        if counts is None:
+            console.print(
+                "No tags yet, they are indexed when a session parses the cards."
+            )
+            continue
+        table = Table(title=title)
+        table.add_column(title.split()[-1].capitalize(), justify="left")
+        table.add_column("Cards", justify="right")
+        table.add_column("Due today", justify="right")
+        table.add_column(f"Due within {days} days", justify="right")
+        for name, (cards, due_today, due_within) in sorted(counts.items()):
+            table.add_row(name, str(cards), str(due_today), str(due_within))
+        console.print(table)
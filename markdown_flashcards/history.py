@@ -0,0 +1,420 @@
+import datetime
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from markdown_flashcards.scheduling import compute_due_date
+
+
+class HistoryEntry(NamedTuple):
+    """
+    One decoded row of the `Cards` table.
+    """
+
+    relative_path: str
+    card_type: str
+    cloze_variant: int
+    last_review_date: Optional[datetime.datetime]
+    confidence_score: Optional[int]
+    previous_time_delta: Optional[datetime.timedelta]
+
+
+def encode_timestamp(moment: Optional[datetime.datetime]) -> Optional[int]:
+    # seconds since the Unix epoch, the naive datetimes in memory are local time
+    return int(moment.timestamp()) if moment else None
+
+
+def decode_history_values(
+    last_review_date: Optional[int],
+    confidence_score: Optional[int],
+    previous_time_delta: Optional[int],
+) -> Tuple[Optional[datetime.datetime], Optional[int], Optional[datetime.timedelta]]:
+    return (
+        datetime.datetime.fromtimestamp(last_review_date)
+        if last_review_date is not None
+        else None,
+        confidence_score or None,
+        datetime.timedelta(0, previous_time_delta) if previous_time_delta else None,
+    )
+
+
+def encode_due_date(
+    last_review_date: Optional[int],
+    confidence_score: Optional[int],
+    previous_time_delta: Optional[int],
+) -> Optional[int]:
+    # based on the stored values rather than the in-memory ones
+    # so this agrees with what Card.due_date will say after the next load
+    return encode_timestamp(
+        compute_due_date(
+            *decode_history_values(
+                last_review_date, confidence_score, previous_time_delta
+            )
+        )
+    )
+
+
+def create_legacy_cards_table(cur: sqlite3.Cursor) -> None:
+    """
+    Version 1: dates and intervals as text, including the precomputed `DueDate`.
+    """
+    cur.execute("""create table if not exists Cards(
+        CardType text,
+        ClozeVariant integer,
+        RelativePath text,
+        LastReviewDate text,
+        ConfidenceScore integer,
+        PreviousTimeDelta text,
+        DueDate text,
+        primary key (ClozeVariant, RelativePath)
+        )""")
+    columns = {row[1] for row in cur.execute("pragma table_info(Cards)")}
+    if "DueDate" not in columns:
+        # databases from before DueDate was precomputed, it is filled in by the next migration
+        cur.execute("alter table Cards add column DueDate text")
+    # NULL means due right away
+    cur.execute("create index if not exists CardsByDueDate on Cards(DueDate)")
+
+
+def normalize_cards_table(cur: sqlite3.Cursor) -> None:
+    """
+    Version 2: dates and intervals as integer seconds, paths in a `Files` table and a primary key that starts with the path.
+    """
+    legacy_rows = cur.execute(
+        "select CardType, ClozeVariant, RelativePath, LastReviewDate, ConfidenceScore, PreviousTimeDelta from Cards"
+    ).fetchall()
+    # also drops CardsByDueDate
+    cur.execute("drop table Cards")
+    cur.execute("""create table Files(
+        FileId integer primary key,
+        RelativePath text not null unique
+        )""")
+    cur.execute("""create table Cards(
+        FileId integer not null references Files(FileId),
+        ClozeVariant integer not null,
+        CardType text,
+        LastReviewDate integer,
+        ConfidenceScore integer,
+        PreviousTimeDelta integer,
+        DueDate integer,
+        primary key (FileId, ClozeVariant)
+        ) without rowid""")
+    # NULL means due right away
+    cur.execute("create index CardsByDueDate on Cards(DueDate)")
+    upsert_history_rows(
+        cur,
+        [
+            encode_history_row(
+                card_type,
+                cloze_variant,
+                relative_path,
+                datetime.datetime.fromisoformat(last_review_date)
+                if last_review_date
+                else None,
+                int(confidence_score) if confidence_score else None,
+                datetime.timedelta(seconds=int(float(previous_time_delta)))
+                if previous_time_delta
+                else None,
+            )
+            for (
+                card_type,
+                cloze_variant,
+                relative_path,
+                last_review_date,
+                confidence_score,
+                previous_time_delta,
+            ) in legacy_rows
+        ],
+    )
+
+
+# the schema version of a database is its number of applied migrations, kept in `pragma user_version`
+MIGRATIONS = [create_legacy_cards_table, normalize_cards_table]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(cur: sqlite3.Cursor) -> int:
+    return cur.execute("pragma user_version").fetchone()[0]
+
+
+def create_cards_table(cur: sqlite3.Cursor) -> None:
+    """
+    Create the `Cards` table, or migrate an existing database to `SCHEMA_VERSION`.
+
+    Databases from before there were schema versions are at version 0, whether they have a `Cards` table or not.
+    Every migration runs in a transaction of its own, so an interrupted migration is simply run again.
+    """
+    if schema_version(cur) == SCHEMA_VERSION:
+        return
+    while True:
+        # the version is read again inside the transaction, in case another process just migrated
+        cur.execute("begin immediate")
+        version = schema_version(cur)
+        if version >= SCHEMA_VERSION:
+            cur.connection.rollback()
+            break
+        try:
+            MIGRATIONS[version](cur)
+            cur.execute(f"pragma user_version={version + 1}")
+        except BaseException:
+            cur.connection.rollback()
+            raise
+        cur.connection.commit()
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"The database has schema version {version}, but this version of markdown-flashcards only knows up to version {SCHEMA_VERSION}."
+        )
+
+
+def paths_condition(relative_paths: Optional[Iterable[str]]) -> Tuple[str, tuple]:
+    if relative_paths is None:
+        return "", ()
+    # one parameter however many paths there are, so this stays below SQLite's limit on parameters
+    return (
+        "RelativePath in (select value from json_each(?))",
+        (json.dumps(list(relative_paths)),),
+    )
+
+
+def load_card_types(
+    cur: sqlite3.Cursor, relative_paths: Optional[Iterable[str]] = None
+) -> Dict[str, Dict[int, str]]:
+    """
+    The card type of every cloze variant (0 for normal cards) of every path in `Cards`, without decoding the review history.
+
+    With `relative_paths`, only those paths are read.
+    """
+    # a scan of Files with a primary key lookup in Cards per file
+    query = "select RelativePath, ClozeVariant, CardType from Files cross join Cards using (FileId)"
+    condition, parameters = paths_condition(relative_paths)
+    if condition:
+        query += f" where {condition}"
+    card_types: Dict[str, Dict[int, str]] = {}
+    for relative_path, cloze_variant, card_type in cur.execute(query, parameters):
+        card_types.setdefault(relative_path, {})[cloze_variant] = card_type
+    return card_types
+
+
+def load_history(
+    cur: sqlite3.Cursor,
+    due_before: Optional[datetime.datetime] = None,
+    relative_paths: Optional[Iterable[str]] = None,
+) -> Dict[Tuple[str, int], HistoryEntry]:
+    """
+    Read the `Cards` table in a single query.
+
+    With `due_before`, only rows that are due before then are read, using the `DueDate` index.
+    With `relative_paths`, only the rows of those paths are read.
+    The result is keyed by `(RelativePath, ClozeVariant)`.
+    """
+    query = "select RelativePath, CardType, ClozeVariant, LastReviewDate, ConfidenceScore, PreviousTimeDelta from "
+    # without a due date, scan Files and look up its rows in Cards by primary key
+    # otherwise let SQLite start from the DueDate index
+    query += "Cards join Files" if due_before else "Files cross join Cards"
+    query += " using (FileId)"
+    conditions = []
+    parameters: tuple = ()
+    if due_before:
+        conditions.append("(DueDate is null or DueDate < ?)")
+        parameters += (encode_timestamp(due_before),)
+    condition, path_parameters = paths_condition(relative_paths)
+    if condition:
+        conditions.append(condition)
+        parameters += path_parameters
+    if conditions:
+        query += " where " + " and ".join(conditions)
+    return {
+        (relative_path, cloze_variant): HistoryEntry(
+            relative_path,
+            card_type,
+            cloze_variant,
+            *decode_history_values(
+                last_review_date, confidence_score, previous_time_delta
+            ),
+        )
+        for (
+            relative_path,
+            card_type,
+            cloze_variant,
+            last_review_date,
+            confidence_score,
+            previous_time_delta,
+        ) in cur.execute(query, parameters)
+    }
+
+
+def group_by_path(
+    history: Dict[Tuple[str, int], HistoryEntry],
+) -> Dict[str, List[HistoryEntry]]:
+    # plural due to Cloze variants
+    entries_by_path: Dict[str, List[HistoryEntry]] = {}
+    for entry in history.values():
+        entries_by_path.setdefault(entry.relative_path, []).append(entry)
+    return entries_by_path
+
+
+def paths_under(cur: sqlite3.Cursor, prefixes: Iterable[str]) -> Set[str]:
+    """
+    The paths in `Files` that are one of `prefixes` or in a directory that is.
+    """
+    relative_paths = set()
+    for prefix in prefixes:
+        if prefix == ".":
+            query, parameters = "select RelativePath from Files", ()
+        else:
+            # a range over the unique index on RelativePath, "0" is the character after "/"
+            query = "select RelativePath from Files where RelativePath=? or (RelativePath>=? and RelativePath<?)"
+            parameters = (prefix, prefix + "/", prefix + "0")
+        relative_paths.update(
+            relative_path for (relative_path,) in cur.execute(query, parameters)
+        )
+    return relative_paths
+
+
+def paths_without_files(
+    known_paths: Iterable[str], relative_card_paths: Iterable[str]
+) -> Set[str]:
+    """
+    Paths that are known to the database but were not found by the directory scan.
+    """
+    return set(known_paths) - set(relative_card_paths)
+
+
+INSERT_FILE_SQL = "insert or ignore into Files(RelativePath) values (?)"
+UPSERT_SQL = """insert into Cards(CardType, ClozeVariant, FileId, LastReviewDate, ConfidenceScore, PreviousTimeDelta, DueDate) values (?, ?, (select FileId from Files where RelativePath=?), ?, ?, ?, ?) on conflict(FileId, ClozeVariant) do update set LastReviewDate=excluded.LastReviewDate, ConfidenceScore=excluded.ConfidenceScore, PreviousTimeDelta=excluded.PreviousTimeDelta, DueDate=excluded.DueDate"""
+
+
+def upsert_history_rows(
+    cur: Union[sqlite3.Connection, sqlite3.Cursor], rows: List[tuple]
+) -> None:
+    """
+    Insert or update rows from `encode_history_row`, adding their paths to `Files` where needed.
+    """
+    cur.executemany(INSERT_FILE_SQL, [(row[2],) for row in rows])
+    cur.executemany(UPSERT_SQL, rows)
+
+
+def delete_history(
+    cur: Union[sqlite3.Connection, sqlite3.Cursor],
+    relative_path: str,
+    cloze_variants: Optional[Iterable[int]] = None,
+) -> None:
+    """
+    Delete the rows of a path, or only those of `cloze_variants`.
+    """
+    file_id = "(select FileId from Files where RelativePath=?)"
+    if cloze_variants is None:
+        cur.execute(f"delete from Cards where FileId={file_id}", (relative_path,))
+        cur.execute("delete from Files where RelativePath=?", (relative_path,))
+    else:
+        cur.executemany(
+            f"delete from Cards where FileId={file_id} and ClozeVariant=?",
+            [(relative_path, cloze_variant) for cloze_variant in cloze_variants],
+        )
+
+
+def connect(directory: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(directory / "learning-history.db")
+    # with WAL, NORMAL only risks the last transactions on power loss, not when the process is killed
+    con.execute("pragma journal_mode=WAL")
+    con.execute("pragma synchronous=NORMAL")
+    con.execute("pragma temp_store=MEMORY")
+    # in KiB when negative
+    con.execute("pragma cache_size=-32000")
+    return con
+
+
+def connect_read_only(directory: Path) -> sqlite3.Connection:
+    """
+    A connection that can't write to the database, which has to exist.
+    """
+    path = directory / "learning-history.db"
+    if not path.exists():
+        raise FileNotFoundError(f"There is no review history in {directory}.")
+    # without a write-ahead log, nothing is pending, so skip locking, which creates the -shm and -wal files
+    wal_path = path.with_name(path.name + "-wal")
+    parameters = "mode=ro" if wal_path.exists() else "mode=ro&immutable=1"
+    return sqlite3.connect(f"{path.absolute().as_uri()}?{parameters}", uri=True)
+
+
+def snapshot(directory: Path) -> sqlite3.Connection:
+    """
+    An in-memory copy of the database, or an empty database if there is none, for reading without ever writing to the file.
+    """
+    memory = sqlite3.connect(":memory:")
+    if (directory / "learning-history.db").exists():
+        source = connect_read_only(directory)
+        try:
+            source.backup(memory)
+        finally:
+            source.close()
+    return memory
+
+
+def encode_history_row(
+    card_type: str,
+    cloze_variant: int,
+    relative_path: str,
+    last_review_date: Optional[datetime.datetime],
+    confidence_score: Optional[int],
+    previous_time_delta: Optional[datetime.timedelta],
+) -> tuple:
+    encoded_last_review_date = encode_timestamp(last_review_date)
+    encoded_previous_time_delta = (
+        int(previous_time_delta.total_seconds()) if previous_time_delta else None
+    )
+    return (
+        card_type,
+        cloze_variant,
+        relative_path,
+        encoded_last_review_date,
+        confidence_score,
+        encoded_previous_time_delta,
+        encode_due_date(
+            encoded_last_review_date, confidence_score, encoded_previous_time_delta
+        ),
+    )
+
+
+class HistoryWriter:
+    """
+    Write-behind buffer that writes `Cards` upserts in batches, one transaction each.
+    """
+
+    def __init__(
+        self,
+        con: sqlite3.Connection,
+        batch_size: int = 1000,
+        max_delay_seconds: float = 2.0,
+    ):
+        self.con = con
+        self.batch_size = batch_size
+        self.max_delay_seconds = max_delay_seconds
+        self._pending: List[tuple] = []
+        self._oldest_pending: Optional[float] = None
+
+    def add(self, row: tuple) -> None:
+        if not self._pending:
+            self._oldest_pending = time.monotonic()
+        self._pending.append(row)
+        if (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._oldest_pending >= self.max_delay_seconds
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        with self.con:
+            upsert_history_rows(self.con, self._pending)
+        self._pending = []
+        self._oldest_pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
@@ -0,0 +1,104 @@
+import functools
+import hashlib
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image as PILImage  # type: ignore
+
+# generous, so downscaled images still look sharp with sixel or TGP on a dense terminal
+CELL_SIZE_IN_PIXELS = (20, 40)
+DEFAULT_BYTE_BUDGET = 64 * 1024 * 1024
+THUMBNAIL_DIRECTORY_NAME = ".thumbnails"
+
+
+@functools.lru_cache(maxsize=4096)
+def resolve_image_path(base: Path, image_path: str) -> Path:
+    """
+    `Path.resolve` for an image reference, memoized because the same references are displayed over and over.
+    """
+    return (base / image_path).resolve()
+
+
+def terminal_size_in_pixels() -> Tuple[int, int]:
+    columns, lines = shutil.get_terminal_size()
+    return columns * CELL_SIZE_IN_PIXELS[0], lines * CELL_SIZE_IN_PIXELS[1]
+
+
+class ImageCache:
+    """
+    Decoded images, downscaled to fit the terminal, keyed by resolved path and mtime.
+    """
+
+    def __init__(
+        self,
+        byte_budget: int = DEFAULT_BYTE_BUDGET,
+        thumbnail_directory: Optional[Path] = None,
+    ):
+        self.byte_budget = byte_budget
+        self.thumbnail_directory = thumbnail_directory
+        self.hits = 0
+        self.misses = 0
+        self._images: OrderedDict[Tuple[Path, int], "PILImage.Image"] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, image_path: Path) -> "PILImage.Image":
+        key = (image_path, image_path.stat().st_mtime_ns)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+        # decode outside of the lock, a duplicate decode is harmless
+        image = self._load(*key)
+        with self._lock:
+            if key not in self._images:
+                self._images[key] = image
+                self._bytes += image_size_in_bytes(image)
+            while self._bytes > self.byte_budget and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= image_size_in_bytes(evicted)
+        return image
+
+    def _load(self, image_path: Path, mtime_ns: int) -> "PILImage.Image":
+        # only needed on a miss, PIL is slow to import
+        from PIL import Image as PILImage  # type: ignore
+
+        max_size = terminal_size_in_pixels()
+        thumbnail_path = None
+        if self.thumbnail_directory:
+            digest = hashlib.blake2b(
+                f"{image_path}:{mtime_ns}:{max_size[0]}x{max_size[1]}".encode(),
+                digest_size=16,
+            ).hexdigest()
+            thumbnail_path = self.thumbnail_directory / f"{digest}.png"
+            if thumbnail_path.exists():
+                with PILImage.open(thumbnail_path) as thumbnail:
+                    thumbnail.load()
+                    return thumbnail.copy()
+        with PILImage.open(image_path) as original:
+            # draft lets JPEG decode at a reduced size straight away
+            original.draft(None, max_size)
+            image = original.copy()
+        image.thumbnail(max_size)
+        if thumbnail_path:
+            thumbnail_path.parent.mkdir(exist_ok=True)
+            # written under a temporary name, so a concurrent session never reads half a file
+            partial_path = thumbnail_path.with_suffix(f".{threading.get_ident()}.part")
+            image.save(partial_path, format="PNG")
+            partial_path.replace(thumbnail_path)
+        return image
+
+
+def image_size_in_bytes(image: "PILImage.Image") -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+# process-wide, so cards that share a diagram share its decoded image
+IMAGE_CACHE = ImageCache()
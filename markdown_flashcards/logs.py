@@ -0,0 +1,29 @@
+import logging
+import logging.handlers
+import queue
+
+LOG_FILE_NAME = "markdown-flashcards.log"
+LOG_LEVEL_ENVIRONMENT_VARIABLE = "MARKDOWN_FLASHCARDS_LOG_LEVEL"
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+DEFAULT_LOG_LEVEL = "WARNING"
+
+
+def configure_logging(
+    level: str = DEFAULT_LOG_LEVEL, filename: str = LOG_FILE_NAME
+) -> logging.handlers.QueueListener:
+    """
+    Log records of `level` and above to `filename`, which is overwritten.
+
+    The calling thread only puts records on a queue and a listener thread writes them, so logging doesn't block the session on disk I/O.
+    The file isn't created until something is logged.
+    Stop the returned listener to write what is still queued.
+    """
+    file_handler = logging.FileHandler(filename, mode="w", delay=True)
+    file_handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, file_handler)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    listener.start()
+    return listener
@@ -1,417 +1,55 @@
 import click  # type: ignore
-from rich.table import Table  # type: ignore
-import math
-from rich.prompt import Confirm, IntPrompt  # type: ignore
-import sqlite3
+import importlib
+import json
+import os
+import signal
+import sys
 from pathlib import Path
-from rich.console import Console  # type: ignore
-from rich.markdown import Markdown  # type: ignore
-import re
-from enum import Enum
-from queue import PriorityQueue, Empty
-from abc import ABC
-from functools import total_ordering
-import datetime
-from abc import abstractmethod
-import networkx as nx  # type: ignore
-import frontmatter  # type: ignore
 import logging
 
-from textual_image.renderable import Image  # type: ignore
-from typing import List, Set, Union
-
-
-class CardTypes(str, Enum):
-    NORMAL = "normal"
-    CLOZE = "cloze"
-
+from markdown_flashcards.images import IMAGE_CACHE, THUMBNAIL_DIRECTORY_NAME
+from markdown_flashcards.logs import (
+    DEFAULT_LOG_LEVEL,
+    LOG_FILE_NAME,
+    LOG_LEVEL_ENVIRONMENT_VARIABLE,
+    LOG_LEVELS,
+    configure_logging,
+)
+from markdown_flashcards.prefetch import Prefetcher
+from markdown_flashcards.profiling import Profile
+from markdown_flashcards.session import ReviewSession
 
-START_TIME = datetime.datetime.now()
-TODAY = START_TIME.date()
-MIDNIGHT = datetime.time(0, 0, 0)
-ONE_DAY = datetime.timedelta(days=1)
 ANSWER_OPTIONS = ["Unable to answer", "Hard", "Easy", "Very easy"]
 LOGGER = logging.getLogger(__name__)
-START_OF_OCCLUSION_REGEX = re.compile(
-    r"£{c(?P<occlusion_number>\d+):(?P<start_of_occluded_text>)"
-)  # e.g. £{c2: without the }, extra } to avoid confusing the editor in which you are viewing this
-MD_IMG_REGEX = re.compile(r"!\[[^\]]*\]\((?P<path>[^\)]*)\)")
-Confirm.prompt_suffix = ""
-
-logging.basicConfig(
-    level=logging.DEBUG, filemode="w", filename="markdown-flashcards.log"
-)
-
-
-def splice_until_matching_curly_bracket(remaining_text):
-    """
-    Take text that follows an opening '{' and return the part until and including the matching '}'.
-
-    If there is no match, return `None`.
-    """
-    opening_curly_brackets = 1
-    for index, character in enumerate(remaining_text):
-        match character:
-            case "{":
-                opening_curly_brackets += 1
-            case "}":
-                opening_curly_brackets -= 1
-            case _other:
-                pass
-        if opening_curly_brackets == 0:
-            return remaining_text[: index + 1]
-    return None
-
-
-def round_timedelta_days_up(timedelta):
-    # this is a bit trickier than it seems
-    # e.g. a timedelta of 3 weeks and 2 days has 0 for the "milliseconds" property
-    # total_seconds() does work
-    # but it's only for seconds
-    # but, to be fair, we don't need millisecond level accuracy here
-    days_in_timedelta = timedelta.total_seconds() / 60 / 60 / 24
-    if (days_in_timedelta).is_integer():
-        # make a (rough) copy because the other branch definitely returns a new object
-        # would be inconsistent to just change the object here
-        return datetime.timedelta(seconds=timedelta.total_seconds())
-    else:
-        return datetime.timedelta(seconds=math.ceil(days_in_timedelta) * 24 * 60 * 60)
-
-
-def substitute_images_in_md_text(
-    directory: Path, relative_card_path: Path, source: str
-) -> List[Union[Markdown, Image]]:
-    # would be nicer if this was actually based on parse tree
-    # but this'll work fine in practice
-    document_path = directory / relative_card_path
-    segments = MD_IMG_REGEX.split(source)
-    replacements = []
-    for index, segment in enumerate(segments, start=0):
-        LOGGER.debug(f"Processing segment {segment}")
-        if index % 2:
-            image_path = segment
-            if image_path.startswith("./") or image_path.startswith("../"):
-                absolute_image_path = (document_path.parent / image_path).resolve()
-            elif image_path.startswith("/"):
-                absolute_image_path = Path(image_path).resolve()
-            else:
-                absolute_image_path = (directory / image_path).resolve()
-            replacements.append(Image(absolute_image_path))
-        else:
-            replacements.append(Markdown(segment))
-    return replacements
-
-
-@total_ordering
-class Card(ABC):
-    @property
-    def is_due_at_start(self):
-        # not using a normal `is_due` because now() would be used in comparisons
-        return self.due_date <= START_TIME
-
-    @property
-    def is_due_today(self):
-        return self.due_date.date() <= TODAY
-
-    @property
-    def due_date(self) -> datetime.datetime:
-        if not (
-            self.last_review_date and self.confidence_score and self.previous_time_delta
-        ):
-            return START_TIME
-        else:
-            match self.confidence_score:
-                case 1:
-                    return START_TIME
-
-                case 2:
-                    return max(
-                        self.last_review_date + datetime.timedelta(minutes=3),
-                        self.last_review_date + (self.previous_time_delta * 0.8),
-                    )
-                case 3:
-                    # always postpone until at least tomorrow
-                    # otherwise, we might still have to review (multiple times) today if gap was small
-                    return min(
-                        (
-                            self.last_review_date + (self.previous_time_delta * 1.25)
-                            if self.previous_time_delta >= datetime.timedelta(days=4)
-                            # it may seem odd to use last_review_date instead of TODAY here
-                            # but it makes sense
-                            # TODAY is dependent on when we are running the program
-                            # so due dates would *always* end up being in the future
-                            # and last_review_date is set when we practice a card
-                            # so it's the "today" of when we last viewed the card
-                            else datetime.datetime.combine(
-                                self.last_review_date.date()
-                                # so if it's been less than a day, add at least one day
-                                # so if it's been less than two, add at least two
-                                # eventually, we'll round up to 4 and hit the exponential part
-                                + round_timedelta_days_up(self.previous_time_delta),
-                                MIDNIGHT,
-                            )
-                        ),
-                        self.last_review_date + datetime.timedelta(days=365 // 2),
-                    )
-                case 4:
-                    return min(
-                        (
-                            self.last_review_date + (self.previous_time_delta * 2)
-                            if self.previous_time_delta >= datetime.timedelta(days=1)
-                            else datetime.datetime.combine(
-                                self.last_review_date.date() + (ONE_DAY * 2), MIDNIGHT
-                            )
-                        ),
-                        self.last_review_date + datetime.timedelta(days=365),
-                    )
-        assert False, "Cases are exhaustive."
 
-    def __init__(
-        self,
-        relative_path,
-        tags,
-        all_dependencies,
-        last_review_date,
-        confidence_score,
-        previous_time_delta,
-    ):
-        self.relative_path = relative_path
-        self.tags = tags
-        self.all_dependencies = all_dependencies
-        self.last_review_date = last_review_date
-        self.confidence_score = confidence_score
-        self.previous_time_delta = previous_time_delta
 
-    def __eq__(self, other):
-        if (
-            self.relative_path in other.all_dependencies
-            or other.relative_path in self.all_dependencies
-        ):
-            return False
-        else:
-            return self.due_date == other.due_date
+def import_prompts():
+    # rich takes a while to import, so wait until there is something to ask
+    from rich.prompt import Confirm, IntPrompt  # type: ignore
 
-    def __lt__(self, other):
-        LOGGER.debug(f"Comparing {self.relative_path} and {other.relative_path}")
-        if self.relative_path in other.all_dependencies:
-            if self.is_due_today:
-                return True
-            else:
-                return self.due_date <= other.due_date
-        elif other.relative_path in self.all_dependencies:
-            if other.is_due_today:
-                return False
-            else:
-                return self.due_date < other.due_date
-        else:
-            return self.due_date < other.due_date
+    Confirm.prompt_suffix = ""
+    return Confirm, IntPrompt
 
-    @abstractmethod
-    def get_displayed_question(
-        self, topics_directory: Path
-    ) -> List[Union[Markdown, Image]]:
-        return NotImplemented
-
-    @abstractmethod
-    def get_displayed_answer(
-        self, topics_directory: Path
-    ) -> List[Union[Markdown, Image]]:
-        return NotImplemented
-
-    @abstractmethod
-    def update_with_confidence_score(self, score):
-        return NotImplemented
-
-    @abstractmethod
-    def upsert(cursor):
-        return NotImplemented
-
-
-class NormalCard(Card):
-    def __init__(
-        self,
-        relative_path,
-        tags,
-        all_dependencies,
-        last_review_date,
-        confidence_score,
-        previous_time_delta,
-        front,
-        back,
-    ):
-        super().__init__(
-            relative_path,
-            tags,
-            all_dependencies,
-            last_review_date,
-            confidence_score,
-            previous_time_delta,
-        )
-        self.front = front
-        self.back = back
-
-    def get_displayed_question(self, topics_directory):
-        return substitute_images_in_md_text(
-            topics_directory, self.relative_path, self.front
-        )
-
-    def get_displayed_answer(self, topics_directory):
-        return substitute_images_in_md_text(
-            topics_directory, self.relative_path, self.back
-        )
-
-    def update_with_confidence_score(self, score):
-        now = datetime.datetime.now()
-        return NormalCard(
-            self.relative_path,
-            self.tags,
-            self.all_dependencies,
-            now,
-            score,
-            now - self.last_review_date if self.last_review_date else now - START_TIME,
-            self.front,
-            self.back,
-        )
-
-    def upsert(self, cur):
-        cur.execute(
-            """insert into Cards(CardType, ClozeVariant, RelativePath, LastReviewDate, ConfidenceScore, PreviousTimeDelta) values (?, 0, ?, ?, ?, ?) on conflict(RelativePath, ClozeVariant) do update set LastReviewDate=?, ConfidenceScore=?,PreviousTimeDelta=?""",
-            (
-                CardTypes.NORMAL,
-                self.relative_path,
-                self.last_review_date.isoformat() if self.last_review_date else None,
-                self.confidence_score,
-                self.previous_time_delta.total_seconds()
-                if self.previous_time_delta
-                else None,
-                self.last_review_date.isoformat() if self.last_review_date else None,
-                self.confidence_score,
-                self.previous_time_delta.total_seconds()
-                if self.previous_time_delta
-                else None,
-            ),
-        )
-
-
-class ClozeVariant(Card):
-    def __init__(
-        self,
-        relative_path,
-        tags,
-        all_dependencies,
-        last_review_date,
-        confidence_score,
-        previous_time_delta,
-        front,
-        variant_number,
-    ):
-        super().__init__(
-            relative_path,
-            tags,
-            all_dependencies,
-            last_review_date,
-            confidence_score,
-            previous_time_delta,
-        )
-        self.front = front
-        self.variant_number = variant_number
-
-    def get_displayed_question(self, topics_directory):
-        LOGGER.debug(
-            f"Displaying a Cloze card. Variant number is {self.variant_number}. Type of self.variant_number is {type(self.variant_number)}"
-        )
-        start_of_occlusion_matches = START_OF_OCCLUSION_REGEX.finditer(self.front)
-        LOGGER.debug(f"This is the front: {self.front}")
-        replacement_pairs = []
-        for match in start_of_occlusion_matches:
-            LOGGER.debug(match)
-            LOGGER.debug(f"occlusion number group: {match.group('occlusion_number')}")
-            start_index = match.start("start_of_occluded_text")
-            until_curly_bracket = splice_until_matching_curly_bracket(
-                self.front[start_index:]
-            )
-            if not until_curly_bracket:
-                return [Markdown("Error: mismatched opening occlusion")]
-            elif int(match.group("occlusion_number")) == self.variant_number:
-                LOGGER.debug("Occluding.")
-                whole_occlusion = match.group(0) + until_curly_bracket
-                replacement_pairs.append((whole_occlusion, "[...]"))
-            else:
-                LOGGER.debug("Not occluding.")
-                whole_occlusion = match.group(0) + until_curly_bracket
-                replacement_pairs.append((whole_occlusion, until_curly_bracket[:-1]))
-        displayed = str(self.front)
-        LOGGER.debug(f"Replacement pairs are: {replacement_pairs}")
-        for replacee, replacer in replacement_pairs:
-            displayed = displayed.replace(replacee, replacer)
-        return substitute_images_in_md_text(
-            topics_directory, self.relative_path, displayed
-        )
-
-    def get_displayed_answer(self, topics_directory):
-        start_of_occlusion_matches = START_OF_OCCLUSION_REGEX.finditer(self.front)
-        replacement_pairs = []
-        for match in start_of_occlusion_matches:
-            start_index = match.start("start_of_occluded_text")
-            until_curly_bracket = splice_until_matching_curly_bracket(
-                self.front[start_index:]
-            )
-            if not until_curly_bracket:
-                return [Markdown("Error: mismatched opening occlusion")]
-            else:
-                whole_occlusion = match.group(0) + until_curly_bracket
-                replacement_pairs.append((whole_occlusion, until_curly_bracket[:-1]))
-        displayed = str(self.front)
-        for replacee, replacer in replacement_pairs:
-            displayed = displayed.replace(replacee, replacer)
-        return substitute_images_in_md_text(
-            topics_directory, self.relative_path, displayed
-        )
 
-    def update_with_confidence_score(self, score):
-        now = datetime.datetime.now()
-        return ClozeVariant(
-            self.relative_path,
-            self.tags,
-            self.all_dependencies,
-            now,
-            score,
-            now - self.last_review_date if self.last_review_date else now - START_TIME,
-            self.front,
-            self.variant_number,
-        )
+class DefaultGroup(click.Group):
+    """
+    Runs `quiz` when the first argument is not a command, so `markdown-flashcards DIRECTORY` still starts a review.
+    """
 
-    def upsert(self, cur):
-        cur.execute(
-            """insert into Cards(CardType, ClozeVariant, RelativePath, LastReviewDate, ConfidenceScore, PreviousTimeDelta) values (?, ?, ?, ?, ?, ?) on conflict(RelativePath, ClozeVariant) do update set LastReviewDate=?, ConfidenceScore=?,PreviousTimeDelta=?""",
-            (
-                CardTypes.CLOZE,
-                self.variant_number,
-                self.relative_path,
-                self.last_review_date.isoformat() if self.last_review_date else None,
-                self.confidence_score,
-                self.previous_time_delta.total_seconds()
-                if self.previous_time_delta
-                else None,
-                self.last_review_date.isoformat() if self.last_review_date else None,
-                self.confidence_score,
-                self.previous_time_delta.total_seconds()
-                if self.previous_time_delta
-                else None,
-            ),
-        )
+    def parse_args(self, context, args):
+        if args and args[0] not in self.commands and args[0] != "--help":
+            args = ["quiz", *args]
+        return super().parse_args(context, args)
 
 
-def normalize_dependency_path(directory: Path, card_path: Path, dependency: str) -> str:
-    if not (dependency.startswith("./") or dependency.startswith("../")):
-        return dependency
-    else:
-        dependency_relative_to_card = (card_path.parent / dependency).resolve()
-        return str(dependency_relative_to_card.relative_to(directory, walk_up=True))
+@click.group(cls=DefaultGroup)
+def cli():
+    """
+    Review Markdown flashcards, or check them with `check`.
+    """
 
 
-@click.command()
-@click.argument(
+directory_argument = click.argument(
     "directory",
     required=True,
     type=click.Path(
@@ -422,285 +60,268 @@ def normalize_dependency_path(directory: Path, card_path: Path, dependency: str)
         path_type=Path,
     ),
 )
-def quiz(directory):
-    LOGGER.debug("Starting the quiz.")
-    # TODO: consider getting rid of frontmatter part and using frontmatter library?
-    normal_card_regex = re.compile(
-        # actually, back should not contain ---
-        r"---\n(?P<frontmatter>.*)\n---\n(?P<front>.*)\n---\n(?P<back>.*)",
-        flags=re.DOTALL,
-    )
-    cloze_regex = re.compile(
-        r"---\n(?P<frontmatter>.*)\n---\n(?P<front>.*)",
-        flags=re.DOTALL,
-    )
-    con = sqlite3.connect(directory / "learning-history.db")
-    cur = con.cursor()
-    LOGGER.debug("Creating table if necessary.")
-    cur.execute("""create table if not exists Cards(
-        CardType text,
-        ClozeVariant integer,
-        RelativePath text,
-        LastReviewDate text,
-        ConfidenceScore integer,
-        PreviousTimeDelta text,
-        primary key (ClozeVariant, RelativePath)
-        )""")
+verify_hashes_option = click.option(
+    "--verify-hashes",
+    is_flag=True,
+    help="Also compare content hashes before reusing parsed cards, in case modification times are unreliable.",
+)
 
-    LOGGER.debug("Checking for missing files.")
-    relative_paths = cur.execute("select RelativePath from Cards")
-    for (relative_path,) in relative_paths.fetchall():
-        if not (directory / relative_path).exists():
+
+@cli.command()
+@directory_argument
+@verify_hashes_option
+@click.option(
+    "--jobs",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of workers for scanning and parsing the cards.",
+)
+@click.option(
+    "--lazy-bodies",
+    is_flag=True,
+    help="Only keep card metadata in memory and read the text of a card when it is shown.",
+)
+@click.option(
+    "--prefetch",
+    default=2,
+    type=click.IntRange(min=0),
+    help="Number of upcoming cards to render in the background while answering. 0 renders every card when it is shown.",
+)
+@click.option(
+    "--thumbnail-cache",
+    is_flag=True,
+    help=f"Keep downscaled copies of images in {THUMBNAIL_DIRECTORY_NAME}, next to the database, so they don't have to be decoded again in later sessions.",
+)
+@click.option(
+    "--profile",
+    "print_profile",
+    is_flag=True,
+    help="Print how long each phase of the session took when it ends.",
+)
+@click.option(
+    "--profile-json",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Write how long each phase of the session took to this file, as JSON.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Pick up cards that are added, edited or removed during the session, without starting over.",
+)
+@click.option(
+    "--tag",
+    "tags",
+    multiple=True,
+    help="Only review the cards with this tag, and the cards they depend on. Can be repeated. Files that are new or changed since the last session are parsed to find their tags.",
+)
+@click.option(
+    "--path",
+    "paths",
+    multiple=True,
+    help="Only review the cards in this directory or file, relative to DIRECTORY, and the cards they depend on. Can be repeated.",
+)
+@click.option(
+    "--log-level",
+    default=DEFAULT_LOG_LEVEL,
+    envvar=LOG_LEVEL_ENVIRONMENT_VARIABLE,
+    show_envvar=True,
+    type=click.Choice(LOG_LEVELS, case_sensitive=False),
+    help=f"Lowest level of the messages written to {LOG_FILE_NAME}.",
+)
+def quiz(
+    directory,
+    verify_hashes,
+    jobs,
+    lazy_bodies,
+    prefetch,
+    thumbnail_cache,
+    print_profile,
+    profile_json,
+    watch,
+    tags,
+    paths,
+    log_level,
+):
+    """
+    Review the cards in DIRECTORY that are due. This is what runs without a command.
+    """
+    context = click.get_current_context()
+    context.call_on_close(configure_logging(log_level.upper()).stop)
+    profile = Profile()
+    # on close, so this also happens when leaving through Ctrl-C
+    if print_profile:
+        context.call_on_close(profile.print_report)
+    if profile_json:
+        context.call_on_close(lambda: profile.write_json(profile_json))
+    LOGGER.debug("Starting the quiz.")
+    if thumbnail_cache:
+        IMAGE_CACHE.thumbnail_directory = directory / THUMBNAIL_DIRECTORY_NAME
+    # also flushes on Ctrl-C and, through the handler below, on SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    with ReviewSession(
+        directory,
+        verify_hashes=verify_hashes,
+        jobs=jobs,
+        lazy_bodies=lazy_bodies,
+        profile=profile,
+        tags=tags,
+        paths=paths,
+    ) as session:
+        for tag in session.unmatched_tags:
+            print(f"There are no cards with the tag {tag}.")
+        for path in session.unmatched_paths:
+            print(f"There are no cards at {path}.")
+        LOGGER.debug("Checking for missing files.")
+        for relative_path in session.missing_paths:
+            Confirm, _ = import_prompts()
             print(
                 f"Path is mentioned in DB but lacks a Markdown file counterpart: {relative_path}"
             )
             should_delete = Confirm.ask("Delete entry from database?")
             if should_delete:
-                cur.execute(
-                    """delete from Cards where RelativePath=?""", (relative_path,)
+                session.forget(relative_path)
+        queued = session.start()
+        # cards that could not be queued, even if nothing else is due
+        for problem in session.problems:
+            print(f"{problem.relative_path}: {problem.message}")
+        if not queued:
+            return
+        if watch:
+            from markdown_flashcards.watch import watch_deck
+
+            watcher = watch_deck(directory, session.relative_card_paths)
+            context.call_on_close(watcher.close)
+        from rich.console import Console  # type: ignore
+        from rich.table import Table  # type: ignore
+
+        Confirm, IntPrompt = import_prompts()
+
+        from markdown_flashcards.rendering import CARD_THEME
+
+        console = Console(theme=CARD_THEME)
+        # importing it queries the terminal over stdin, so do it here
+        # rather than on the prefetcher thread while the main thread is waiting for input
+        importlib.import_module("textual_image.renderable")
+
+        # console.clear()
+        with Prefetcher(directory, prefetch) as prefetcher:
+            prefetcher.prefetch(session.peek(prefetch))
+            for queue_item in session.due_cards():
+                # includes waiting for the prefetcher, so this is the latency the user sees
+                with profile.span("render question"):
+                    question, answer = prefetcher.take(queue_item)
+                    # render what comes next while the user is answering
+                    prefetcher.prefetch(session.peek(prefetch))
+                    console.print(
+                        f"(From {str(Path(queue_item.relative_path).parent)})"
+                    )
+                    if queue_item.last_review_date:
+                        console.print(
+                            f"(Last reviewed {queue_item.last_review_date.isoformat()}, previous time delta was {queue_item.previous_time_delta}, confidence score was {queue_item.confidence_score})"
+                        )
+                    for component in question:
+                        LOGGER.debug("Dit is de component: %s", component)
+                        console.print(component)
+                    console.print("")
+                Confirm.ask(
+                    "Press ENTER to display the answer",
+                    default=True,
+                    show_default=False,
+                    show_choices=False,
                 )
-                con.commit()
-
-    card_paths: Set[Path] = set(directory.glob("**/*.md"))
-    relative_card_paths: List[str] = [
-        str(card_path.relative_to(directory, walk_up=True)) for card_path in card_paths
-    ]
-    LOGGER.debug(f"Card paths: {card_paths}")
-
-    # need to collect these in first pass because each card specifies all its dependencies
-    # that allows __lt__ and __eq__ to be implemented
-    dependency_graph = nx.DiGraph()
-    for card_path in card_paths:
-        LOGGER.debug(f"Adding {card_path} to dependency graph.")
-        card = frontmatter.load(card_path)
-        card_relative_path = card_path.relative_to(directory, walk_up=True)
-        dependency_graph.add_node(str(card_relative_path))
-        for dependency in card.get("dependencies", []):
-            dependency = normalize_dependency_path(directory, card_path, dependency)
-            if dependency not in relative_card_paths:
-                LOGGER.error(
-                    f"{dependency} is mentioned as a dependency of {card_relative_path}, but there is no Markdown file with this path (relative to the overall cards directory. Ignoring the dependency (and potential transitive dependencies)."
+                with profile.span("render answer"):
+                    for component in answer:
+                        console.print(component)
+                table = Table(title=None)
+                table.add_column("Number", justify="right")
+                table.add_column("Option", justify="left")
+                for index, option in enumerate(ANSWER_OPTIONS, start=1):
+                    table.add_row(str(index), option)
+                console.print("")
+
+                console.print(table)
+                confidence_score = IntPrompt.ask(
+                    "Select an option",
+                    choices=[str(i) for i in range(1, len(ANSWER_OPTIONS) + 1)],
                 )
-                LOGGER.warning(f"all relative card paths: {relative_card_paths}")
-            else:
-                dependency_graph.add_node(str(dependency))
-                dependency_graph.add_edge(str(card_relative_path), str(dependency))
-    LOGGER.debug(f"Dependency graph: {dependency_graph}")
-    LOGGER.debug(f"Nodes: {dependency_graph.nodes}")
+                updated_version = session.rate(queue_item, confidence_score)
+                console.print(f"Due date for review: {updated_version.due_date}")
+                if watch:
+                    # between cards, so the card on screen is never swapped out
+                    shown = len(session.problems)
+                    session.reload(*watcher.changes())
+                    for problem in session.problems[shown:]:
+                        print(f"{problem.relative_path}: {problem.message}")
+                # the rated card, or a reloaded one, may now come before the prefetched ones
+                prefetcher.prefetch(session.peek(prefetch))
+                # don't keep a rating waiting for a batch, it's the user's work
+                session.flush()
+                console.print("")
+                # console.clear()
+
+
+@cli.command()
+@directory_argument
+@verify_hashes_option
+@click.option(
+    "--jobs",
+    default=os.cpu_count() or 1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of workers for parsing the cards.",
+)
+@click.option(
+    "--json", "as_json", is_flag=True, help="Report the problems as a JSON list."
+)
+def check(directory, verify_hashes, jobs, as_json):
+    """
+    Report every problem with the cards in DIRECTORY and their history, without a review and without writing to the database.
 
-    priority_queue = PriorityQueue()
-    # card_paths here is based on located MD files
-    for card_path in card_paths:
-        relative_path = str(card_path.relative_to(directory, walk_up=True))
-        cur.execute(
-            "select CardType, ClozeVariant, LastReviewDate, ConfidenceScore, PreviousTimeDelta from Cards where RelativePath=?",
-            (relative_path,),
-        )
-        # plural due to Cloze variants
-        db_entries_for_card = list(cur.fetchall())
-        LOGGER.info(f"DB entries for card {card_path}: {db_entries_for_card}")
-        if db_entries_for_card:
-            # want to access via index but also don't want duplicates, so list({...})
-            card_types = list({db_entry[0] for db_entry in db_entries_for_card})
-            if len(card_types) > 1:
-                print(
-                    f"Database specifies multiple types for the card {card_path}. This is not allowed."
-                )
-                continue
-            elif card_types[0] == CardTypes.NORMAL and len(db_entries_for_card) > 1:
-                print(
-                    f"Card {card_path} is a regular card according to DB, but there are multiple records for it. Only in the case of cloze variants can there be multiple entries for the same card."
-                )
-            else:
-                db_entry = db_entries_for_card[0]
-                LOGGER.info(f"DB entry for single card type: {db_entry}")
-                card_type = card_types.pop()
-                with open(card_path) as fh:
-                    raw_text = fh.read()
-                    frontmatter_card = frontmatter.loads(raw_text)
-                    if card_type == CardTypes.NORMAL:
-                        normal_card_match = normal_card_regex.match(raw_text)
-                        if normal_card_match:
-                            card = NormalCard(
-                                relative_path,
-                                frontmatter_card.get("tags", []),
-                                nx.descendants(dependency_graph, relative_path),
-                                db_entry[2]
-                                and datetime.datetime.fromisoformat(db_entry[2]),
-                                db_entry[3] and int(db_entry[3]),
-                                db_entry[4]
-                                and datetime.timedelta(seconds=int(float(db_entry[4]))),
-                                normal_card_match.group("front"),
-                                normal_card_match.group("back"),
-                            )
-                            priority_queue.put(card)
-                        else:
-                            LOGGER.error(
-                                f"Card at {card_path} should be a regular flash card according to DB but does not match the regular expression for a regular flash card. It will not go into the queue. You should either fix the card or remove the database entry."
-                            )
-                    elif card_type == CardTypes.CLOZE:
-                        cloze_match = cloze_regex.match(raw_text)
-                        if cloze_match:
-                            start_of_occlusion_matches = list(
-                                START_OF_OCCLUSION_REGEX.finditer(raw_text)
-                            )
-                            occlusion_numbers_in_file = {
-                                int(occlusion_match.group("occlusion_number"))
-                                for occlusion_match in start_of_occlusion_matches
-                            }
-                            occlusion_numbers_in_db = {
-                                int(db_entry[1]) for db_entry in db_entries_for_card
-                            }
-                            if occlusion_numbers_in_file == occlusion_numbers_in_db:
-                                cards = [
-                                    ClozeVariant(
-                                        relative_path,
-                                        frontmatter_card.get("tags", []),
-                                        nx.descendants(dependency_graph, relative_path),
-                                        db_entry[2]
-                                        and datetime.datetime.fromisoformat(
-                                            db_entry[2]
-                                        ),
-                                        db_entry[3] and int(db_entry[3]),
-                                        db_entry[4]
-                                        and datetime.timedelta(
-                                            seconds=int(float(db_entry[4]))
-                                        ),
-                                        cloze_match.group("front"),
-                                        db_entry[1],
-                                    )
-                                    for db_entry in db_entries_for_card
-                                ]
-                                for card in cards:
-                                    priority_queue.put(card)
-                            else:
-                                LOGGER.error(
-                                    f"Card at {card_path} does not use the same occlusion numbers {occlusion_numbers_in_db} that are mentioned in the database. Its variants will not go into the queue. You should update the database records or change the file to use precisely the aforementioned occlusion numbers."
-                                )
+    Exits with status 1 if there are problems.
+    """
+    from markdown_flashcards.check import check_deck
 
-                        else:
-                            LOGGER.error(
-                                f"Card at {card_path} should be a cloze card according to DB but does not match the regular expression for a cloze card. It will not go into the queue. You should either fix the card or remove the database entries for its variants."
-                            )
-        else:
-            # no entries, so need to read card to create suitable entry
-            logging.debug(f"reading {card_path}")
-            with open(card_path) as fh:
-                raw_text = fh.read()
-                normal_card_match = normal_card_regex.match(raw_text)
-                cloze_match = cloze_regex.match(raw_text)
-                if normal_card_match:
-                    frontmatter_card = frontmatter.loads(raw_text)
-                    # frontmatter_card = Frontmatter.read(raw_text)
-                    # metadata = frontmatter_card["attributes"]
-                    card = NormalCard(
-                        relative_path,
-                        frontmatter_card.get("tags", []),
-                        # metadata.get("tags", []),
-                        nx.descendants(dependency_graph, relative_path),
-                        None,
-                        None,
-                        None,
-                        normal_card_match.group("front"),
-                        normal_card_match.group("back"),
-                    )
-                    card.upsert(cur)
-                    con.commit()
-                    priority_queue.put(card)
-                elif cloze_match:
-                    # FIXME: this is repeated from earlier
-                    frontmatter_card = frontmatter.loads(raw_text)
-                    # frontmatter_card = Frontmatter.read(raw_text)
-                    # metadata = frontmatter_card["attributes"]
-                    start_of_occlusion_matches = list(
-                        START_OF_OCCLUSION_REGEX.finditer(raw_text)
-                    )
-                    if not start_of_occlusion_matches:
-                        print(
-                            f"Cloze card {relative_path} does not contain any occlusions."
-                        )
-                        continue
-                    else:
-                        occlusion_numbers = {
-                            int(occlusion_match.group("occlusion_number"))
-                            for occlusion_match in start_of_occlusion_matches
-                        }
-                        cards = [
-                            ClozeVariant(
-                                relative_path,
-                                frontmatter_card.get("tags", []),
-                                nx.descendants(dependency_graph, relative_path),
-                                None,
-                                None,
-                                None,
-                                cloze_match.group("front"),
-                                occlusion_number,
-                            )
-                            for occlusion_number in occlusion_numbers
-                        ]
-                        for card in cards:
-                            priority_queue.put(card)
-                            card.upsert(cur)
-                        con.commit()
-                else:
-                    print(
-                        f"Card {relative_path} does not match either normal or cloze pattern."
-                    )
-                    continue
-    queue_item = priority_queue.get()
-    console = Console()
-    # console.clear()
-    while queue_item:
-        LOGGER.info(queue_item)
-        LOGGER.info(f"Due {queue_item.due_date}")
-        if queue_item.is_due_today:
-            console.print(f"(From {str(Path(queue_item.relative_path).parent)})")
-            if queue_item.last_review_date:
-                console.print(
-                    f"(Last reviewed {queue_item.last_review_date.isoformat()}, previous time delta was {queue_item.previous_time_delta}, confidence score was {queue_item.confidence_score})"
-                )
-            components = queue_item.get_displayed_question(directory)
-            for component in components:
-                LOGGER.debug(f"Dit is de component: {component}")
-                console.print(component)
-            console.print("")
-            Confirm.ask(
-                "Press ENTER to display the answer",
-                default=True,
-                show_default=False,
-                show_choices=False,
-            )
-            components = queue_item.get_displayed_answer(directory)
-            for component in components:
-                console.print(component)
-            table = Table(title=None)
-            table.add_column("Number", justify="right")
-            table.add_column("Option", justify="left")
-            for index, option in enumerate(ANSWER_OPTIONS, start=1):
-                table.add_row(str(index), option)
-            console.print("")
+    problems = check_deck(directory, jobs=jobs, verify_hashes=verify_hashes)
+    if as_json:
+        click.echo(json.dumps([problem._asdict() for problem in problems], indent=2))
+    else:
+        for problem in problems:
+            click.echo(f"{problem.relative_path}: {problem.message}")
+        click.echo(
+            f"{len(problems)} problem{'' if len(problems) == 1 else 's'} found.",
+            err=True,
+        )
+    if problems:
+        sys.exit(1)
+
+
+@cli.command()
+@directory_argument
+@click.option(
+    "--days",
+    default=14,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of days to forecast, starting today.",
+)
+def stats(directory, days):
+    """
+    Forecast how many cards in DIRECTORY are due on each of the coming days, also per directory and per tag, without a review.
+    """
+    try:
+        from markdown_flashcards.forecast import load_forecast, print_forecast
+    except ImportError as error:
+        raise click.ClickException(
+            f"stats needs NumPy, which is not installed ({error}). It comes with the stats extra, e.g. poetry install --extras stats."
+        )
+    from markdown_flashcards.cards import START_TIME
 
-            console.print(table)
-            confidence_score = IntPrompt.ask(
-                "Select an option",
-                choices=[str(i) for i in range(1, len(ANSWER_OPTIONS) + 1)],
-            )
-            updated_version = queue_item.update_with_confidence_score(confidence_score)
-            console.print(f"Due date for review: {updated_version.due_date}")
-            LOGGER.info(
-                f"Due date for review of {queue_item.relative_path}: {updated_version.due_date}"
-            )
-            priority_queue.put(updated_version)
-            updated_version.upsert(cur)
-            con.commit()
-            console.print("")
-            # console.clear()
-        try:
-            queue_item = priority_queue.get(block=False)
-        except Empty:
-            cur.close()
-            break
+    try:
+        forecast = load_forecast(directory, START_TIME, days)
+    except FileNotFoundError as error:
+        raise click.ClickException(str(error))
+    print_forecast(forecast)
 
 
 if __name__ == "__main__":
-    quiz()
+    cli()
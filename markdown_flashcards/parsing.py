@@ -0,0 +1,503 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class CardTypes(str, Enum):
+    NORMAL = "normal"
+    CLOZE = "cloze"
+
+
+# actually, back should not contain ---
+NORMAL_CARD_REGEX = re.compile(
+    r"---\n(?P<frontmatter>.*)\n---\n(?P<front>.*)\n---\n(?P<back>.*)",
+    flags=re.DOTALL,
+)
+CLOZE_REGEX = re.compile(
+    r"---\n(?P<frontmatter>.*)\n---\n(?P<front>.*)",
+    flags=re.DOTALL,
+)
+START_OF_OCCLUSION_REGEX = re.compile(
+    r"£{c(?P<occlusion_number>\d+):(?P<start_of_occluded_text>)"
+)  # e.g. £{c2: without the }, extra } to avoid confusing the editor in which you are viewing this
+
+
+def normalize_dependency_path(directory: Path, card_path: Path, dependency: str) -> str:
+    if not (dependency.startswith("./") or dependency.startswith("../")):
+        return dependency
+    else:
+        dependency_relative_to_card = (card_path.parent / dependency).resolve()
+        return str(dependency_relative_to_card.relative_to(directory, walk_up=True))
+
+
+class ParsedCard(NamedTuple):
+    """
+    Everything `quiz` needs to know about a Markdown file, so that the file does not have to be read again while it is unchanged.
+
+    `kind` is `None` if the file matches neither the normal nor the cloze pattern.
+    For cloze cards, `back` is `None`.
+    """
+
+    relative_path: str
+    mtime_ns: int
+    size: int
+    content_hash: str
+    tags: list
+    dependencies: List[str]
+    kind: Optional[CardTypes]
+    front: Optional[str]
+    back: Optional[str]
+    occlusion_numbers: Tuple[int, ...]
+
+    @property
+    def cloze_front(self) -> Optional[str]:
+        # cloze regex is greedy on the frontmatter
+        # so if the file also matches the normal pattern, the front of the cloze interpretation is what comes after the last separator
+        return self.back if self.kind == CardTypes.NORMAL else self.front
+
+
+def hash_content(raw_bytes: bytes) -> str:
+    return hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+
+
+def parse_card_text(
+    directory: Path,
+    card_path: Path,
+    relative_path: str,
+    raw_bytes: bytes,
+    stat_result: os.stat_result,
+) -> ParsedCard:
+    # imported here, it is only needed for files that aren't in the parse cache
+    import frontmatter  # type: ignore
+
+    raw_text = raw_bytes.decode()
+    # open() in text mode would have translated these
+    raw_text = raw_text.replace("\r\n", "\n").replace("\r", "\n")
+    frontmatter_card = frontmatter.loads(raw_text)
+    dependencies = [
+        normalize_dependency_path(directory, card_path, dependency)
+        for dependency in frontmatter_card.get("dependencies", [])
+    ]
+    normal_card_match = NORMAL_CARD_REGEX.match(raw_text)
+    cloze_match = None if normal_card_match else CLOZE_REGEX.match(raw_text)
+    if normal_card_match:
+        kind, front, back = (
+            CardTypes.NORMAL,
+            normal_card_match.group("front"),
+            normal_card_match.group("back"),
+        )
+    elif cloze_match:
+        kind, front, back = CardTypes.CLOZE, cloze_match.group("front"), None
+    else:
+        kind, front, back = None, None, None
+    occlusion_numbers = tuple(
+        sorted(
+            {
+                int(occlusion_match.group("occlusion_number"))
+                for occlusion_match in START_OF_OCCLUSION_REGEX.finditer(raw_text)
+            }
+        )
+    )
+    return ParsedCard(
+        relative_path,
+        stat_result.st_mtime_ns,
+        stat_result.st_size,
+        hash_content(raw_bytes),
+        frontmatter_card.get("tags", []),
+        dependencies,
+        kind,
+        front,
+        back,
+        occlusion_numbers,
+    )
+
+
+def parse_card_file(
+    directory: Path, card_path: Path, relative_path: str, stat_result: os.stat_result
+) -> ParsedCard:
+    return parse_card_text(
+        directory, card_path, relative_path, card_path.read_bytes(), stat_result
+    )
+
+
+def scan_markdown_files(directory: Path) -> List[Path]:
+    """
+    All Markdown files under `directory`, sorted, using `os.scandir` rather than `Path.glob`.
+    """
+    card_paths = []
+    directories = [directory]
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                # like Path.glob, don't descend into symlinked directories
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(Path(entry.path))
+                elif entry.name.endswith(".md") and entry.is_file():
+                    card_paths.append(Path(entry.path))
+    card_paths.sort()
+    return card_paths
+
+
+def tag_names(tags) -> Set[str]:
+    # frontmatter allows a single tag instead of a list, and tags that YAML reads as numbers
+    return {str(tag) for tag in (tags if isinstance(tags, list) else [tags])}
+
+
+# created by ParseCache
+PARSE_CACHE_TABLES = ("ParsedCards", "CardTags")
+
+
+class ParseCache:
+    """
+    Parsed cards, reused as long as the file's mtime and size are unchanged.
+    """
+
+    def __init__(
+        self,
+        con: sqlite3.Connection,
+        verify_hashes: bool = False,
+        preload: bool = True,
+        read_only: bool = False,
+    ):
+        self.con = con
+        self.verify_hashes = verify_hashes
+        self.hits = 0
+        self.misses = 0
+        self._pending: List[ParsedCard] = []
+        cur = con.cursor()
+        # a read-only connection has to have the tables already, see PARSE_CACHE_TABLES
+        if not read_only:
+            cur.execute("""create table if not exists ParsedCards(
+                RelativePath text primary key,
+                MTimeNs integer,
+                Size integer,
+                ContentHash text,
+                Tags text,
+                Dependencies text,
+                Kind text,
+                Front text,
+                Back text,
+                OcclusionNumbers text
+                )""")
+            has_tag_index = cur.execute(
+                "select 1 from sqlite_master where type='table' and name='CardTags'"
+            ).fetchone()
+            if not has_tag_index:
+                cur.execute("""create table CardTags(
+                    Tag text,
+                    RelativePath text,
+                    primary key (Tag, RelativePath)
+                    ) without rowid""")
+                # caches from before the index
+                cur.executemany(
+                    "insert into CardTags(Tag, RelativePath) values (?, ?)",
+                    [
+                        (tag, relative_path)
+                        for relative_path, tags in cur.execute(
+                            "select RelativePath, Tags from ParsedCards"
+                        ).fetchall()
+                        for tag in tag_names(json.loads(tags))
+                    ],
+                )
+                con.commit()
+        # front and back are only read for the cards that are actually used, see with_body
+        self._entries: Dict[str, ParsedCard] = {}
+        self._preloaded = preload
+        if preload:
+            self._load_entries()
+        self._with_body: Set[str] = set()
+        cur.close()
+
+    def _load_entries(self, relative_paths: Optional[Iterable[str]] = None) -> None:
+        query = "select RelativePath, MTimeNs, Size, ContentHash, Tags, Dependencies, Kind, OcclusionNumbers from ParsedCards"
+        parameters: tuple = ()
+        if relative_paths is not None:
+            unknown = [
+                relative_path
+                for relative_path in relative_paths
+                if relative_path not in self._entries
+            ]
+            if not unknown:
+                return
+            query += " where RelativePath in (select value from json_each(?))"
+            parameters = (json.dumps(unknown),)
+        for row in self.con.execute(query, parameters):
+            self._entries[row[0]] = ParsedCard(
+                row[0],
+                row[1],
+                row[2],
+                row[3],
+                json.loads(row[4]),
+                json.loads(row[5]),
+                CardTypes(row[6]) if row[6] else None,
+                None,
+                None,
+                tuple(json.loads(row[7])),
+            )
+
+    def paths_with_tags(self, tags: Iterable[str]) -> Set[str]:
+        """
+        The paths of the cards with any of `tags`, as of when they were last parsed.
+        """
+        return {
+            relative_path
+            for (relative_path,) in self.con.execute(
+                "select RelativePath from CardTags where Tag in (select value from json_each(?))",
+                (json.dumps(list(tags)),),
+            )
+        }
+
+    def changed_paths(
+        self, card_paths: List[Path], relative_paths: List[str], jobs: int = 1
+    ) -> List[str]:
+        """
+        The paths whose file has no entry, or a different mtime or size than its entry, without reading or loading the entries.
+        """
+        known = {
+            relative_path: (mtime_ns, size)
+            for relative_path, mtime_ns, size in self.con.execute(
+                "select RelativePath, MTimeNs, Size from ParsedCards"
+            )
+        }
+        if jobs > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(jobs) as thread_pool:
+                stat_results = list(thread_pool.map(os.stat, card_paths))
+        else:
+            stat_results = [os.stat(card_path) for card_path in card_paths]
+        return [
+            relative_path
+            for relative_path, stat_result in zip(relative_paths, stat_results)
+            if known.get(relative_path)
+            != (stat_result.st_mtime_ns, stat_result.st_size)
+        ]
+
+    def _cached(
+        self, card_path: Path, relative_path: str, stat_result: os.stat_result
+    ) -> Optional[ParsedCard]:
+        cached = self._entries.get(relative_path)
+        if not (
+            cached
+            and cached.mtime_ns == stat_result.st_mtime_ns
+            and cached.size == stat_result.st_size
+        ):
+            return None
+        if self.verify_hashes and (
+            hash_content(card_path.read_bytes()) != cached.content_hash
+        ):
+            return None
+        return cached
+
+    def _store(self, parsed: ParsedCard) -> None:
+        self._entries[parsed.relative_path] = parsed
+        self._with_body.add(parsed.relative_path)
+        self._pending.append(parsed)
+
+    def get(self, directory: Path, card_path: Path, relative_path: str) -> ParsedCard:
+        stat_result = card_path.stat()
+        if not self._preloaded:
+            self._load_entries([relative_path])
+        cached = self._cached(card_path, relative_path, stat_result)
+        if cached:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        parsed = parse_card_file(directory, card_path, relative_path, stat_result)
+        self._store(parsed)
+        return parsed
+
+    def get_all(
+        self,
+        directory: Path,
+        card_paths: List[Path],
+        relative_paths: List[str],
+        jobs: int = 1,
+    ) -> Dict[str, ParsedCard]:
+        """
+        `get` for many files, in the order of `card_paths`.
+
+        With more than one job, files are stat'ed in a thread pool and the files that have to be parsed are read and parsed in a process pool.
+        The result is the same as with a single job.
+        """
+        if not self._preloaded:
+            self._load_entries(relative_paths)
+        if jobs > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(jobs) as thread_pool:
+                stat_results = list(thread_pool.map(os.stat, card_paths))
+        else:
+            stat_results = [os.stat(card_path) for card_path in card_paths]
+        parsed_cards: Dict[str, Optional[ParsedCard]] = {}
+        misses = []
+        for card_path, relative_path, stat_result in zip(
+            card_paths, relative_paths, stat_results
+        ):
+            parsed_cards[relative_path] = self._cached(
+                card_path, relative_path, stat_result
+            )
+            if not parsed_cards[relative_path]:
+                misses.append((card_path, relative_path, stat_result))
+        self.hits += len(card_paths) - len(misses)
+        self.misses += len(misses)
+        arguments = [
+            [directory] * len(misses),
+            [card_path for (card_path, _, _) in misses],
+            [relative_path for (_, relative_path, _) in misses],
+            [stat_result for (_, _, stat_result) in misses],
+        ]
+        if jobs > 1 and len(misses) > 1:
+            # pulls in multiprocessing, so only when it's used
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(jobs) as process_pool:
+                # map keeps the order of its arguments, so the merge is deterministic
+                parsed_misses = list(
+                    process_pool.map(
+                        parse_card_file,
+                        *arguments,
+                        chunksize=max(1, len(misses) // (jobs * 4)),
+                    )
+                )
+        else:
+            parsed_misses = list(map(parse_card_file, *arguments))
+        for parsed in parsed_misses:
+            self._store(parsed)
+            parsed_cards[parsed.relative_path] = parsed
+        return parsed_cards  # type: ignore
+
+    def entry(self, relative_path: str) -> ParsedCard:
+        """
+        The entry for `relative_path`, whose front and back may not have been read.
+        """
+        return self._entries[relative_path]
+
+    def read_body(
+        self, relative_path: str, con: Optional[sqlite3.Connection] = None
+    ) -> ParsedCard:
+        """
+        Like `with_body`, but without keeping the body around.
+
+        `con` is for reading from another thread than the one that opened the cache's connection.
+        """
+        parsed = self._entries[relative_path]
+        if relative_path in self._with_body:
+            return parsed
+        front, back = (
+            (con or self.con)
+            .execute(
+                "select Front, Back from ParsedCards where RelativePath=?",
+                (relative_path,),
+            )
+            .fetchone()
+        )
+        return parsed._replace(front=front, back=back)
+
+    def drop_bodies(self) -> None:
+        """
+        Forget the front and back of freshly parsed entries, once they have been flushed.
+        """
+        assert not self._pending, "Flush before dropping bodies."
+        for relative_path in self._with_body:
+            self._entries[relative_path] = self._entries[relative_path]._replace(
+                front=None, back=None
+            )
+        self._with_body = set()
+
+    def with_body(self, relative_path: str) -> ParsedCard:
+        """
+        The entry for `relative_path`, including its front and back.
+        """
+        parsed = self._entries[relative_path]
+        if relative_path not in self._with_body:
+            front, back = self.con.execute(
+                "select Front, Back from ParsedCards where RelativePath=?",
+                (relative_path,),
+            ).fetchone()
+            parsed = parsed._replace(front=front, back=back)
+            self._entries[relative_path] = parsed
+            self._with_body.add(relative_path)
+        return parsed
+
+    def evict(self, relative_paths: Iterable[str]) -> None:
+        rows = [(relative_path,) for relative_path in relative_paths]
+        for (relative_path,) in rows:
+            self._entries.pop(relative_path, None)
+            self._with_body.discard(relative_path)
+        self.con.executemany("delete from ParsedCards where RelativePath=?", rows)
+        self.con.executemany("delete from CardTags where RelativePath=?", rows)
+
+    def evict_missing(self, relative_paths: Iterable[str]) -> None:
+        """
+        Evict the entries that are not for one of `relative_paths`.
+        Without `preload`, only the entries that have been asked for are considered.
+        """
+        self.evict(self._entries.keys() - set(relative_paths))
+
+    def flush(self) -> None:
+        self.con.executemany(
+            "insert or replace into ParsedCards(RelativePath, MTimeNs, Size, ContentHash, Tags, Dependencies, Kind, Front, Back, OcclusionNumbers) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    parsed.relative_path,
+                    parsed.mtime_ns,
+                    parsed.size,
+                    parsed.content_hash,
+                    json.dumps(parsed.tags, default=str),
+                    json.dumps(parsed.dependencies),
+                    parsed.kind.value if parsed.kind else None,
+                    parsed.front,
+                    parsed.back,
+                    json.dumps(parsed.occlusion_numbers),
+                )
+                for parsed in self._pending
+            ],
+        )
+        self.con.executemany(
+            "delete from CardTags where RelativePath=?",
+            [(parsed.relative_path,) for parsed in self._pending],
+        )
+        self.con.executemany(
+            "insert into CardTags(Tag, RelativePath) values (?, ?)",
+            [
+                (tag, parsed.relative_path)
+                for parsed in self._pending
+                for tag in tag_names(json.loads(json.dumps(parsed.tags, default=str)))
+            ],
+        )
+        self._pending = []
+        self.con.commit()
+
+
+class CardBodies:
+    """
+    Front and back of the most recently displayed cards, read from the parse cache.
+    """
+
+    def __init__(self, parse_cache: ParseCache, maxsize: int = 32):
+        self.parse_cache = parse_cache
+        self._owner = threading.get_ident()
+        self._database = parse_cache.con.execute("pragma database_list").fetchone()[2]
+        self._local = threading.local()
+        self._read = functools.lru_cache(maxsize=maxsize)(self._read_uncached)
+
+    def get(self, relative_path: str) -> ParsedCard:
+        return self._read(relative_path, self.parse_cache.entry(relative_path).mtime_ns)
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if threading.get_ident() == self._owner:
+            return None
+        if not hasattr(self._local, "con"):
+            self._local.con = sqlite3.connect(self._database)
+        return self._local.con
+
+    def _read_uncached(self, relative_path: str, mtime_ns: int) -> ParsedCard:
+        return self.parse_cache.read_body(relative_path, self._connection())
@@ -0,0 +1,66 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from markdown_flashcards.cards import Card
+
+    # only used in annotations, rich and textual_image are imported by main anyway
+    from rich.markdown import Markdown  # type: ignore
+    from textual_image.renderable import Image  # type: ignore
+
+    Renderables = List[Union[Markdown, Image]]
+
+
+def render_card(card: "Card", directory: Path) -> Tuple["Renderables", "Renderables"]:
+    return card.get_displayed_question(directory), card.get_displayed_answer(directory)
+
+
+class Prefetcher:
+    """
+    Renders the question and answer of upcoming cards in a background thread, while the user is answering the current one.
+    """
+
+    def __init__(self, directory: Path, lookahead: int = 2):
+        self.directory = directory
+        self.lookahead = lookahead
+        self._executor: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+            if lookahead
+            else None
+        )
+        # keyed by the card object itself, a rated or reloaded card is a new object
+        self._futures: Dict["Card", Future] = {}
+
+    def prefetch(self, cards: Iterable["Card"]) -> None:
+        if not self._executor:
+            return
+        wanted = [card for card in list(cards)[: self.lookahead] if card.is_due_today]
+        for card in list(self._futures):
+            if card not in wanted:
+                self._futures.pop(card).cancel()
+        for card in wanted:
+            if card not in self._futures:
+                self._futures[card] = self._executor.submit(
+                    render_card, card, self.directory
+                )
+
+    def take(self, card: "Card") -> Tuple["Renderables", "Renderables"]:
+        future = self._futures.pop(card, None)
+        if future and not future.cancelled():
+            # re-raises whatever rendering raised, like rendering on the spot would
+            return future.result()
+        return render_card(card, self.directory)
+
+    def close(self) -> None:
+        for future in self._futures.values():
+            future.cancel()
+        self._futures = {}
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,78 @@
+import contextlib
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+
+class Profile:
+    """
+    Wall-clock time spent in each phase of a session.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def span(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.setdefault(phase, []).append(time.perf_counter() - start)
+
+    def count(self, name: str, number: int) -> None:
+        """
+        Record a size, like the number of cards, to tell runs on different decks apart.
+        """
+        self.counts[name] = number
+
+    def as_dict(self) -> dict:
+        return {
+            # includes waiting for the user
+            "session_seconds": time.perf_counter() - self.start,
+            "timed_seconds": sum(map(sum, self.spans.values())),
+            "counts": self.counts,
+            "phases": {
+                phase: {
+                    "spans": len(durations),
+                    "total_seconds": sum(durations),
+                    "mean_seconds": statistics.fmean(durations),
+                    "median_seconds": statistics.median(durations),
+                    "max_seconds": max(durations),
+                }
+                for phase, durations in self.spans.items()
+            },
+        }
+
+    def write_json(self, path: Path) -> None:
+        path.write_text(json.dumps(self.as_dict(), indent=2))
+
+    def print_report(self) -> None:
+        from rich.console import Console  # type: ignore
+        from rich.table import Table  # type: ignore
+
+        report = self.as_dict()
+        table = Table(
+            title=f"{report['timed_seconds']:.3f}s timed, "
+            + ", ".join(f"{number} {name}" for name, number in self.counts.items())
+        )
+        table.add_column("Phase", justify="left")
+        table.add_column("Spans", justify="right")
+        table.add_column("Total (ms)", justify="right")
+        table.add_column("Median (ms)", justify="right")
+        table.add_column("Max (ms)", justify="right")
+        table.add_column("Share", justify="right")
+        for phase, timing in report["phases"].items():
+            table.add_row(
+                phase,
+                str(timing["spans"]),
+                f"{timing['total_seconds'] * 1000:.1f}",
+                f"{timing['median_seconds'] * 1000:.2f}",
+                f"{timing['max_seconds'] * 1000:.2f}",
+                f"{timing['total_seconds'] / report['timed_seconds']:.0%}",
+            )
+        Console(stderr=True).print(table)
@@ -0,0 +1,110 @@
+import functools
+from typing import List, Set, Tuple
+
+from markdown_it import MarkdownIt  # type: ignore
+from markdown_it.rules_core import StateCore  # type: ignore
+from markdown_it.token import Token  # type: ignore
+from rich.markdown import Markdown  # type: ignore
+from rich.theme import Theme  # type: ignore
+
+from markdown_flashcards.cloze import CLOZE_TOKEN_REGEX
+
+# the console needs this for the cloze highlight to show, see Markdown.inlines
+CARD_THEME = Theme({"markdown.cloze": "bold yellow"})
+
+
+def find_cloze_markers(children: List[Token]) -> Set[Tuple[int, int]]:
+    """
+    `(child index, offset)` of every `£{c...:` in the text of an inline token that has a matching `}`, and of those `}`.
+    """
+    matched: Set[Tuple[int, int]] = set()
+    # the position of an open occlusion, or None for an open brace inside one
+    open_brackets: list = []
+    for child_index, child in enumerate(children):
+        if child.type != "text":
+            continue
+        for match in CLOZE_TOKEN_REGEX.finditer(child.content):
+            brace = match.group("brace")
+            if brace is None:
+                open_brackets.append((child_index, match.start()))
+            elif not open_brackets:
+                continue
+            elif brace == "{":
+                open_brackets.append(None)
+            else:
+                opening = open_brackets.pop()
+                if opening:
+                    matched.add(opening)
+                    matched.add((child_index, match.start()))
+    return matched
+
+
+def highlight_cloze(state: StateCore) -> None:
+    """
+    Core rule that turns `£{c...:...}` into `cloze_open` and `cloze_close` around its contents.
+
+    Runs after inline parsing, so the contents can still use emphasis and so on.
+    A marker without a matching `}` is left as text.
+    """
+    for block_token in state.tokens:
+        if (
+            block_token.type != "inline"
+            or not block_token.children
+            or "£{c" not in block_token.content
+        ):
+            continue
+        matched = find_cloze_markers(block_token.children)
+        if not matched:
+            continue
+        children = []
+        for child_index, child in enumerate(block_token.children):
+            if child.type != "text":
+                children.append(child)
+                continue
+            position = 0
+            for match in CLOZE_TOKEN_REGEX.finditer(child.content):
+                if (child_index, match.start()) not in matched:
+                    continue
+                if match.start() > position:
+                    text = Token("text", "", 0)
+                    text.content = child.content[position : match.start()]
+                    children.append(text)
+                if match.group("brace"):
+                    children.append(Token("cloze_close", "cloze", -1))
+                else:
+                    children.append(Token("cloze_open", "cloze", 1))
+                position = match.end()
+            if position < len(child.content):
+                text = Token("text", "", 0)
+                text.content = child.content[position:]
+                children.append(text)
+        block_token.children = children
+
+
+# the same plugins rich enables, plus the highlight
+MARKDOWN_PARSER = MarkdownIt().enable("strikethrough").enable("table")
+MARKDOWN_PARSER.core.ruler.after("inline", "highlight_cloze", highlight_cloze)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_markdown(markup: str) -> List[Token]:
+    """
+    Tokens for `markup`, cached because a card's segments are shown again when it comes back in the queue.
+
+    Rich only reads the tokens, so they can be shared between renderables.
+    """
+    return MARKDOWN_PARSER.parse(markup)
+
+
+class CardMarkdown(Markdown):
+    """
+    `rich.markdown.Markdown` that reuses `MARKDOWN_PARSER` and the token cache instead of building a parser for every instance.
+    """
+
+    inlines = Markdown.inlines | {"cloze"}
+
+    def __init__(self, markup: str) -> None:
+        # parsing an empty string is cheap, and rich sets up the rest of its attributes
+        super().__init__("")
+        self.markup = markup
+        self.parsed = parse_markdown(markup)
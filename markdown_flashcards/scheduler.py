@@ -0,0 +1,74 @@
+import heapq
+import itertools
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from markdown_flashcards.cards import Card
+
+
+class Scheduler:
+    """
+    Review queue that shows prerequisites before the cards that depend on them.
+    """
+
+    def __init__(self, layers: Dict[str, int]):
+        self.layers = layers
+        self._heap: List[Tuple[bool, int, object, int, "Card"]] = []
+        self._counter = itertools.count()
+
+    def push(self, card: "Card") -> None:
+        heapq.heappush(
+            self._heap,
+            (
+                not card.is_due_at_start,
+                self.layers.get(card.relative_path, 0),
+                card.due_date,
+                next(self._counter),
+                card,
+            ),
+        )
+
+    def pop(self) -> Optional["Card"]:
+        """
+        Remove and return the next card, or `None` if the queue is empty.
+        """
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[-1]
+
+    def peek(self, count: int) -> List["Card"]:
+        """
+        The next `count` cards, in the order `pop` would return them, without removing them.
+        """
+        # walks down from the root of the heap, so this is O(count log count) regardless of the size of the queue
+        cards: List["Card"] = []
+        frontier = [(self._heap[0], 0)] if self._heap else []
+        while frontier and len(cards) < count:
+            entry, index = heapq.heappop(frontier)
+            cards.append(entry[-1])
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child], child))
+        return cards
+
+    def remove(self, relative_paths: Set[str]) -> List["Card"]:
+        """
+        Take the cards for `relative_paths` out of the queue and return them.
+        """
+        # O(n), but only needed when cards change during a session
+        removed = [
+            entry[-1]
+            for entry in self._heap
+            if entry[-1].relative_path in relative_paths
+        ]
+        if removed:
+            self._heap = [
+                entry
+                for entry in self._heap
+                if entry[-1].relative_path not in relative_paths
+            ]
+            heapq.heapify(self._heap)
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._heap)
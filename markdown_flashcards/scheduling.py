@@ -0,0 +1,109 @@
+import datetime
+import math
+from typing import NamedTuple, Optional
+
+MIDNIGHT = datetime.time(0, 0, 0)
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class Policy(NamedTuple):
+    """
+    The numbers in the scheduling rules, so `simulation` can try out others.
+    """
+
+    # score 2 ("hard"): a bit sooner than last time, but not right away
+    hard_factor: float = 0.8
+    hard_minimum_minutes: float = 3
+    # score 3 ("easy"): the time delta grows by this factor once it's this many days
+    # shorter time deltas are rounded up to whole days, from midnight
+    good_factor: float = 1.25
+    good_factor_from_days: float = 4
+    good_maximum_days: int = 365 // 2
+    # score 4 ("very easy"): same, but shorter time deltas mean midnight the day after tomorrow
+    easy_factor: float = 2
+    easy_factor_from_days: float = 1
+    easy_maximum_days: int = 365
+
+
+DEFAULT_POLICY = Policy()
+
+
+def round_timedelta_days_up(timedelta):
+    # this is a bit trickier than it seems
+    # e.g. a timedelta of 3 weeks and 2 days has 0 for the "milliseconds" property
+    # total_seconds() does work
+    # but it's only for seconds
+    # but, to be fair, we don't need millisecond level accuracy here
+    days_in_timedelta = timedelta.total_seconds() / 60 / 60 / 24
+    if (days_in_timedelta).is_integer():
+        # make a (rough) copy because the other branch definitely returns a new object
+        # would be inconsistent to just change the object here
+        return datetime.timedelta(seconds=timedelta.total_seconds())
+    else:
+        return datetime.timedelta(seconds=math.ceil(days_in_timedelta) * 24 * 60 * 60)
+
+
+def compute_due_date(
+    last_review_date: Optional[datetime.datetime],
+    confidence_score: Optional[int],
+    previous_time_delta: Optional[datetime.timedelta],
+    policy: Policy = DEFAULT_POLICY,
+) -> Optional[datetime.datetime]:
+    """
+    The scheduling rules behind `Card.due_date`, which uses the `DEFAULT_POLICY`.
+
+    `None` means the card is due right away, i.e. at the start of whichever session sees it.
+    """
+    if not (last_review_date and confidence_score and previous_time_delta):
+        return None
+    else:
+        match confidence_score:
+            case 1:
+                return None
+
+            case 2:
+                return max(
+                    last_review_date
+                    + datetime.timedelta(minutes=policy.hard_minimum_minutes),
+                    last_review_date + (previous_time_delta * policy.hard_factor),
+                )
+            case 3:
+                # always postpone until at least tomorrow
+                # otherwise, we might still have to review (multiple times) today if gap was small
+                return min(
+                    (
+                        last_review_date + (previous_time_delta * policy.good_factor)
+                        if previous_time_delta
+                        >= datetime.timedelta(days=policy.good_factor_from_days)
+                        # it may seem odd to use last_review_date instead of TODAY here
+                        # but it makes sense
+                        # TODAY is dependent on when we are running the program
+                        # so due dates would *always* end up being in the future
+                        # and last_review_date is set when we practice a card
+                        # so it's the "today" of when we last viewed the card
+                        else datetime.datetime.combine(
+                            last_review_date.date()
+                            # so if it's been less than a day, add at least one day
+                            # so if it's been less than two, add at least two
+                            # eventually, we'll round up to 4 and hit the exponential part
+                            + round_timedelta_days_up(previous_time_delta),
+                            MIDNIGHT,
+                        )
+                    ),
+                    last_review_date
+                    + datetime.timedelta(days=policy.good_maximum_days),
+                )
+            case 4:
+                return min(
+                    (
+                        last_review_date + (previous_time_delta * policy.easy_factor)
+                        if previous_time_delta
+                        >= datetime.timedelta(days=policy.easy_factor_from_days)
+                        else datetime.datetime.combine(
+                            last_review_date.date() + (ONE_DAY * 2), MIDNIGHT
+                        )
+                    ),
+                    last_review_date
+                    + datetime.timedelta(days=policy.easy_maximum_days),
+                )
+    assert False, "Cases are exhaustive."
@@ -0,0 +1,696 @@
+import datetime
+import logging
+import os
+from pathlib import Path
+from typing import (
+    Container,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+)
+
+from markdown_flashcards.cards import TODAY, Card, ClozeVariant, NormalCard
+from markdown_flashcards.check import Problem
+from markdown_flashcards.dependencies import DependencyGraph, DependencyLayers
+from markdown_flashcards.history import (
+    HistoryEntry,
+    HistoryWriter,
+    delete_history,
+    encode_history_row,
+    connect,
+    create_cards_table,
+    group_by_path,
+    load_card_types,
+    load_history,
+    paths_under,
+    paths_without_files,
+    upsert_history_rows,
+)
+from markdown_flashcards.parsing import (
+    CardBodies,
+    CardTypes,
+    ParseCache,
+    ParsedCard,
+    scan_markdown_files,
+    tag_names,
+)
+from markdown_flashcards.profiling import Profile
+from markdown_flashcards.scheduler import Scheduler
+from markdown_flashcards.scheduling import MIDNIGHT, ONE_DAY
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ReviewSession:
+    """
+    A review of a deck, without a terminal: reads the history, builds the queue of due cards and records ratings.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        verify_hashes: bool = False,
+        jobs: int = 1,
+        lazy_bodies: bool = False,
+        batch_size: int = 1000,
+        max_delay_seconds: float = 2.0,
+        profile: Optional[Profile] = None,
+        tags: Iterable[str] = (),
+        paths: Iterable[str] = (),
+    ):
+        self.directory = directory
+        self.verify_hashes = verify_hashes
+        self.jobs = jobs
+        self.lazy_bodies = lazy_bodies
+        self.profile = profile or Profile()
+        self.tags: Set[str] = set(tags)
+        self.path_prefixes: List[str] = [
+            self._relative_prefix(Path(path)) for path in paths
+        ]
+        self.scoped = bool(self.tags or self.path_prefixes)
+        # the parts of the scope without any cards, set while finding it
+        self.unmatched_tags: List[str] = []
+        self.unmatched_paths: List[str] = []
+        # set by start, or while finding the scope
+        self.parse_cache: Optional[ParseCache] = None
+        self.con = connect(directory)
+        self.cur = self.con.cursor()
+        with self.profile.span("scan"):
+            if self.scoped:
+                self.card_paths: List[Path] = self._find_scope()
+            else:
+                self.card_paths = scan_markdown_files(directory)
+            self.relative_card_paths: List[str] = [
+                str(card_path.relative_to(directory, walk_up=True))
+                for card_path in self.card_paths
+            ]
+            LOGGER.debug("Card paths: %s", self.card_paths)
+        self.profile.count("files", len(self.card_paths))
+        with self.profile.span("database load"):
+            LOGGER.debug("Creating table if necessary.")
+            create_cards_table(self.cur)
+            scope = None
+            if self.scoped:
+                # so missing_paths only has the paths in scope
+                scope = set(self.relative_card_paths) | {
+                    relative_path
+                    for relative_path in paths_under(self.cur, self.path_prefixes)
+                    | self.parse_cache.paths_with_tags(self.tags)
+                    if not (directory / relative_path).is_file()
+                }
+            self.known_card_types = load_card_types(self.cur, scope)
+            # one query for the history of everything that is due today, instead of one per card
+            self.due_before = datetime.datetime.combine(TODAY + ONE_DAY, MIDNIGHT)
+            self.due_history = load_history(
+                self.cur,
+                due_before=self.due_before,
+                relative_paths=self.relative_card_paths if self.scoped else None,
+            )
+        self.missing_paths: List[str] = sorted(
+            paths_without_files(self.known_card_types, self.relative_card_paths)
+        )
+        # cards that could not be queued, added to by start and reload, for the caller to show
+        self.problems: List[Problem] = []
+        self.history_writer = HistoryWriter(self.con, batch_size, max_delay_seconds)
+        self.scheduler = Scheduler({})
+        # set by start
+        self.dependency_graph: Optional[DependencyGraph] = None
+        self.dependency_layers: Optional[DependencyLayers] = None
+        self.bodies: Optional[CardBodies] = None
+
+    def _relative_prefix(self, path: Path) -> str:
+        if path.is_absolute():
+            path = path.relative_to(self.directory.absolute(), walk_up=True)
+        return os.path.normpath(path)
+
+    def _in_prefixes(self, relative_path: str) -> bool:
+        return any(
+            prefix == "."
+            or relative_path == prefix
+            or relative_path.startswith(prefix + os.sep)
+            for prefix in self.path_prefixes
+        )
+
+    def _find_scope(self) -> List[Path]:
+        """
+        The Markdown files under `path_prefixes` or with one of `tags`, and the ones they depend on.
+        """
+        # only the entries in scope are read from ParsedCards
+        self.parse_cache = ParseCache(
+            self.con, verify_hashes=self.verify_hashes, preload=False
+        )
+        selected: Set[str] = set()
+        for prefix in self.path_prefixes:
+            target = self.directory / prefix
+            if target.is_dir():
+                selected.update(
+                    str(card_path.relative_to(self.directory, walk_up=True))
+                    for card_path in scan_markdown_files(target)
+                )
+            elif target.is_file():
+                selected.add(prefix)
+            else:
+                LOGGER.warning("There are no cards at %s.", target)
+                self.unmatched_paths.append(prefix)
+        if self.tags:
+            # the tag index has files as they were last parsed, so the ones that are new or changed since then are parsed too
+            card_paths = scan_markdown_files(self.directory)
+            relative_paths = [
+                str(card_path.relative_to(self.directory, walk_up=True))
+                for card_path in card_paths
+            ]
+            candidates = sorted(
+                (self.parse_cache.paths_with_tags(self.tags) & set(relative_paths))
+                | set(
+                    self.parse_cache.changed_paths(
+                        card_paths, relative_paths, jobs=self.jobs
+                    )
+                )
+            )
+            parsed_cards = self.parse_cache.get_all(
+                self.directory,
+                [self.directory / relative_path for relative_path in candidates],
+                candidates,
+                jobs=self.jobs,
+            )
+            # so they aren't parsed again if start finds nothing to do
+            self.parse_cache.flush()
+            found_tags: Set[str] = set()
+            for relative_path, parsed_card in parsed_cards.items():
+                if self._has_tag(parsed_card):
+                    selected.add(relative_path)
+                    found_tags |= self.tags & tag_names(parsed_card.tags)
+            self.unmatched_tags = sorted(self.tags - found_tags)
+            for tag in self.unmatched_tags:
+                LOGGER.warning("There are no cards with the tag %s.", tag)
+        return sorted(
+            self.directory / relative_path
+            for relative_path in self._with_prerequisites(selected)
+        )
+
+    def _has_tag(self, parsed_card: ParsedCard) -> bool:
+        return bool(self.tags & tag_names(parsed_card.tags))
+
+    def _with_prerequisites(
+        self, relative_paths: Set[str], known: Container[str] = ()
+    ) -> Set[str]:
+        """
+        `relative_paths` and the cards they depend on, directly or not, up to the ones in `known`.
+        Dependencies without a file are left out, `start` reports those.
+        """
+        found: Set[str] = set()
+        pending = set(relative_paths)
+        while pending:
+            found |= pending
+            ordered = sorted(pending)
+            parsed_cards = self.parse_cache.get_all(
+                self.directory,
+                [self.directory / relative_path for relative_path in ordered],
+                ordered,
+                jobs=self.jobs,
+            )
+            pending = {
+                str(dependency)
+                for parsed_card in parsed_cards.values()
+                for dependency in parsed_card.dependencies
+                if str(dependency) not in found
+                and str(dependency) not in known
+                and (self.directory / str(dependency)).is_file()
+            }
+        return found
+
+    def forget(self, relative_path: str) -> None:
+        """
+        Delete the history of a card, for paths in `missing_paths`.
+        """
+        delete_history(self.cur, relative_path)
+        self.con.commit()
+
+    @property
+    def has_work(self) -> bool:
+        # new cards have to be added to the database even if nothing is due
+        return bool(self.due_history) or not (
+            set(self.relative_card_paths) <= self.known_card_types.keys()
+        )
+
+    def start(self) -> int:
+        """
+        Parse the cards and put the ones that are due, or new, in the queue.
+        Returns the number of cards in the queue.
+        """
+        if not self.has_work:
+            # no need to parse anything or build the graph
+            LOGGER.info("Nothing is due.")
+            return 0
+        # unchanged files are not read again, see ParseCache
+        with self.profile.span("parse"):
+            if self.parse_cache is None:
+                self.parse_cache = ParseCache(
+                    self.con, verify_hashes=self.verify_hashes
+                )
+            parsed_cards: Dict[str, ParsedCard] = self.parse_cache.get_all(
+                self.directory,
+                self.card_paths,
+                self.relative_card_paths,
+                jobs=self.jobs,
+            )
+            if not self.scoped:
+                # a scoped session doesn't know which files outside of it are gone
+                self.parse_cache.evict_missing(self.relative_card_paths)
+            self.parse_cache.flush()
+            LOGGER.debug(
+                "Parse cache: %s hits, %s misses.",
+                self.parse_cache.hits,
+                self.parse_cache.misses,
+            )
+        # only once every card is parsed, so dependencies without a file can be told apart
+        with self.profile.span("graph build"):
+            self.dependency_graph = DependencyGraph()
+            for card_relative_path, parsed_card in parsed_cards.items():
+                LOGGER.debug("Adding %s to dependency graph.", card_relative_path)
+                self._add_dependency_edges(
+                    card_relative_path, parsed_card.dependencies, parsed_cards
+                )
+            LOGGER.debug("Dependency graph: %s", self.dependency_graph)
+            LOGGER.debug(
+                "%s nodes, %s edges.",
+                len(self.dependency_graph),
+                self.dependency_graph.number_of_edges(),
+            )
+            # one pass over the graph instead of a traversal per card
+            self.dependency_layers = DependencyLayers(self.dependency_graph)
+        if self.lazy_bodies:
+            # the parsed cards are only needed for the graph, the text can be read back from ParsedCards
+            del parsed_cards
+            self.parse_cache.drop_bodies()
+            self.bodies = CardBodies(self.parse_cache)
+        with self.profile.span("queue build"):
+            self.scheduler = Scheduler(self.dependency_layers.layers)
+            due_history_by_path = group_by_path(self.due_history)
+            # card_paths here is based on located MD files
+            for card_path, relative_path in zip(
+                self.card_paths, self.relative_card_paths
+            ):
+                self._queue_card(
+                    card_path,
+                    relative_path,
+                    # plural due to Cloze variants
+                    self.known_card_types.get(relative_path, {}),
+                    due_history_by_path.get(relative_path, []),
+                )
+            self.history_writer.flush()
+        self.profile.count("queued cards", len(self.scheduler))
+        return len(self.scheduler)
+
+    def _add_dependency_edges(
+        self, relative_path: str, dependencies: List[str], present: Container[str]
+    ) -> None:
+        valid = []
+        for dependency in dependencies:
+            if dependency not in present:
+                LOGGER.error(
+                    "%s is mentioned as a dependency of %s, but there is no Markdown file with this path (relative to the overall cards directory. Ignoring the dependency (and potential transitive dependencies).",
+                    dependency,
+                    relative_path,
+                )
+                LOGGER.debug("all relative card paths: %s", self.relative_card_paths)
+            else:
+                valid.append(str(dependency))
+        self.dependency_graph.set_dependencies(relative_path, valid)
+
+    def _queue_card(
+        self,
+        card_path: Path,
+        relative_path: str,
+        db_card_types: Dict[int, str],
+        db_entries_for_card: List[HistoryEntry],
+    ) -> None:
+        if db_card_types and not db_entries_for_card:
+            # nothing due today, so no need for the body of the card either
+            return
+        parsed_card = (
+            self.parse_cache.entry(relative_path)
+            if self.bodies
+            else self.parse_cache.with_body(relative_path)
+        )
+        LOGGER.info("DB entries for card %s: %s", card_path, db_entries_for_card)
+        if db_card_types:
+            # want to access via index but also don't want duplicates, so list({...})
+            card_types = list(set(db_card_types.values()))
+            if len(card_types) > 1:
+                self._report(
+                    relative_path,
+                    "database-mismatch",
+                    "The database has more than one card type for this card.",
+                )
+                return
+            elif card_types[0] == CardTypes.NORMAL and len(db_card_types) > 1:
+                self._report(
+                    relative_path,
+                    "database-mismatch",
+                    "A normal card according to the database, but it has rows for several cloze variants.",
+                )
+            else:
+                db_entry = db_entries_for_card[0]
+                LOGGER.info("DB entry for single card type: %s", db_entry)
+                card_type = card_types.pop()
+                if card_type == CardTypes.NORMAL:
+                    if parsed_card.kind == CardTypes.NORMAL:
+                        card = NormalCard(
+                            relative_path,
+                            parsed_card.tags,
+                            db_entry.last_review_date,
+                            db_entry.confidence_score,
+                            db_entry.previous_time_delta,
+                            parsed_card.front,
+                            parsed_card.back,
+                            self.bodies,
+                        )
+                        self.scheduler.push(card)
+                    else:
+                        LOGGER.error(
+                            "Card at %s should be a regular flash card according to DB but does not match the regular expression for a regular flash card. It will not go into the queue. You should either fix the card or remove the database entry.",
+                            card_path,
+                        )
+                elif card_type == CardTypes.CLOZE:
+                    # anything matching the normal pattern also matches the cloze pattern
+                    if parsed_card.kind is not None:
+                        occlusion_numbers_in_file = set(parsed_card.occlusion_numbers)
+                        occlusion_numbers_in_db = {
+                            int(cloze_variant) for cloze_variant in db_card_types
+                        }
+                        if occlusion_numbers_in_file == occlusion_numbers_in_db:
+                            cards = [
+                                ClozeVariant(
+                                    relative_path,
+                                    parsed_card.tags,
+                                    db_entry.last_review_date,
+                                    db_entry.confidence_score,
+                                    db_entry.previous_time_delta,
+                                    parsed_card.cloze_front,
+                                    db_entry.cloze_variant,
+                                    self.bodies,
+                                )
+                                for db_entry in db_entries_for_card
+                            ]
+                            for card in cards:
+                                self.scheduler.push(card)
+                        else:
+                            LOGGER.error(
+                                "Card at %s does not use the same occlusion numbers %s that are mentioned in the database. Its variants will not go into the queue. You should update the database records or change the file to use precisely the aforementioned occlusion numbers.",
+                                card_path,
+                                occlusion_numbers_in_db,
+                            )
+
+                    else:
+                        LOGGER.error(
+                            "Card at %s should be a cloze card according to DB but does not match the regular expression for a cloze card. It will not go into the queue. You should either fix the card or remove the database entries for its variants.",
+                            card_path,
+                        )
+        else:
+            # no entries, so need to create suitable entry
+            if parsed_card.kind == CardTypes.NORMAL:
+                card = NormalCard(
+                    relative_path,
+                    parsed_card.tags,
+                    None,
+                    None,
+                    None,
+                    parsed_card.front,
+                    parsed_card.back,
+                    self.bodies,
+                )
+                self.history_writer.add(card.history_row())
+                self.scheduler.push(card)
+            elif parsed_card.kind == CardTypes.CLOZE:
+                if not parsed_card.occlusion_numbers:
+                    self._report(
+                        relative_path, "no-occlusions", "Cloze card without occlusions."
+                    )
+                    return
+                else:
+                    cards = [
+                        ClozeVariant(
+                            relative_path,
+                            parsed_card.tags,
+                            None,
+                            None,
+                            None,
+                            parsed_card.front,
+                            occlusion_number,
+                            self.bodies,
+                        )
+                        for occlusion_number in parsed_card.occlusion_numbers
+                    ]
+                    for card in cards:
+                        self.scheduler.push(card)
+                        self.history_writer.add(card.history_row())
+            else:
+                self._report(
+                    relative_path,
+                    "no-pattern",
+                    "Does not match either the normal or the cloze pattern.",
+                )
+
+    def _report(self, relative_path: str, kind: str, message: str) -> None:
+        LOGGER.warning("%s: %s", relative_path, message)
+        self.problems.append(Problem(relative_path, kind, message))
+
+    def reload(self, changed: Iterable[str], removed: Iterable[str]) -> Set[str]:
+        """
+        Catch up with Markdown files that were added, changed or removed since `start`, without a full rebuild.
+
+        Only those files are parsed again and the dependency graph and its layers are patched, see `DependencyLayers.update`.
+        Changed files get rows in `Cards` for new occlusions, and new files get rows like at startup.
+        No rows are deleted, a changed file that no longer matches its rows ends up in `problems`.
+        Removed files keep their rows, those are only deleted when asked for, at startup.
+        The queued cards of every path whose text or dependencies changed are replaced.
+        Returns those paths.
+        """
+        changed = set(changed)
+        removed = set(removed)
+        if self.dependency_layers is None or not (changed or removed):
+            # without a queue, because start found nothing to do, there's nothing to patch
+            return set()
+        with self.profile.span("reload"):
+            # rows are read back below, so they have to include the latest ratings
+            self.history_writer.flush()
+            present = set(self.relative_card_paths)
+            removed &= present
+            if self.scoped:
+                changed = self._scoped_changes(changed, present)
+            for relative_path in sorted(changed):
+                try:
+                    self.parse_cache.get(
+                        self.directory, self.directory / relative_path, relative_path
+                    )
+                except FileNotFoundError:
+                    # removed again before it could be read
+                    removed.add(relative_path)
+            changed -= removed
+            removed &= present
+            self.card_paths = sorted(
+                {self.directory / relative_path for relative_path in present | changed}
+                - {self.directory / relative_path for relative_path in removed}
+            )
+            self.relative_card_paths = [
+                str(card_path.relative_to(self.directory, walk_up=True))
+                for card_path in self.card_paths
+            ]
+            if self.scoped:
+                self.parse_cache.evict(removed)
+            else:
+                self.parse_cache.evict_missing(self.relative_card_paths)
+            self.parse_cache.flush()
+            if self.bodies:
+                self.parse_cache.drop_bodies()
+            self._update_rows(changed)
+            touched = self._patch_dependency_graph(changed, removed)
+            affected = self.dependency_layers.update(
+                self.dependency_graph, touched, removed
+            )
+            self.scheduler.remove(affected | removed)
+            self.known_card_types.update(load_card_types(self.cur, affected))
+            due_history_by_path = group_by_path(
+                load_history(
+                    self.cur, due_before=self.due_before, relative_paths=affected
+                )
+            )
+            for relative_path in sorted(affected):
+                self._queue_card(
+                    self.directory / relative_path,
+                    relative_path,
+                    self.known_card_types.get(relative_path, {}),
+                    due_history_by_path.get(relative_path, []),
+                )
+            self.history_writer.flush()
+        LOGGER.info(
+            "Reloaded %s changed and %s removed files, %s cards requeued.",
+            len(changed),
+            len(removed),
+            len(affected),
+        )
+        return affected
+
+    def _scoped_changes(self, changed: Set[str], present: Set[str]) -> Set[str]:
+        """
+        The changed files that are, or now fall, in scope, with any new prerequisites.
+        """
+        in_scope = set()
+        for relative_path in changed:
+            if relative_path in present or self._in_prefixes(relative_path):
+                in_scope.add(relative_path)
+            elif self.tags:
+                try:
+                    parsed_card = self.parse_cache.get(
+                        self.directory, self.directory / relative_path, relative_path
+                    )
+                except FileNotFoundError:
+                    continue
+                if self._has_tag(parsed_card):
+                    in_scope.add(relative_path)
+        try:
+            return self._with_prerequisites(in_scope, present)
+        except FileNotFoundError:
+            # removed again in the meantime, the parse below sorts that out
+            return in_scope
+
+    def _update_rows(self, relative_paths: Set[str]) -> None:
+        """
+        Add the rows in `Cards` that edited cards now need, like new occlusions, deciding the card type the way `_queue_card` does.
+        Rows are never deleted here, a file that no longer matches its rows is reported as a problem instead.
+        """
+        new_rows = []
+        for relative_path, db_card_types in load_card_types(
+            self.cur, relative_paths
+        ).items():
+            parsed_card = self.parse_cache.entry(relative_path)
+            card_types = set(db_card_types.values())
+            if len(card_types) > 1 or parsed_card.kind is None:
+                # reported when the card is queued, or probably saved halfway through an edit
+                continue
+            if CardTypes.NORMAL in card_types:
+                if parsed_card.kind != CardTypes.NORMAL:
+                    self._report(
+                        relative_path,
+                        "database-mismatch",
+                        "A normal card according to the database, but it does not match the pattern for a normal card.",
+                    )
+                continue
+            # anything matching the normal pattern also matches the cloze pattern
+            if not parsed_card.occlusion_numbers:
+                continue
+            occlusion_numbers = set(parsed_card.occlusion_numbers)
+            if not occlusion_numbers >= db_card_types.keys():
+                self._report(
+                    relative_path,
+                    "database-mismatch",
+                    f"Uses occlusion numbers {sorted(occlusion_numbers)}, but the database has {sorted(db_card_types)}.",
+                )
+                continue
+            new_rows.extend(
+                encode_history_row(
+                    CardTypes.CLOZE, occlusion_number, relative_path, None, None, None
+                )
+                for occlusion_number in sorted(occlusion_numbers - db_card_types.keys())
+            )
+        with self.con:
+            upsert_history_rows(self.con, new_rows)
+
+    def _patch_dependency_graph(self, changed: Set[str], removed: Set[str]) -> Set[str]:
+        """
+        Update the edges of changed cards and drop removed ones.
+        Returns the cards whose dependencies changed, see `DependencyLayers.update`.
+        """
+        touched = set(changed)
+        removed_nodes = [
+            relative_path
+            for relative_path in removed
+            if relative_path in self.dependency_graph
+        ]
+        # before any edits, which would rebuild the graph for every lookup
+        for relative_path in removed_nodes:
+            touched.update(self.dependency_graph.predecessors(relative_path))
+        for relative_path in removed_nodes:
+            self.dependency_graph.remove_node(relative_path)
+        present = set(self.relative_card_paths)
+        added = {
+            relative_path
+            for relative_path in changed
+            if relative_path not in self.dependency_graph
+        }
+        for relative_path in changed:
+            self._add_dependency_edges(
+                relative_path,
+                self.parse_cache.entry(relative_path).dependencies,
+                present,
+            )
+        if added:
+            # cards that mention a new file as a dependency were missing it until now
+            for relative_path in self.relative_card_paths:
+                dependencies = self.parse_cache.entry(relative_path).dependencies
+                if relative_path not in changed and added.intersection(dependencies):
+                    self._add_dependency_edges(relative_path, dependencies, present)
+                    touched.add(relative_path)
+        return touched - removed
+
+    def next_card(self) -> Optional[Card]:
+        """
+        Remove the next card that is due today from the queue and return it, or `None` if there is none.
+        """
+        with self.profile.span("queue"):
+            card = self.scheduler.pop()
+            # a rated card goes back into the queue, but it is usually not due again today
+            while card and not card.is_due_today:
+                card = self.scheduler.pop()
+        if card:
+            LOGGER.info("%s", card)
+            LOGGER.info("Due %s", card.due_date)
+        return card
+
+    def due_cards(self) -> Iterator[Card]:
+        card = self.next_card()
+        while card:
+            yield card
+            card = self.next_card()
+
+    def peek(self, count: int) -> List[Card]:
+        """
+        The next `count` cards in the queue, without removing them.
+        """
+        with self.profile.span("queue"):
+            return self.scheduler.peek(count)
+
+    def rate(self, card: Card, confidence_score: int) -> Card:
+        """
+        Record a rating for a card returned by `next_card`, put the updated card back in the queue and return it.
+        """
+        updated_version = card.update_with_confidence_score(confidence_score)
+        LOGGER.info(
+            "Due date for review of %s: %s",
+            card.relative_path,
+            updated_version.due_date,
+        )
+        with self.profile.span("queue"):
+            self.scheduler.push(updated_version)
+        with self.profile.span("database write"):
+            self.history_writer.add(updated_version.history_row())
+        return updated_version
+
+    def flush(self) -> None:
+        with self.profile.span("database write"):
+            self.history_writer.flush()
+
+    def close(self) -> None:
+        self.history_writer.flush()
+        self.cur.close()
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,303 @@
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np  # type: ignore
+
+from markdown_flashcards.forecast import SECONDS_PER_DAY, due_dates
+from markdown_flashcards.scheduling import DEFAULT_POLICY, Policy
+
+# the chance to recall a card after `stability` days, see RatingModel
+RECALL_AT_STABILITY = 0.9
+# a card that is still due today after this many rounds of a session waits for the next session
+MAX_ROUNDS = 10
+# how often the retrievability of every card is measured, it's a pass over all of them
+RETRIEVABILITY_EVERY_DAYS = 7
+# users are simulated in batches, each with its own random numbers, so results don't depend on the number of jobs
+BATCH_USERS = 100
+
+
+class RatingModel(NamedTuple):
+    """
+    Synthetic users, how often they review and how they rate cards.
+    """
+
+    # the k-th card of a user is new on day k // new_cards_per_day
+    new_cards_per_day: int = 20
+    # chance that a user has a session on a given day
+    attendance: float = 0.9
+    # sessions start at a time of day in this range, the same for every session of a user
+    session_hours: Tuple[float, float] = (7, 22)
+    seconds_per_review: float = 15
+    # chance to recall a card the first time it is shown
+    first_recall: float = 0.6
+    # stability after the first review of a card of average ease, whether it was recalled or not
+    initial_stability_days: float = 1
+    # cards vary in ease, this is the standard deviation of its logarithm
+    ease_spread: float = 0.5
+    # a review at RECALL_AT_STABILITY multiplies the stability by 1 + growth * ease
+    growth: float = 1.5
+    lapse_factor: float = 0.3
+    # a recalled card is rated 4 when the chance to recall it, plus noise, is at least easy_threshold, 3 when it is at least good_threshold, 2 otherwise
+    easy_threshold: float = 0.97
+    good_threshold: float = 0.85
+    rating_noise: float = 0.05
+
+
+DEFAULT_MODEL = RatingModel()
+
+
+class SimulationResult(NamedTuple):
+    """
+    Counts per simulated day, summed over users, so results for batches of users can be added up.
+    """
+
+    users: int
+    cards: int
+    reviews: np.ndarray
+    # reviews of cards that were reviewed before, the first time they come up in a session
+    scheduled: np.ndarray
+    # scheduled reviews rated 1
+    lapses: np.ndarray
+    # the sum of the chances to recall, over the scheduled reviews
+    recall: np.ndarray
+    # every RETRIEVABILITY_EVERY_DAYS days, the sum of the chances to recall every card that was reviewed so far, and how many there are
+    retrievability: np.ndarray
+    introduced: np.ndarray
+    # how many sessions had 0, 1, 2... reviews
+    session_sizes: np.ndarray
+
+
+def review(
+    last_review_dates: np.ndarray,
+    review_times: np.ndarray,
+    session_starts: np.ndarray,
+    confidence_scores: np.ndarray,
+    policy: Policy = DEFAULT_POLICY,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    `update_with_confidence_score` for arrays, in `wall_seconds`: the new time deltas and due dates.
+
+    `last_review_dates` is NaN for new cards, their time delta starts at the start of the session, like it does from `START_TIME`.
+    """
+    previous_time_deltas = review_times - np.where(
+        np.isnan(last_review_dates), session_starts, last_review_dates
+    )
+    return previous_time_deltas, due_dates(
+        review_times, confidence_scores, previous_time_deltas, session_starts, policy
+    )
+
+
+def simulate_batch(
+    policy: Policy,
+    model: RatingModel,
+    users: int,
+    cards_per_user: int,
+    days: int,
+    seed: np.random.SeedSequence,
+) -> SimulationResult:
+    rng = np.random.default_rng(seed)
+    user_of_card = np.repeat(np.arange(users), cards_per_user)
+    number_of_cards = len(user_of_card)
+    new_on_day = np.tile(np.arange(cards_per_user) // model.new_cards_per_day, users)
+    ease = rng.lognormal(0, model.ease_spread, number_of_cards)
+    stability = np.full(number_of_cards, np.nan)
+    last_review_dates = np.full(number_of_cards, np.nan)
+    # new cards are due from the day they come in, before the cards due later that day
+    due = new_on_day * float(SECONDS_PER_DAY)
+    due_day = new_on_day.copy()
+    session_seconds = rng.uniform(*model.session_hours, users) * 60 * 60
+
+    reviews = np.zeros(days, dtype=np.int64)
+    scheduled = np.zeros(days, dtype=np.int64)
+    lapses = np.zeros(days, dtype=np.int64)
+    recall_sums = np.zeros(days)
+    retrievability = np.zeros(days // RETRIEVABILITY_EVERY_DAYS)
+    introduced = np.zeros(days // RETRIEVABILITY_EVERY_DAYS, dtype=np.int64)
+    session_sizes = np.zeros(1, dtype=np.int64)
+
+    for day in range(days):
+        attends = rng.random(users) < model.attendance
+        session_starts = day * SECONDS_PER_DAY + session_seconds
+        # when the last review of each user's session was rated
+        clocks = session_starts.copy()
+        reviews_per_user = np.zeros(users, dtype=np.int64)
+        # `is_due_today`
+        cards = np.flatnonzero(due_day <= day)
+        cards = cards[attends[user_of_card[cards]]]
+        for round_number in range(MAX_ROUNDS):
+            if not len(cards):
+                break
+            # every user's cards in order of due date, like the Scheduler without dependencies
+            # cards that are due again today come back in the next round
+            cards = cards[np.lexsort((due[cards], user_of_card[cards]))]
+            users_of_cards = user_of_card[cards]
+            firsts = np.flatnonzero(np.diff(users_of_cards, prepend=-1))
+            counts = np.diff(firsts, append=len(cards))
+            positions = np.arange(len(cards)) - np.repeat(firsts, counts)
+            review_times = (
+                clocks[users_of_cards] + (positions + 1) * model.seconds_per_review
+            )
+            clocks[users_of_cards[firsts]] = review_times[firsts + counts - 1]
+            reviews_per_user[users_of_cards[firsts]] += counts
+
+            seen = ~np.isnan(last_review_dates[cards])
+            elapsed_days = (review_times - last_review_dates[cards]) / SECONDS_PER_DAY
+            recall = np.where(
+                seen,
+                RECALL_AT_STABILITY ** (elapsed_days / stability[cards]),
+                model.first_recall,
+            )
+            recalled = rng.random(len(cards)) < recall
+            sureness = recall + rng.normal(0, model.rating_noise, len(cards))
+            confidence_scores = np.select(
+                [
+                    ~recalled,
+                    sureness < model.good_threshold,
+                    sureness < model.easy_threshold,
+                ],
+                [1, 2, 3],
+                default=4,
+            )
+            grown = stability[cards] * (
+                1
+                + model.growth * ease[cards] * (1 - recall) / (1 - RECALL_AT_STABILITY)
+            )
+            # a lapsed card is learned again, at least as well as the first time
+            stability[cards] = np.where(
+                seen & recalled,
+                grown,
+                np.fmax(
+                    stability[cards] * model.lapse_factor,
+                    model.initial_stability_days * ease[cards],
+                ),
+            )
+            _, due[cards] = review(
+                last_review_dates[cards],
+                review_times,
+                session_starts[users_of_cards],
+                confidence_scores,
+                policy,
+            )
+            last_review_dates[cards] = review_times
+            due_day[cards] = np.floor(due[cards] / SECONDS_PER_DAY)
+
+            reviews[day] += len(cards)
+            if not round_number:
+                scheduled[day] = seen.sum()
+                lapses[day] = (seen & ~recalled).sum()
+                recall_sums[day] = recall[seen].sum()
+            cards = cards[due_day[cards] <= day]
+
+        session_sizes = add_histograms(
+            session_sizes, np.bincount(reviews_per_user[attends])
+        )
+        if (day + 1) % RETRIEVABILITY_EVERY_DAYS == 0:
+            checkpoint = (day + 1) // RETRIEVABILITY_EVERY_DAYS - 1
+            seen = ~np.isnan(last_review_dates)
+            elapsed_days = (day + 1) - last_review_dates[seen] / SECONDS_PER_DAY
+            retrievability[checkpoint] = (
+                RECALL_AT_STABILITY ** (elapsed_days / stability[seen])
+            ).sum()
+            introduced[checkpoint] = seen.sum()
+
+    return SimulationResult(
+        users,
+        number_of_cards,
+        reviews,
+        scheduled,
+        lapses,
+        recall_sums,
+        retrievability,
+        introduced,
+        session_sizes,
+    )
+
+
+def add_histograms(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    total = np.zeros(max(len(first), len(second)), dtype=np.int64)
+    total[: len(first)] += first
+    total[: len(second)] += second
+    return total
+
+
+def merge(results: List[SimulationResult]) -> SimulationResult:
+    session_sizes = np.zeros(1, dtype=np.int64)
+    for result in results:
+        session_sizes = add_histograms(session_sizes, result.session_sizes)
+    return SimulationResult._make(
+        [
+            *(
+                sum(getattr(result, field) for result in results)
+                for field in SimulationResult._fields[:-1]
+            ),
+            session_sizes,
+        ]
+    )
+
+
+def simulate(
+    policy: Policy = DEFAULT_POLICY,
+    model: RatingModel = DEFAULT_MODEL,
+    users: int = 100,
+    cards_per_user: int = 2000,
+    days: int = 365,
+    seed: int = 0,
+    jobs: int = 1,
+) -> SimulationResult:
+    """
+    Replay `days` of daily sessions of `users` synthetic users, who all start with `cards_per_user` new cards, under `policy`.
+
+    All cards of a batch of users are simulated at once, in NumPy arrays, and with more than one job the batches are simulated in a process pool.
+    The result is the same for any number of jobs.
+    """
+    batches = [
+        min(BATCH_USERS, users - first_user)
+        for first_user in range(0, users, BATCH_USERS)
+    ]
+    arguments = [
+        [policy] * len(batches),
+        [model] * len(batches),
+        batches,
+        [cards_per_user] * len(batches),
+        [days] * len(batches),
+        np.random.SeedSequence(seed).spawn(len(batches)),
+    ]
+    if jobs > 1 and len(batches) > 1:
+        # pulls in multiprocessing, so only when it's used
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(jobs) as process_pool:
+            return merge(list(process_pool.map(simulate_batch, *arguments)))
+    return merge(list(map(simulate_batch, *arguments)))
+
+
+def summarize(
+    result: SimulationResult, model: RatingModel = DEFAULT_MODEL
+) -> Dict[str, float]:
+    """
+    Workload and, as a proxy for retention, the chance to recall cards, averaged over users and days.
+    """
+    user_days = result.users * len(result.reviews)
+    measured = result.introduced > 0
+    session_counts = np.cumsum(result.session_sizes)
+    return {
+        "reviews per user per day": result.reviews.sum() / user_days,
+        "minutes per user per day": result.reviews.sum()
+        * model.seconds_per_review
+        / 60
+        / user_days,
+        "reviews per user on the busiest day": result.reviews.max(initial=0)
+        / result.users,
+        "reviews in the 99th percentile session": float(
+            np.searchsorted(session_counts, 0.99 * session_counts[-1])
+        ),
+        "reviews per card": result.reviews.sum() / result.cards,
+        "recall at scheduled reviews": result.recall.sum()
+        / max(result.scheduled.sum(), 1),
+        "lapses per scheduled review": result.lapses.sum()
+        / max(result.scheduled.sum(), 1),
+        "mean retrievability of reviewed cards": float(
+            (result.retrievability[measured] / result.introduced[measured]).mean()
+        )
+        if measured.any()
+        else float("nan"),
+    }
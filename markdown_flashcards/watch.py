@@ -0,0 +1,200 @@
+import logging
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Set, Tuple, Union
+
+from markdown_flashcards.parsing import scan_markdown_files
+
+LOGGER = logging.getLogger(__name__)
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+WATCHED_EVENTS = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+# relative paths of the Markdown files that were added or changed, and of those that were removed
+Changes = Tuple[Set[str], Set[str]]
+
+
+class PollingWatcher:
+    """
+    Finds added, changed and removed Markdown files by comparing modification times and sizes, at most once every `interval` seconds.
+    """
+
+    def __init__(self, directory: Path, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._last_scan = time.monotonic()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for card_path in scan_markdown_files(self.directory):
+            try:
+                stat_result = card_path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[str(card_path.relative_to(self.directory, walk_up=True))] = (
+                stat_result.st_mtime_ns,
+                stat_result.st_size,
+            )
+        return snapshot
+
+    def changes(self) -> Changes:
+        if time.monotonic() - self._last_scan < self.interval:
+            return set(), set()
+        snapshot = self._scan()
+        self._last_scan = time.monotonic()
+        changed = {
+            relative_path
+            for relative_path, signature in snapshot.items()
+            if self._snapshot.get(relative_path) != signature
+        }
+        removed = self._snapshot.keys() - snapshot.keys()
+        self._snapshot = snapshot
+        return changed, removed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Finds added, changed and removed Markdown files through inotify.
+    """
+
+    def __init__(self, directory: Path, relative_paths: Iterable[str]):
+        import ctypes
+        import ctypes.util
+
+        self.directory = directory
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, Path] = {}
+        self._known: Set[str] = set(relative_paths)
+        try:
+            self._watch_tree(directory)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def _watch_tree(self, directory: Path) -> Set[str]:
+        """
+        Watch `directory` and everything under it, returns the Markdown files in it.
+        """
+        import ctypes
+
+        found = set()
+        directories = [directory]
+        while directories:
+            current = directories.pop()
+            descriptor = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(current), WATCHED_EVENTS
+            )
+            if descriptor < 0:
+                raise OSError(ctypes.get_errno(), f"cannot watch {current}")
+            self._directories[descriptor] = current
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    # like scan_markdown_files, don't descend into symlinked directories
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(Path(entry.path))
+                    elif entry.name.endswith(".md") and entry.is_file():
+                        found.add(self._relative(Path(entry.path)))
+        return found
+
+    def _unwatch_tree(self, directory: Path) -> None:
+        for descriptor, watched in list(self._directories.items()):
+            if watched == directory or watched.is_relative_to(directory):
+                # fails harmlessly if the kernel already dropped the watch along with the directory
+                self._libc.inotify_rm_watch(self._fd, descriptor)
+                del self._directories[descriptor]
+
+    def _relative(self, path: Path) -> str:
+        return str(path.relative_to(self.directory, walk_up=True))
+
+    def _read_events(self) -> bytes:
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return b"".join(chunks)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def changes(self) -> Changes:
+        changed: Set[str] = set()
+        removed: Set[str] = set()
+        buffer = self._read_events()
+        offset = 0
+        while offset < len(buffer):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[
+                offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + length
+            ].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                LOGGER.warning("Missed file events, checking every card.")
+                changed |= self._known
+                continue
+            parent = self._directories.get(descriptor)
+            if parent is None or not name:
+                continue
+            path = parent / os.fsdecode(name)
+            relative_path = self._relative(path)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        found = self._watch_tree(path)
+                    except OSError:
+                        # already gone again
+                        continue
+                    changed |= found
+                    removed -= found
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._unwatch_tree(path)
+                    gone = {
+                        known
+                        for known in self._known | changed
+                        if known.startswith(relative_path + os.sep)
+                    }
+                    removed |= gone
+                    changed -= gone
+            elif relative_path.endswith(".md"):
+                if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    changed.add(relative_path)
+                    removed.discard(relative_path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    removed.add(relative_path)
+                    changed.discard(relative_path)
+        self._known = (self._known | changed) - removed
+        return changed, removed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def watch_deck(
+    directory: Path, relative_paths: Iterable[str], interval: float = 1.0
+) -> Union[InotifyWatcher, PollingWatcher]:
+    """
+    An `InotifyWatcher` where inotify is available, a `PollingWatcher` otherwise.
+    """
+    try:
+        return InotifyWatcher(directory, relative_paths)
+    except (OSError, AttributeError, TypeError) as error:
+        # AttributeError without inotify in libc, TypeError without a libc to find
+        LOGGER.info("Falling back to polling for changes: %s", error)
+        return PollingWatcher(directory, interval)
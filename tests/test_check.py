@@ -0,0 +1,38 @@
+from markdown_flashcards.check import check_deck, open_history
+from markdown_flashcards.session import ReviewSession
+
+
+def write_deck(directory):
+    (directory / "a.md").write_text("---\ntags: []\n---\nWhat is A?\n---\nA letter.\n")
+    (directory / "b.md").write_text(
+        "---\ndependencies: [missing.md]\n---\nThe £{c1:capital} of France.\n"
+    )
+
+
+def files(directory):
+    return {
+        path.name: (path.stat().st_mtime_ns, path.read_bytes())
+        for path in directory.iterdir()
+    }
+
+
+def test_check_reads_the_database_without_writing_to_it(tmp_path):
+    write_deck(tmp_path)
+    with ReviewSession(tmp_path) as session:
+        session.start()
+    before = files(tmp_path)
+    con, read_only = open_history(tmp_path)
+    con.close()
+    assert read_only
+    problems = check_deck(tmp_path)
+    assert [(problem.relative_path, problem.kind) for problem in problems] == [
+        ("b.md", "missing-dependency")
+    ]
+    assert files(tmp_path) == before
+
+
+def test_check_without_a_database(tmp_path):
+    write_deck(tmp_path)
+    before = files(tmp_path)
+    assert [problem.kind for problem in check_deck(tmp_path)] == ["missing-dependency"]
+    assert files(tmp_path) == before
@@ -0,0 +1,41 @@
+from rich.console import Console  # type: ignore
+from rich.markdown import Markdown  # type: ignore
+
+from markdown_flashcards.rendering import CARD_THEME, CardMarkdown
+
+MARKUP = """What is **card 1** about?
+
+- a point
+- ~~another~~ point
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+```python
+print("code")
+```
+"""
+
+
+def render(renderable) -> str:
+    console = Console(theme=CARD_THEME, width=60, record=True, force_terminal=True)
+    with console.capture():
+        console.print(renderable)
+    return console.export_text(styles=True)
+
+
+def test_plain_markdown_renders_like_rich():
+    assert render(CardMarkdown(MARKUP)) == render(Markdown(MARKUP))
+
+
+def test_cloze_is_highlighted():
+    console = Console(theme=CARD_THEME, width=60)
+    segments = list(console.render(CardMarkdown("The £{c1:capital} of France.")))
+    highlighted = "".join(
+        segment.text
+        for segment in segments
+        if segment.style and segment.style.bold and segment.style.color
+    )
+    assert highlighted == "capital"
+    assert "£{c1:" not in "".join(segment.text for segment in segments)
@@ -0,0 +1,117 @@
+import datetime
+import random
+
+import pytest
+
+from markdown_flashcards.cards import START_TIME, NormalCard
+from markdown_flashcards.dependencies import DependencyGraph, DependencyLayers
+from markdown_flashcards.scheduler import Scheduler
+
+
+def random_graph(rng: random.Random) -> DependencyGraph:
+    # a random DAG in layers, like benchmarks.closure.layered
+    number_of_nodes = rng.randint(1, 300)
+    layer_size = max(1, number_of_nodes // rng.randint(1, 10))
+    fan_out = rng.randint(0, 4)
+    graph = DependencyGraph()
+    for index in range(number_of_nodes):
+        earlier = index - index % layer_size
+        graph.set_dependencies(
+            f"card{index}.md",
+            [
+                f"card{rng.randrange(earlier)}.md"
+                for _ in range(rng.randint(0, fan_out) if earlier else 0)
+            ],
+        )
+    return graph
+
+
+def card(relative_path, last_review_date=None, confidence_score=None, days=None):
+    return NormalCard(
+        relative_path,
+        [],
+        last_review_date,
+        confidence_score,
+        datetime.timedelta(days=days) if days else None,
+        "front",
+        "back",
+    )
+
+
+def random_card(rng: random.Random, relative_path: str) -> NormalCard:
+    if rng.random() < 0.2:
+        return card(relative_path)
+    return card(
+        relative_path,
+        START_TIME
+        - datetime.timedelta(days=rng.randint(0, 30), minutes=rng.randint(0, 1440)),
+        rng.randint(1, 4),
+        rng.randint(1, 20),
+    )
+
+
+def check_order(layers: DependencyLayers, popped) -> None:
+    due = [card for card in popped if card.is_due_at_start]
+    # cards that weren't due at the start never go ahead of cards that were
+    assert popped[: len(due)] == due
+    seen = set()
+    for card in reversed(due):
+        assert not any(
+            dependency in seen
+            for dependency in layers.graph.descendants(card.relative_path)
+        ), f"{card.relative_path} comes before one of its dependencies"
+        seen.add(card.relative_path)
+    for group in (due, popped[len(due) :]):
+        for earlier, later in zip(group, group[1:]):
+            assert (layers.layers[earlier.relative_path], earlier.due_date) <= (
+                layers.layers[later.relative_path],
+                later.due_date,
+            )
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_order_on_random_graphs(seed):
+    rng = random.Random(seed)
+    layers = DependencyLayers(random_graph(rng))
+    scheduler = Scheduler(layers.layers)
+    for relative_path in layers.paths:
+        scheduler.push(random_card(rng, relative_path))
+    assert [card.relative_path for card in scheduler.peek(10)] == [
+        entry[-1].relative_path for entry in sorted(scheduler._heap)[:10]
+    ]
+    check_order(layers, [scheduler.pop() for _ in range(len(scheduler))])
+    assert scheduler.pop() is None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_order_with_ratings(seed):
+    # like a session: rated cards go back into the queue
+    rng = random.Random(seed)
+    layers = DependencyLayers(random_graph(rng))
+    scheduler = Scheduler(layers.layers)
+    for relative_path in layers.paths:
+        scheduler.push(random_card(rng, relative_path))
+    popped = []
+    card = scheduler.pop()
+    while card and len(popped) < 5 * len(layers.paths):
+        if card.is_due_at_start:
+            popped.append(card)
+            scheduler.push(card.update_with_confidence_score(rng.randint(2, 4)))
+        card = scheduler.pop()
+    check_order(layers, popped)
+
+
+def test_rated_card_waits_for_due_cards_in_higher_layers():
+    graph = DependencyGraph()
+    graph.set_dependencies("a.md", [])
+    graph.set_dependencies("x.md", [])
+    graph.set_dependencies("b.md", ["x.md"])
+    scheduler = Scheduler(DependencyLayers(graph).layers)
+    last_review_date = START_TIME - datetime.timedelta(days=3)
+    for relative_path in ["a.md", "x.md", "b.md"]:
+        scheduler.push(card(relative_path, last_review_date, 3, 1))
+    order = [scheduler.pop()]
+    # "hard", due again in a few minutes
+    scheduler.push(order[0].update_with_confidence_score(2))
+    order.extend(iter(scheduler.pop, None))
+    assert [card.relative_path for card in order] == ["a.md", "x.md", "b.md", "a.md"]
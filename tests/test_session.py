@@ -0,0 +1,65 @@
+import os
+
+from markdown_flashcards.history import connect, load_card_types, load_history
+from markdown_flashcards.session import ReviewSession
+
+CLOZE_CARD = "---\ntags: []\n---\nThe £{c1:capital} of £{c2:France} is Paris.\n"
+
+
+def rated_history(directory):
+    con = connect(directory)
+    try:
+        return load_card_types(con.cursor()), {
+            (entry.cloze_variant, entry.confidence_score)
+            for entry in load_history(con.cursor()).values()
+        }
+    finally:
+        con.close()
+
+
+def touch(path, text):
+    path.write_text(text)
+    # the parse cache goes by mtime and size
+    stat_result = path.stat()
+    os.utime(path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9))
+
+
+def test_reload_keeps_cloze_history_when_the_card_also_matches_the_normal_pattern(
+    tmp_path,
+):
+    card_path = tmp_path / "card.md"
+    touch(card_path, CLOZE_CARD)
+    with ReviewSession(tmp_path) as session:
+        assert session.start() == 2
+        for card in session.due_cards():
+            session.rate(card, 3)
+        session.flush()
+        rated = rated_history(tmp_path)
+        # the body now matches the normal pattern as well
+        touch(card_path, CLOZE_CARD + "---\nA note.\n")
+        session.reload({"card.md"}, set())
+        assert rated_history(tmp_path) == rated
+        assert not session.problems
+    assert rated[0] == {"card.md": {1: "cloze", 2: "cloze"}}
+    assert rated[1] == {(1, 3), (2, 3)}
+    # like after a restart
+    with ReviewSession(tmp_path) as session:
+        session.start()
+        assert rated_history(tmp_path) == rated
+
+
+def test_reload_reports_removed_occlusions_instead_of_deleting_their_history(
+    tmp_path,
+):
+    card_path = tmp_path / "card.md"
+    touch(card_path, CLOZE_CARD)
+    with ReviewSession(tmp_path) as session:
+        session.start()
+        for card in session.due_cards():
+            session.rate(card, 3)
+        session.flush()
+        rated = rated_history(tmp_path)
+        touch(card_path, CLOZE_CARD.replace("£{c2:France}", "France"))
+        session.reload({"card.md"}, set())
+        assert rated_history(tmp_path) == rated
+        assert [problem.kind for problem in session.problems] == ["database-mismatch"]
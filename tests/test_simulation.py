@@ -0,0 +1,104 @@
+import datetime
+import random
+
+import pytest
+
+# the stats extra
+np = pytest.importorskip("numpy")
+
+from benchmarks.simulation import random_state  # noqa: E402
+from markdown_flashcards.cards import START_TIME, ClozeVariant, NormalCard  # noqa: E402
+from markdown_flashcards.forecast import due_dates, wall_seconds  # noqa: E402
+from markdown_flashcards.scheduling import Policy, compute_due_date  # noqa: E402
+from markdown_flashcards.simulation import review  # noqa: E402
+
+SAMPLES = 2000
+
+
+def random_policy(rng: random.Random) -> Policy:
+    return Policy(
+        hard_factor=rng.uniform(0.3, 1),
+        hard_minimum_minutes=rng.uniform(0, 60),
+        good_factor=rng.uniform(1, 3),
+        good_factor_from_days=rng.uniform(0.5, 10),
+        good_maximum_days=rng.randint(30, 400),
+        easy_factor=rng.uniform(1, 4),
+        easy_factor_from_days=rng.uniform(0.5, 10),
+        easy_maximum_days=rng.randint(30, 800),
+    )
+
+
+def stored_columns(states) -> list:
+    # like `due_dates` takes them, with NaN for missing values
+    return [
+        np.array([np.nan if value is None else convert(value) for value in column])
+        for column, convert in zip(
+            zip(*states), [wall_seconds, float, datetime.timedelta.total_seconds]
+        )
+    ]
+
+
+def loaded_cards(states) -> list:
+    # stored values, as loaded
+    return [
+        NormalCard(f"card{index}.md", [], *state, "front", "back")
+        if index % 2
+        else ClozeVariant(f"card{index}.md", [], *state, "front", 1)
+        for index, state in enumerate(states)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_due_dates_match_cards(seed):
+    rng = random.Random(seed)
+    states = [random_state(rng) for _ in range(SAMPLES)]
+    expected = [wall_seconds(card.due_date) for card in loaded_cards(states)]
+    assert np.allclose(
+        due_dates(*stored_columns(states), wall_seconds(START_TIME)),
+        expected,
+        rtol=0,
+        atol=1e-3,
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_review_matches_rated_cards(seed):
+    rng = random.Random(seed)
+    states = [random_state(rng) for _ in range(SAMPLES)]
+    now = wall_seconds(START_TIME)
+    # rated, as in a session
+    updated = [
+        card.update_with_confidence_score(rng.randint(1, 4))
+        for card in loaded_cards(states)
+    ]
+    previous_time_deltas, due = review(
+        stored_columns(states)[0],
+        np.array([wall_seconds(card.last_review_date) for card in updated]),
+        np.full(SAMPLES, now),
+        np.array([card.confidence_score for card in updated]),
+    )
+    assert np.allclose(
+        previous_time_deltas,
+        [card.previous_time_delta.total_seconds() for card in updated],
+        rtol=0,
+        atol=1e-3,
+    )
+    assert np.allclose(
+        due, [wall_seconds(card.due_date) for card in updated], rtol=0, atol=1e-3
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_due_dates_match_compute_due_date_for_other_policies(seed):
+    rng = random.Random(seed)
+    states = [random_state(rng) for _ in range(SAMPLES)]
+    policy = random_policy(rng)
+    expected = [
+        wall_seconds(compute_due_date(*state, policy) or START_TIME) for state in states
+    ]
+    assert np.allclose(
+        due_dates(*stored_columns(states), wall_seconds(START_TIME), policy),
+        expected,
+        rtol=0,
+        atol=1e-3,
+    )
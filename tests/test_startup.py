@@ -0,0 +1,43 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# only needed once cards are parsed, the graph is built or something is shown
+LAZY_MODULES = [
+    "frontmatter",
+    "markdown_it",
+    "multiprocessing",
+    "networkx",
+    "numpy",
+    "PIL",
+    "rich",
+    "textual_image",
+]
+
+
+@pytest.fixture(scope="module")
+def modules_after_import():
+    # in a fresh interpreter, other tests import these anyway
+    return subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, markdown_flashcards.main; print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+        # the root of the repository, so the package can be imported without installing it
+        cwd=Path(__file__).parent.parent,
+    ).stdout.split()
+
+
+@pytest.mark.parametrize("lazy_module", LAZY_MODULES)
+def test_heavy_modules_are_not_imported_at_startup(modules_after_import, lazy_module):
+    assert not [
+        name
+        for name in modules_after_import
+        if name == lazy_module or name.startswith(f"{lazy_module}.")
+    ]